@@ -1,184 +1,41 @@
-import matplotlib.pyplot as plt
+import csv
+import io
 import tkinter as tk
-from tkinter import ttk, messagebox
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas as pdf_canvas
-from io import BytesIO
-from PIL import Image
-import numpy as np
-
-# Define the Task, MeditationSession, BreathingPractice, and EnneagramType classes
-class Task:
-    def __init__(self, task_id, name, base_attention, difficulty, criticality, duration, start_time):
-        self.task_id = task_id
-        self.name = name
-        self.base_attention = base_attention
-        self.difficulty = difficulty
-        self.criticality = criticality
-        self.duration = duration
-        self.start_time = start_time
-
-class MeditationSession:
-    def __init__(self, start_time, duration, effectiveness):
-        self.start_time = start_time
-        self.duration = duration
-        self.effectiveness = effectiveness
-
-class BreathingPractice:
-    def __init__(self, name, start_time, duration, effectiveness):
-        self.name = name
-        self.start_time = start_time
-        self.duration = duration
-        self.effectiveness = effectiveness
-
-class EnneagramType:
-    def __init__(self, type_id, name, transmutation_practices):
-        self.type_id = type_id
-        self.name = name
-        self.transmutation_practices = transmutation_practices
-
-    def apply_effects(self, attention_level):
-        if self.type_id == 1:
-            attention_level += 5  # Reformer gets a slight attention boost
-        elif self.type_id == 2:
-            attention_level += 3  # Helper gets a smaller attention boost
-        return attention_level
-
-# Define the simulate_with_voluntary function
-def simulate_with_voluntary(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation, apply_breathing):
-    history = []
-    attention_curve = []
-    correction_curve = []  # Correction curve initialization
-    meditation_points = []
-    breathing_points = []
-    voluntary_intention_points = []
-    total_attention_gain = 0
-    total_breathing_gain = 0
-    total_voluntary_intention_gain = 0
-    current_time = 0
-    attention_level = initial_attention
-
-    # Apply initial Enneagram effects
-    attention_level = enneagram_type.apply_effects(attention_level)
-
-    # Ensure the attention line starts from point 0
-    history.append((current_time, None, attention_level, 0))
-    attention_curve.append((current_time, None, 0, attention_level))
-    correction_curve.append((current_time, attention_level))
-
-    for task in tasks:
-        current_time = task.start_time
-        task_end_time = task.start_time + task.duration
-        while current_time < task_end_time:
-            if apply_meditation:
-                for session in meditation_sessions:
-                    if session.start_time <= current_time < session.start_time + session.duration:
-                        attention_level += session.effectiveness
-                        if attention_level > max_attention:
-                            attention_level = max_attention
-                        meditation_points.append((current_time, attention_level))
-                        total_attention_gain += session.effectiveness
-
-            if apply_breathing:
-                for practice in breathing_practices:
-                    if practice.start_time <= current_time < practice.start_time + practice.duration:
-                        attention_level += practice.effectiveness
-                        if attention_level > max_attention:
-                            attention_level = max_attention
-                        breathing_points.append((current_time, attention_level))
-                        total_breathing_gain += practice.effectiveness
-
-            # Apply Law of Octaves and Law of Three
-            if (current_time % 7 == 0):  # Law of Octaves
-                attention_level += 10  # Example boost for octave
-            if (current_time % 3 == 0):  # Law of Three
-                attention_level -= 5  # Example reduction for interval
-
-            # Adjust the rate of decrease when attention is below the minimum threshold
-            if attention_level < min_attention:
-                attention_level -= task.difficulty * 0.5  # Reduce the rate by half
-                voluntary_intention_points.append((current_time, attention_level))
-                total_voluntary_intention_gain += task.difficulty * 0.5
-            else:
-                attention_level -= task.difficulty
-
-            history.append((current_time, task.task_id, attention_level, task.difficulty))
-            attention_curve.append((current_time, task.task_id, task.difficulty, attention_level))
-            correction_curve.append((current_time, attention_level))  # Update correction curve
-            current_time += 1
-
-    accumulated_fatigue = sum(task.difficulty for task in tasks)
-    avg_external_factors = sum(task.criticality for task in tasks) / len(tasks) if tasks else 0
-    return history, attention_curve, correction_curve, meditation_points, breathing_points, voluntary_intention_points, total_attention_gain, total_breathing_gain, total_voluntary_intention_gain, accumulated_fatigue, avg_external_factors
-
-
-
-def simulate(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation, apply_breathing):
-    history = []
-    attention_curve = []
-    meditation_points = []
-    breathing_points = []
-    total_attention_gain = 0
-    total_breathing_gain = 0
-    current_time = 0
-    attention_level = initial_attention
-
-    # Apply initial Enneagram effects
-    attention_level = enneagram_type.apply_effects(attention_level)
-
-    for task in tasks:
-        current_time = task.start_time
-        task_end_time = task.start_time + task.duration
-        while current_time < task_end_time:
-            if apply_meditation:
-                for session in meditation_sessions:
-                    if session.start_time <= current_time < session.start_time + session.duration:
-                        attention_level += session.effectiveness
-                        if attention_level > max_attention:
-                            attention_level = max_attention
-                        meditation_points.append((current_time, attention_level))
-                        total_attention_gain += session.effectiveness
-
-            if apply_breathing:
-                for practice in breathing_practices:
-                    if practice.start_time <= current_time < practice.start_time + practice.duration:
-                        attention_level += practice.effectiveness
-                        if attention_level > max_attention:
-                            attention_level = max_attention
-                        breathing_points.append((current_time, attention_level))
-                        total_breathing_gain += practice.effectiveness
-
-            # Apply Law of Octaves and Law of Three
-            if (current_time % 7 == 0):  # Law of Octaves
-                attention_level += 10  # Example boost for octave
-            if (current_time % 3 == 0):  # Law of Three
-                attention_level -= 5  # Example reduction for interval
-
-            attention_level -= task.difficulty
-
-            history.append((current_time, task.task_id, attention_level, task.difficulty))
-            attention_curve.append((current_time, task.task_id, task.difficulty, attention_level))
-            current_time += 1
-
-    accumulated_fatigue = sum(task.difficulty for task in tasks)
-    avg_external_factors = sum(task.criticality for task in tasks) / len(tasks) if tasks else 0
-    return history, attention_curve, meditation_points, breathing_points, total_attention_gain, total_breathing_gain, accumulated_fatigue, avg_external_factors
-
-
-
-
-
-
-def plot_simulation_with_voluntary(history, tasks, attention_curve, correction_curve, meditation_points, breathing_points, voluntary_intention_points, min_attention, meditation_sessions, breathing_practices):
+from tkinter import ttk, messagebox, filedialog
+from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Schedule, Task
+
+# matplotlib, numpy, the engine and reportlab are imported where they are first needed, so the window
+# comes up without waiting for them. The simulator and the result cache are created on the first run.
+simulator = None
+result_cache = None
+
+def new_simulator():
+    # Remembers its last run so that after an edit only the changed part of the timeline is re-simulated.
+    # All simulators share one cache, so a run of the schedule the chart already shows is not simulated again.
+    global result_cache
+    from attention_core.cache import CachedSimulator, ResultCache
+    from attention_core.incremental import IncrementalSimulator
+    if result_cache is None:
+        result_cache = ResultCache()
+    return CachedSimulator(result_cache, IncrementalSimulator())
+
+def get_simulator():
+    global simulator
+    if simulator is None:
+        simulator = new_simulator()
+    return simulator
+
+def draw_simulation_with_voluntary(ax, result, tasks, min_attention, meditation_sessions, breathing_practices):
+    # Same signature as attention_core.plotting.draw_simulation, with the meditation sessions split into notes
+    import numpy as np
+    from matplotlib.lines import Line2D
+    from attention_core.plotting import draw_law_markers, draw_spans, draw_task_spans, plot_curve, scatter_points
     # First graph with attention levels
-    plt.figure(figsize=(12, 6))
-    attention_times = [entry[0] for entry in attention_curve]
-    attention_levels = [entry[3] for entry in attention_curve]
+    attention_times = result.time
 
-    plt.plot(attention_times, attention_levels, label='Attention Level', color='b')
+    plot_curve(ax, attention_times, result.attention, label='Attention Level', color='b')
 
-    for task in tasks:
-        plt.axvspan(task.start_time, task.start_time + task.duration, alpha=0.2, color='yellow', label=f'Task: {task.name}')
+    draw_task_spans(ax, tasks, alpha=0.2, color='yellow')
 
     # Plotting meditation sessions with color mapping
     note_colors = {
@@ -201,124 +58,237 @@ def plot_simulation_with_voluntary(history, tasks, attention_curve, correction_c
         ("B Si", "15/8")
     ]
 
-    for session in meditation_sessions:
-        start = session.start_time
-        duration = session.duration
-        step = duration / len(note_sections)
-        for i, (note, ratio) in enumerate(note_sections):
-            plt.axvspan(start + i * step, start + (i + 1) * step, alpha=0.2, color=note_colors[note], label=f'Meditation: {note}' if i == 0 else "")
-
-    for practice in breathing_practices:
-        plt.axvspan(practice.start_time, practice.start_time + practice.duration, alpha=0.2, color='purple', label='Breathing')
-
-    for meditation_time, attention_level in meditation_points:
-        plt.scatter(meditation_time, attention_level, color='r', s=50, label='Meditation Point' if meditation_time == meditation_points[0][0] else "")
-
-    for breathing_time, attention_level in breathing_points:
-        plt.scatter(breathing_time, attention_level, color='pink', s=50, label='Breathing Point' if breathing_time == breathing_points[0][0] else "")
-
-    for voluntary_time, attention_level in voluntary_intention_points:
-        plt.scatter(voluntary_time, attention_level, color='orange', s=50, label='Voluntary Intention' if voluntary_time == voluntary_intention_points[0][0] else "")
-
-    for time in range(int(max(attention_times))):
-        if time % 7 == 0:
-            plt.axvline(x=time, color='blue', linestyle='--', label='Law of Octaves' if time == 0 else "")
-        if time % 3 == 0:
-            plt.axvline(x=time, color='red', linestyle='--', label='Law of Three' if time == 0 else "")
-
-    plt.axhline(y=min_attention, color='gray', linestyle='--', label='Min Attention Threshold')
-    plt.xlabel('Global Clock (minutes)')
-    plt.ylabel('Attention Level')
-    plt.title('Attention Level Over Time Considering Fatigue, Task Difficulty, Meditation, Breathing Practices, and Voluntary Intention')
-    plt.grid(True)
-    
-    # Add legend for note colors
-    handles, labels = plt.gca().get_legend_handles_labels()
-    by_label = dict(zip(labels, handles))
-    note_legend = [plt.Line2D([0], [0], color=color, lw=4) for color in note_colors.values()]
-    note_labels = list(note_colors.keys())
-    note_legend_handles = dict(zip(note_labels, note_legend))
-    by_label.update(note_legend_handles)
-    plt.legend(by_label.values(), by_label.keys(), loc='upper left', bbox_to_anchor=(1, 1), title="Legend")
-
-    plt.tight_layout()
-    plt.show()
-
-    # Second graph with correction curve and attention levels
-def plot_correction_curve(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type):
-    _, attention_curve_no_meditation, _, _, _, _, _, _ = simulate(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation=False, apply_breathing=False)
-    _, attention_curve_with_meditation_breathing, _, _, _, _, _, _ = simulate(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation=True, apply_breathing=True)
+    # One artist per note across all sessions: each session is split into len(note_sections) equal steps
+    starts = np.array([float(session.start_time) for session in meditation_sessions])
+    step = np.array([float(session.duration) for session in meditation_sessions]) / len(note_sections)
+    for i, (note, ratio) in enumerate(note_sections):
+        draw_spans(ax, starts + i * step, starts + (i + 1) * step, alpha=0.2, color=note_colors[note], label=f'Meditation: {note}' if i == 0 else "")
 
-    plt.figure(figsize=(12, 6))
+    draw_spans(ax, [practice.start_time for practice in breathing_practices], [practice.start_time + practice.duration for practice in breathing_practices], alpha=0.2, color='purple', label='Breathing')
 
-    times_no_meditation = [entry[0] for entry in attention_curve_no_meditation]
-    levels_no_meditation = [entry[3] for entry in attention_curve_no_meditation]
-    plt.plot(times_no_meditation, levels_no_meditation, label='Attention without Meditation/Breathing', color='b')
+    scatter_points(ax, *result.points('meditation'), color='r', s=50, label='Meditation Point')
+    scatter_points(ax, *result.points('breathing'), color='pink', s=50, label='Breathing Point')
 
-    times_with_meditation_breathing = [entry[0] for entry in attention_curve_with_meditation_breathing]
-    levels_with_meditation_breathing = [entry[3] for entry in attention_curve_with_meditation_breathing]
-    plt.plot(times_with_meditation_breathing, levels_with_meditation_breathing, label='Attention with Meditation/Breathing', color='g')
-
-    plt.axhline(y=min_attention, color='gray', linestyle='--', label='Min Attention Threshold')
-    plt.xlabel('Global Clock (minutes)')
-    plt.ylabel('Attention Level')
-    plt.title('Attention Level Over Time Considering Fatigue, Task Difficulty, Meditation, Breathing Practices, and Voluntary Intention')    
-    plt.grid(True)
-    plt.legend(loc='upper left', bbox_to_anchor=(1, 1), title="Legend")
-    plt.tight_layout()
-    plt.show()
+    scatter_points(ax, *result.points('voluntary'), color='orange', s=50, label='Voluntary Intention')
 
+    if len(result):
+        draw_law_markers(ax, attention_times.max())
 
+    ax.axhline(y=min_attention, color='gray', linestyle='--', label='Min Attention Threshold')
+    ax.set_xlabel('Global Clock (minutes)')
+    ax.set_ylabel('Attention Level')
+    ax.set_title('Attention Level Over Time Considering Fatigue, Task Difficulty, Meditation, Breathing Practices, and Voluntary Intention')
+    ax.grid(True)
 
+    # Add legend for note colors
+    handles, labels = ax.get_legend_handles_labels()
+    by_label = dict(zip(labels, handles))
+    note_legend = [Line2D([0], [0], color=color, lw=4) for color in note_colors.values()]
+    note_labels = list(note_colors.keys())
+    note_legend_handles = dict(zip(note_labels, note_legend))
+    by_label.update(note_legend_handles)
+    ax.legend(by_label.values(), by_label.keys(), loc='upper left', bbox_to_anchor=(1, 1), title="Legend")
+
+# The chart embedded next to the inputs, created with its simulator on first use
+chart = None
+live_simulator = None
+pending_refresh = None
+
+# The chart is refreshed once no edit has arrived for this long, so a burst of typing is simulated once
+REFRESH_DELAY_MS = 30
+
+# The live run in progress, if any, and whether an edit arrived while it ran
+live_job = None
+live_stale = False
+
+def get_chart():
+    global chart
+    if chart is None:
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        from attention_core.plotting import LiveChart
+        figure = Figure(figsize=(12, 8), layout='constrained')
+        FigureCanvasTkAgg(figure, master=chart_frame).get_tk_widget().grid(row=0, column=0, sticky="nsew")
+        chart = LiveChart(figure, draw=draw_simulation_with_voluntary)
+    return chart
+
+def update_chart(variants, schedule):
+    get_chart().update(variants, schedule.tasks, schedule.min_attention, schedule.meditation_sessions, schedule.breathing_practices)
+
+def schedule_refresh(*args):
+    # Called on every edit; each one puts the refresh off again, and the refresh reads the entries when it runs
+    global pending_refresh
+    if pending_refresh is not None:
+        root.after_cancel(pending_refresh)
+    pending_refresh = root.after(REFRESH_DELAY_MS, refresh_chart)
+
+def on_key_release(event):
+    # Cells of the tables count once their edit is committed, see TableEditor.end_edit()
+    if isinstance(event.widget, tk.Entry) and not isinstance(event.widget.master, ttk.Treeview):
+        schedule_refresh()
+
+def refresh_chart():
+    # Re-simulates the schedule as it stands on a worker thread and redraws the chart when it is done; while
+    # an entry is incomplete the chart keeps the last valid schedule. Live runs share live_simulator, so only
+    # one runs at a time: a run still going is cancelled, and this refresh starts again once it has stopped.
+    global pending_refresh, live_simulator, live_job, live_stale
+    pending_refresh = None
+    if live_job is not None:
+        live_stale = True
+        live_job.cancel()
+        return
+    try:
+        schedule = read_schedule()
+    except (ValueError, tk.TclError):
+        return
+    overlap = read_overlap()
+    if live_simulator is None:
+        live_simulator = new_simulator()
+
+    def work(progress):
+        return live_simulator.simulate_variants(
+            schedule.tasks, schedule.initial_attention, schedule.min_attention, schedule.max_attention,
+            schedule.meditation_sessions, schedule.breathing_practices, schedule.enneagram_type,
+            names=('baseline', 'combined', 'voluntary'), progress=progress, overlap=overlap
+        )
 
+    from attention_core.jobs import Job
+    live_job = Job(work).start()
+    root.after(10, poll_live_job, schedule)
+
+def poll_live_job(schedule):
+    # A cancelled run posts no result; a run that fails leaves the chart as it was
+    global live_job, live_stale
+    for message in live_job.poll():
+        if message[0] == 'done':
+            update_chart(message[1], schedule)
+    if not live_job.finished:
+        root.after(10, poll_live_job, schedule)
+        return
+    live_job = None
+    if live_stale:
+        live_stale = False
+        refresh_chart()
+
+
+
+
+
+def read_schedule():
+    # Raises ValueError when an entry does not hold a valid number
+    initial_attention = float(initial_attention_entry.get())
+    min_attention = float(min_attention_entry.get())
+    max_attention = float(max_attention_entry.get())
+
+    tasks = []
+    for i, (name, duration, difficulty, base_attention, criticality, start_time) in enumerate(task_table.rows):
+        tasks.append(Task(i, name, float(base_attention), float(difficulty), float(criticality), float(duration), float(start_time)))
+
+    meditation_sessions = []
+    for start_time, duration, effectiveness in meditation_table.rows:
+        meditation_sessions.append(MeditationSession(float(start_time), float(duration), float(effectiveness)))
+
+    breathing_practices = []
+    for name, start_time, duration, effectiveness in breathing_table.rows:
+        breathing_practices.append(BreathingPractice(name, float(start_time), float(duration), float(effectiveness)))
+
+    enneagram_type_index = enneagram_var.get() - 1
+    enneagram_type = enneagram_types[enneagram_type_index]
+    return Schedule(tasks, meditation_sessions, breathing_practices, enneagram_type, initial_attention, min_attention, max_attention)
+
+# Choices for minutes covered by several tasks: the rules of attention_core.clock.OVERLAP_RULES, spelled out
+# here so the window does not import numpy, or None to run every task's minutes in list order. The first
+# one is the default.
+OVERLAP_CHOICES = {
+    "Latest task takes over": 'latest',
+    "Earliest task keeps them, later tasks drop them": 'earliest',
+    "Hardest task takes over": 'hardest',
+    "Each task in list order": None,
+}
+
+def read_overlap():
+    return OVERLAP_CHOICES[overlap_var.get()]
+
+# The run in progress, if any; see attention_core.jobs.Job
+job = None
+
+def start_job(work, name, on_done):
+    # Runs work(progress) on a worker thread; poll_job() shows its progress and hands the result to on_done()
+    global job
+    from attention_core.jobs import Job
+    job = Job(work).start()
+    run_button.config(state='disabled')
+    save_button.config(state='disabled')
+    cancel_button.config(state='normal')
+    progress_var.set(0)
+    status_var.set(f"{name}...")
+    root.after(50, poll_job, name, on_done)
 
 # Define the run_simulation_with_voluntary function
 def run_simulation_with_voluntary():
+    # Reads the entries here, since Tk widgets may only be touched from the main thread, then simulates
+    # on a worker thread. poll_job() picks up the progress and the result.
+    if job is not None:
+        return
     try:
-        initial_attention = float(initial_attention_entry.get())
-        min_attention = float(min_attention_entry.get())
-        max_attention = float(max_attention_entry.get())
-
-        tasks = []
-        for i in range(num_tasks.get()):
-            name = task_entries[i][0].get()
-            duration = float(task_entries[i][1].get())
-            difficulty = float(task_entries[i][2].get())
-            base_attention = float(task_entries[i][3].get())
-            criticality = float(task_entries[i][4].get())
-            start_time = float(task_entries[i][5].get())
-            tasks.append(Task(i, name, base_attention, difficulty, criticality, duration, start_time))
-
-        meditation_sessions = []
-        for i in range(num_meditations.get()):
-            start_time = float(meditation_entries[i][0].get())
-            duration = float(meditation_entries[i][1].get())
-            effectiveness = float(meditation_entries[i][2].get())
-            meditation_sessions.append(MeditationSession(start_time, duration, effectiveness))
-
-        breathing_practices = []
-        for i in range(num_breathings.get()):
-            name = breathing_entries[i][0].get()
-            start_time = float(breathing_entries[i][1].get())
-            duration = float(breathing_entries[i][2].get())
-            effectiveness = float(breathing_entries[i][3].get())
-            breathing_practices.append(BreathingPractice(name, start_time, duration, effectiveness))
-
-        enneagram_type_index = enneagram_var.get() - 1
-        enneagram_type = enneagram_types[enneagram_type_index]
-
-        history, attention_curve, correction_curve, meditation_points, breathing_points, voluntary_intention_points, total_attention_gain, total_breathing_gain, total_voluntary_intention_gain, accumulated_fatigue, avg_external_factors = simulate_with_voluntary(
-            tasks, initial_attention, min_attention, max_attention,
-            meditation_sessions, breathing_practices, enneagram_type, apply_meditation=True, apply_breathing=True
-        )
-
-        plot_simulation_with_voluntary(history, tasks, attention_curve, correction_curve, meditation_points, breathing_points, voluntary_intention_points, min_attention, meditation_sessions, breathing_practices)
-        correction_buffer = plot_correction_curve(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type)
-        
-        display_results(history, total_attention_gain, total_breathing_gain, total_voluntary_intention_gain, accumulated_fatigue, avg_external_factors, tasks)
-        messagebox.showinfo("Success", "Simulation complete!")
+        schedule = read_schedule()
     except ValueError:
         messagebox.showerror("Input error", "Please enter valid numbers.")
+        return
+    overlap = read_overlap()
+
+    def work(progress):
+        # The voluntary run and both correction curves come out of the same pass over the timeline
+        variants = get_simulator().simulate_variants(
+            schedule.tasks, schedule.initial_attention, schedule.min_attention, schedule.max_attention,
+            schedule.meditation_sessions, schedule.breathing_practices, schedule.enneagram_type,
+            names=('baseline', 'combined', 'voluntary'), progress=progress, overlap=overlap
+        )
+        result = variants.output('voluntary')
+        from attention_core.result import Explanation
+        return variants, result, Explanation(result, schedule.tasks, schedule.min_attention)
+
+    def show(value):
+        variants, result, explanation = value
+        update_chart(variants, schedule)
+        display_results(result, explanation)
+        messagebox.showinfo("Success", "Simulation complete!")
+
+    start_job(work, "Simulation", show)
+
+def cancel_simulation():
+    if job is not None:
+        job.cancel()
+        status_var.set("Cancelling...")
+
+def poll_job(name, on_done):
+    for message in job.poll():
+        if message[0] == 'progress':
+            _, done, total = message
+            progress_bar.config(maximum=max(total, 1))
+            progress_var.set(done)
+            status_var.set(f"Simulated {done} of {total} minutes")
+        elif message[0] == 'done':
+            finish_job(f"{name} complete")
+            on_done(message[1])
+        elif message[0] == 'cancelled':
+            finish_job(f"{name} cancelled")
+        elif message[0] == 'error':
+            finish_job(f"{name} failed")
+            if isinstance(message[1], ValueError):
+                messagebox.showerror("Input error", "Please enter valid numbers.")
+            else:
+                messagebox.showerror(f"{name} error", str(message[1]))
+    if job is not None and not job.finished:
+        root.after(50, poll_job, name, on_done)
+
+def finish_job(status):
+    global job
+    job = None
+    run_button.config(state='normal')
+    save_button.config(state='normal')
+    cancel_button.config(state='disabled')
+    status_var.set(status)
 
 # Define other necessary functions for the GUI
 def create_input_frame(label_text, row, container):
@@ -331,129 +301,235 @@ def create_input_frame(label_text, row, container):
     container.grid_columnconfigure(1, weight=1)
     return entry
 
-def create_task_input_frame(row, task_num, container):
-    frame = ttk.LabelFrame(container, text=f"Task {task_num + 1}", padding="10")
-    frame.grid(row=row, column=0, columnspan=2, sticky=(tk.W, tk.E))
-
-    name_entry = create_labeled_entry(frame, "Name:", 0)
-    duration_entry = create_labeled_entry(frame, "Duration (min):", 1)
-    difficulty_entry = create_labeled_entry(frame, "Difficulty (1-5):", 2)
-    base_attention_entry = create_labeled_entry(frame, "Base Attention (1-5):", 3)
-    criticality_entry = create_labeled_entry(frame, "Criticality (0-5):", 4)
-    start_time_entry = create_labeled_entry(frame, "Start Time (min):", 5)
-
-    return [name_entry, duration_entry, difficulty_entry, base_attention_entry, criticality_entry, start_time_entry]
-
-def create_meditation_input_frame(row, session_num, container):
-    frame = ttk.LabelFrame(container, text=f"Meditation Session {session_num + 1}", padding="10")
-    frame.grid(row=row, column=0, columnspan=2, sticky=(tk.W, tk.E))
-
-    start_time_entry = create_labeled_entry(frame, "Start Time (min):", 0)
-    duration_entry = create_labeled_entry(frame, "Duration (min):", 1)
-    effectiveness_entry = create_labeled_entry(frame, "Effectiveness (0-7):", 2)
-
-    return [start_time_entry, duration_entry, effectiveness_entry]
-
-def create_breathing_input_frame(row, practice_num, container):
-    frame = ttk.LabelFrame(container, text=f"Breathing Practice {practice_num + 1}", padding="10")
-    frame.grid(row=row, column=0, columnspan=2, sticky=(tk.W, tk.E))
-
-    name_entry = create_labeled_entry(frame, "Name:", 0)
-    start_time_entry = create_labeled_entry(frame, "Start Time (min):", 1)
-    duration_entry = create_labeled_entry(frame, "Duration (min):", 2)
-    effectiveness_entry = create_labeled_entry(frame, "Effectiveness (0-7):", 3)
-
-    return [name_entry, start_time_entry, duration_entry, effectiveness_entry]
-
-def create_labeled_entry(parent, label_text, row):
-    label = ttk.Label(parent, text=label_text)
-    label.grid(row=row, column=0, sticky=tk.W)
-    entry = ttk.Entry(parent)
-    entry.grid(row=row, column=1, sticky=(tk.W, tk.E))
-    parent.grid_columnconfigure(1, weight=1)
-    return entry
-
-def on_num_tasks_change(*args):
-    for widget in task_frames:
-        widget.destroy()
-    task_frames.clear()
-    task_entries.clear()
-    for i in range(num_tasks.get()):
-        task_frames.append(create_task_input_frame(i + 6, i, scrollable_frame))
-        task_entries.append(task_frames[-1])
-    update_layout()
-
-def on_num_meditations_change(*args):
-    for widget in meditation_frames:
-        widget.destroy()
-    meditation_frames.clear()
-    meditation_entries.clear()
-    for i in range(num_meditations.get()):
-        meditation_frames.append(create_meditation_input_frame(i + len(task_frames) + 6, i, scrollable_frame))
-        meditation_entries.append(meditation_frames[-1])
-    update_layout()
-
-def on_num_breathings_change(*args):
-    for widget in breathing_frames:
-        widget.destroy()
-    breathing_frames.clear()
-    breathing_entries.clear()
-    for i in range(num_breathings.get()):
-        breathing_frames.append(create_breathing_input_frame(i + len(task_frames) + len(meditation_frames) + 6, i, scrollable_frame))
-        breathing_entries.append(breathing_frames[-1])
-    update_layout()
-
-def update_layout():
-    enneagram_frame.grid(row=len(task_frames) + len(meditation_frames) + len(breathing_frames) + 6, column=0, columnspan=2, sticky=(tk.W, tk.E))
-    run_button.grid(row=len(task_frames) + len(meditation_frames) + len(breathing_frames) + 7, column=0, columnspan=2, pady=10)
-    save_button.grid(row=len(task_frames) + len(meditation_frames) + len(breathing_frames) + 8, column=0, columnspan=2, pady=10)
-
-def display_results(history, total_attention_gain, total_breathing_gain, total_voluntary_intention_gain, accumulated_fatigue, avg_external_factors, tasks):
+def parse_rows(text, columns):
+    # Rows pasted from a spreadsheet or a CSV file. A first row naming the columns picks and orders
+    # them; without one the cells are taken in table order. Missing cells are left empty.
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',\t;')
+    except csv.Error:
+        dialect = csv.excel
+    rows = [[cell.strip() for cell in row] for row in csv.reader(io.StringIO(text), dialect) if any(cell.strip() for cell in row)]
+    header = [cell.lower().replace(' ', '_') for cell in rows[0]] if rows else []
+    if any(column in header for column in columns):
+        positions = [header.index(column) if column in header else None for column in columns]
+        rows = rows[1:]
+    else:
+        positions = list(range(len(columns)))
+    return [[row[i] if i is not None and i < len(row) else '' for i in positions] for row in rows]
+
+class TableEditor:
+    # Editable table of tasks, meditation sessions or breathing practices. The Treeview only draws the
+    # rows scrolled into view and one Entry is moved over the cell being edited, so a schedule with
+    # thousands of rows needs no more widgets than an empty one. `rows` holds the text of every cell;
+    # changing `count_var` adds or removes rows at the end and leaves the others alone.
+    def __init__(self, parent, title, columns, count_var, on_change):
+        self.columns = [column for column, heading in columns]
+        self.count_var = count_var
+        self.on_change = on_change
+        self.rows = []
+        self.editing = None
+
+        self.frame = ttk.LabelFrame(parent, text=title, padding="10")
+        self.tree = ttk.Treeview(self.frame, columns=self.columns, height=8, selectmode='browse')
+        self.tree.heading('#0', text='#')
+        self.tree.column('#0', width=50, stretch=False)
+        for column, heading in columns:
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=110)
+        scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        ttk.Button(self.frame, text="Paste CSV", command=self.paste).grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        self.frame.grid_columnconfigure(0, weight=1)
+
+        self.entry = ttk.Entry(self.tree)
+        self.entry.bind('<Return>', lambda event: self.end_edit())
+        self.entry.bind('<KP_Enter>', lambda event: self.end_edit())
+        self.entry.bind('<Escape>', lambda event: self.end_edit(commit=False))
+        self.entry.bind('<FocusOut>', lambda event: self.end_edit())
+        self.entry.bind('<Tab>', lambda event: self.move(1))
+        self.entry.bind('<Shift-Tab>', lambda event: self.move(-1))
+        self.entry.bind('<ISO_Left_Tab>', lambda event: self.move(-1))
+        self.tree.bind('<Double-1>', self.on_double_click)
+        self.tree.bind('<Return>', self.on_return)
+        # The edit box stays over its cell only while the rows do not move
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.tree.bind(sequence, lambda event: self.end_edit(), add=True)
+        scrollbar.bind('<ButtonPress-1>', lambda event: self.end_edit(), add=True)
+        count_var.trace('w', self.on_count_change)
+
+    def resize(self, count):
+        self.end_edit()
+        if count < len(self.rows):
+            self.tree.delete(*[str(i) for i in range(count, len(self.rows))])
+            del self.rows[count:]
+        for i in range(len(self.rows), count):
+            self.rows.append([''] * len(self.columns))
+            self.tree.insert('', tk.END, iid=str(i), text=str(i + 1), values=self.rows[i])
+
+    def on_count_change(self, *args):
+        try:
+            count = self.count_var.get()
+        except tk.TclError:
+            return
+        if count >= 0 and count != len(self.rows):
+            self.resize(count)
+
+    def on_double_click(self, event):
+        row, column = self.tree.identify_row(event.y), self.tree.identify_column(event.x)
+        if row and column != '#0':
+            self.edit(int(row), int(column[1:]) - 1)
+
+    def on_return(self, event):
+        if self.tree.focus():
+            self.edit(int(self.tree.focus()), 0)
+
+    def edit(self, row, column):
+        self.end_edit()
+        self.tree.see(str(row))
+        self.tree.update_idletasks()
+        bbox = self.tree.bbox(str(row), self.columns[column])
+        if not bbox:
+            return
+        x, y, width, height = bbox
+        self.editing = (row, column)
+        self.tree.selection_set(str(row))
+        self.tree.focus(str(row))
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, self.rows[row][column])
+        self.entry.select_range(0, tk.END)
+        self.entry.place(x=x, y=y, width=width, height=height)
+        self.entry.focus_set()
+
+    def end_edit(self, commit=True):
+        if self.editing is None:
+            return
+        row, column = self.editing
+        self.editing = None
+        value = self.entry.get()
+        self.entry.place_forget()
+        self.tree.focus_set()
+        if commit and value != self.rows[row][column]:
+            self.rows[row][column] = value
+            self.tree.set(str(row), self.columns[column], value)
+            self.on_change()
+
+    def move(self, step):
+        # Tab and Shift-Tab go to the next and previous cell, wrapping around to the next and previous row
+        row, column = self.editing
+        position = row * len(self.columns) + column + step
+        self.end_edit()
+        if 0 <= position < len(self.rows) * len(self.columns):
+            self.edit(*divmod(position, len(self.columns)))
+        return 'break'
+
+    def paste(self):
+        try:
+            text = self.tree.clipboard_get()
+        except tk.TclError:
+            return
+        self.paste_rows(parse_rows(text, self.columns))
+
+    def paste_rows(self, rows):
+        # Overwrites rows from the selected one, or from the first empty one, adding rows as needed
+        if not rows:
+            return
+        self.end_edit(commit=False)
+        selection = self.tree.selection()
+        empty = [i for i, row in enumerate(self.rows) if not any(row)]
+        start = int(selection[0]) if selection else (empty[0] if empty else len(self.rows))
+        if start + len(rows) > len(self.rows):
+            self.resize(start + len(rows))
+        for i, row in enumerate(rows, start):
+            self.rows[i] = row
+            self.tree.item(str(i), values=row)
+        self.count_var.set(len(self.rows))
+        self.on_change()
+
+# Entries of the attention curve analysis shown per page of the results window
+RESULTS_PAGE = 100
+
+def results_header(result):
+    yield f"Total attention gain from meditation: {result.total_attention_gain}"
+    yield f"Total attention gain from breathing practices: {result.total_breathing_gain}"
+    yield f"Total attention gain from voluntary intention: {result.total_voluntary_intention_gain}"
+    yield ""
+    yield "Attention Curve Analysis:"
+
+def results_footer(result):
+    yield ""
+    yield f"Total Accumulated Fatigue: {result.accumulated_fatigue}"
+    yield f"Average External Factors: {result.avg_external_factors}"
+
+def display_results(result, explanation):
+    # Shows one page of the analysis at a time; only the lines of that page are ever formatted
     result_window = tk.Toplevel(root)
     result_window.title("Simulation Results")
 
-    text = tk.Text(result_window, wrap='word', width=100, height=30, state='normal')
-    text.grid(row=0, column=0, padx=10, pady=10)
-
-    results = f"Total attention gain from meditation: {total_attention_gain}\n"
-    results += f"Total attention gain from breathing practices: {total_breathing_gain}\n"
-    results += f"Total attention gain from voluntary intention: {total_voluntary_intention_gain}\n\n"
-    results += explain_attention_curve(history, tasks)
-    results += f"\nTotal Accumulated Fatigue: {accumulated_fatigue}\n"
-    results += f"Average External Factors: {avg_external_factors}\n"
-
-    text.insert(tk.END, results)
-    text.config(state='disabled')
-
-def explain_attention_curve(history, tasks):
-    result = "\nAttention Curve Analysis:\n"
-    previous_task = None
-    for entry in history:
-        time, task_id, attention_level, fatigue_factor = entry
-        task_name = tasks[task_id].name if task_id is not None else "No task"
-
-        if task_name != previous_task:
-            result += f"Time: {time} minutes - Attention shifted to: {task_name}\n"
-            result += f"Fatigue Factor: {fatigue_factor}\n"
-            result += f"Attention Level: {attention_level}\n"
-            previous_task = task_name
-
-    return result
+    text = tk.Text(result_window, wrap='word', width=100, height=30, state='disabled')
+    text.grid(row=0, column=0, columnspan=4, padx=10, pady=10)
+    page_label = ttk.Label(result_window)
+    page_label.grid(row=1, column=1)
+    pages = max(1, -(-len(explanation) // RESULTS_PAGE))
+    current = [0]
+
+    def show(page):
+        page = min(max(page, 0), pages - 1)
+        current[0] = page
+        lines = list(explanation.lines(page * RESULTS_PAGE, (page + 1) * RESULTS_PAGE))
+        if page == 0:
+            lines = list(results_header(result)) + lines
+        if page == pages - 1:
+            lines += results_footer(result)
+        text.config(state='normal')
+        text.delete('1.0', tk.END)
+        text.insert(tk.END, "\n".join(lines))
+        text.config(state='disabled')
+        page_label.config(text=f"Page {page + 1} of {pages}")
+
+    ttk.Button(result_window, text="Previous", command=lambda: show(current[0] - 1)).grid(row=1, column=0, pady=(0, 10))
+    ttk.Button(result_window, text="Next", command=lambda: show(current[0] + 1)).grid(row=1, column=2, pady=(0, 10))
+    ttk.Button(result_window, text="Export...", command=lambda: export_results(result, explanation)).grid(row=1, column=3, pady=(0, 10))
+    show(0)
+
+def export_results(result, explanation):
+    # Writes the whole text line by line instead of building it in memory first
+    path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text files", "*.txt")])
+    if path:
+        with open(path, 'w') as f:
+            for lines in (results_header(result), explanation.lines(), results_footer(result)):
+                for line in lines:
+                    f.write(line + "\n")
+        messagebox.showinfo("Success", "Results exported!")
 
 def save_simulation_with_voluntary():
-    result = run_simulation_with_voluntary()
-    if result:
-        history, attention_curve, tasks, meditation_sessions, breathing_practices, min_attention, buffer, correction_buffer, total_attention_gain, total_breathing_gain, accumulated_fatigue, avg_external_factors = result
-        save_pdf(history, attention_curve, tasks, meditation_sessions, breathing_practices, min_attention, buffer, correction_buffer, total_attention_gain, total_breathing_gain, accumulated_fatigue, avg_external_factors)
-        messagebox.showinfo("Success", "PDF saved!")
+    # Simulating and rendering the report run on a worker thread like a simulation, and can be cancelled
+    # the same way; reportlab only writes the file at the end, so a cancelled report leaves nothing behind
+    if job is not None:
+        return
+    try:
+        schedule = read_schedule()
+    except ValueError:
+        messagebox.showerror("Input error", "Please enter valid numbers.")
+        return
+    overlap = read_overlap()
+    path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
+    if path:
+        def work(progress):
+            from attention_core.report import write_report
+            return write_report(path, [schedule], voluntary=True, progress=progress, overlap=overlap)
+
+        start_job(work, "PDF export", lambda pages: messagebox.showinfo("Success", "PDF saved!"))
 
 # Initialize the GUI
 root = tk.Tk()
 root.title("Attention Simulation")
-root.geometry("600x400")  # Imposta la finestra a medie dimensioni
+root.geometry("1600x800")  # Room for the inputs and the chart side by side
 # Configura la griglia principale per espandersi con la finestra
 root.grid_rowconfigure(0, weight=1)
 root.grid_columnconfigure(0, weight=1)
+root.grid_columnconfigure(2, weight=3)
 
 canvas = tk.Canvas(root)
 scrollbar = ttk.Scrollbar(root, orient="vertical", command=canvas.yview)
@@ -473,6 +549,11 @@ canvas.configure(yscrollcommand=scrollbar.set)
 canvas.grid(row=0, column=0, sticky="nsew")
 scrollbar.grid(row=0, column=1, sticky="ns")
 
+chart_frame = ttk.Frame(root)
+chart_frame.grid(row=0, column=2, sticky="nsew")
+chart_frame.grid_rowconfigure(0, weight=1)
+chart_frame.grid_columnconfigure(0, weight=1)
+
 # Configura la griglia del canvas per espandersi
 scrollable_frame.grid_columnconfigure(0, weight=1)
 
@@ -481,40 +562,34 @@ min_attention_entry = create_input_frame("Minimum Attention Threshold:", 1, scro
 max_attention_entry = create_input_frame("Maximum Attention Level:", 2, scrollable_frame)
 
 num_tasks = tk.IntVar()
-num_tasks.trace('w', on_num_tasks_change)
 task_num_entry = create_input_frame("Enter the number of tasks:", 3, scrollable_frame)
 task_num_entry.config(textvariable=num_tasks)
 
 num_meditations = tk.IntVar()
-num_meditations.trace('w', on_num_meditations_change)
 meditation_num_entry = create_input_frame("Enter the number of meditation sessions:", 4, scrollable_frame)
 meditation_num_entry.config(textvariable=num_meditations)
 
 num_breathings = tk.IntVar()
-num_breathings.trace('w', on_num_breathings_change)
 breathing_num_entry = create_input_frame("Enter the number of breathing practices:", 5, scrollable_frame)
 breathing_num_entry.config(textvariable=num_breathings)
 
-task_frames = []
-task_entries = []
+task_table = TableEditor(scrollable_frame, "Tasks", [
+    ('name', "Name"), ('duration', "Duration (min)"), ('difficulty', "Difficulty (1-5)"),
+    ('base_attention', "Base Attention (1-5)"), ('criticality', "Criticality (0-5)"), ('start_time', "Start Time (min)"),
+], num_tasks, schedule_refresh)
+task_table.frame.grid(row=6, column=0, columnspan=2, sticky=(tk.W, tk.E))
 
-meditation_frames = []
-meditation_entries = []
+meditation_table = TableEditor(scrollable_frame, "Meditation Sessions", [
+    ('start_time', "Start Time (min)"), ('duration', "Duration (min)"), ('effectiveness', "Effectiveness (0-7)"),
+], num_meditations, schedule_refresh)
+meditation_table.frame.grid(row=7, column=0, columnspan=2, sticky=(tk.W, tk.E))
 
-breathing_frames = []
-breathing_entries = []
+breathing_table = TableEditor(scrollable_frame, "Breathing Practices", [
+    ('name', "Name"), ('start_time', "Start Time (min)"), ('duration', "Duration (min)"), ('effectiveness', "Effectiveness (0-7)"),
+], num_breathings, schedule_refresh)
+breathing_table.frame.grid(row=8, column=0, columnspan=2, sticky=(tk.W, tk.E))
 
-enneagram_types = [
-    EnneagramType(1, "Reformer", ["Precision", "Discipline"]),
-    EnneagramType(2, "Helper", ["Empathy", "Generosity"]),
-    EnneagramType(3, "Achiever", ["Focus", "Drive"]),
-    EnneagramType(4, "Individualist", ["Creativity", "Authenticity"]),
-    EnneagramType(5, "Investigator", ["Observation", "Analysis"]),
-    EnneagramType(6, "Loyalist", ["Loyalty", "Responsibility"]),
-    EnneagramType(7, "Enthusiast", ["Enthusiasm", "Curiosity"]),
-    EnneagramType(8, "Challenger", ["Strength", "Protection"]),
-    EnneagramType(9, "Peacemaker", ["Harmony", "Peace"])
-]
+enneagram_types = ENNEAGRAM_TYPES
 
 enneagram_var = tk.IntVar()
 enneagram_frame = ttk.LabelFrame(scrollable_frame, text="Select your Enneagram type:", padding="10")
@@ -523,10 +598,33 @@ for i, et in enumerate(enneagram_types):
     radio_button = ttk.Radiobutton(enneagram_frame, text=et.name, variable=enneagram_var, value=i+1)
     radio_button.grid(row=i, column=0, sticky=tk.W)
 
+overlap_var = tk.StringVar(value=next(iter(OVERLAP_CHOICES)))
+overlap_frame = ttk.Frame(scrollable_frame, padding="10")
+ttk.Label(overlap_frame, text="Overlapping tasks:").grid(row=0, column=0, sticky=tk.W)
+ttk.Combobox(overlap_frame, textvariable=overlap_var, values=list(OVERLAP_CHOICES), state='readonly', width=45).grid(row=0, column=1, sticky=(tk.W, tk.E))
+
 run_button = ttk.Button(scrollable_frame, text="Run Simulation", command=run_simulation_with_voluntary)
 save_button = ttk.Button(scrollable_frame, text="Save PDF", command=save_simulation_with_voluntary)
 
-# Inizializza il layout
-update_layout()
+# Progress of a running simulation, in simulated minutes
+progress_frame = ttk.Frame(scrollable_frame, padding="10")
+progress_var = tk.IntVar()
+status_var = tk.StringVar()
+progress_bar = ttk.Progressbar(progress_frame, mode='determinate', variable=progress_var)
+progress_bar.grid(row=0, column=0, sticky=(tk.W, tk.E))
+cancel_button = ttk.Button(progress_frame, text="Cancel", command=cancel_simulation, state='disabled')
+cancel_button.grid(row=0, column=1, padx=(10, 0))
+ttk.Label(progress_frame, textvariable=status_var).grid(row=1, column=0, columnspan=2, sticky=tk.W)
+progress_frame.grid_columnconfigure(0, weight=1)
+
+enneagram_frame.grid(row=9, column=0, columnspan=2, sticky=(tk.W, tk.E))
+overlap_frame.grid(row=10, column=0, columnspan=2, sticky=(tk.W, tk.E))
+run_button.grid(row=11, column=0, columnspan=2, pady=10)
+save_button.grid(row=12, column=0, columnspan=2, pady=10)
+progress_frame.grid(row=13, column=0, columnspan=2, sticky=(tk.W, tk.E))
+
+root.bind_all('<KeyRelease>', on_key_release)
+enneagram_var.trace('w', schedule_refresh)
+overlap_var.trace('w', schedule_refresh)
 
 root.mainloop()
@@ -1,43 +1,20 @@
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-
-class Task:
-    def __init__(self, task_id, name, base_attention, difficulty, criticality, duration, start_time):
-        self.task_id = task_id
-        self.name = name
-        self.base_attention = base_attention
-        self.difficulty = difficulty
-        self.criticality = criticality
-        self.duration = duration
-        self.start_time = start_time
-
-class MeditationSession:
-    def __init__(self, start_time, duration, effectiveness):
-        self.start_time = start_time
-        self.duration = duration
-        self.effectiveness = effectiveness
-
-class BreathingPractice:
-    def __init__(self, name, start_time, duration, effectiveness):
-        self.name = name
-        self.start_time = start_time
-        self.duration = duration
-        self.effectiveness = effectiveness
-
-class EnneagramType:
-    def __init__(self, type_id, name, transmutation_practices):
-        self.type_id = type_id
-        self.name = name
-        self.transmutation_practices = transmutation_practices
-
-    def apply_effects(self, attention_level):
-        # Example effects based on Enneagram type
-        if self.type_id == 1:
-            attention_level += 5  # Reformer gets a slight attention boost
-        elif self.type_id == 2:
-            attention_level += 3  # Helper gets a smaller attention boost
-        # Add other types and effects as needed
-        return attention_level
+import argparse
+from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Task
+
+# The engine, matplotlib and the batch runner are imported where they are first used, so that --help
+# and batch runs start without loading the plotting stack
+
+def validate_input(prompt, convert, error_message):
+    # Asks until `convert` accepts the answer. The range checks return ValueError() instead of raising it,
+    # so a returned exception counts as a rejection too.
+    while True:
+        try:
+            value = convert(input(prompt))
+            if isinstance(value, Exception):
+                raise value
+            return value
+        except ValueError:
+            print(error_message)
 
 
 def get_task_details():
@@ -92,17 +69,7 @@ def get_breathing_practices():
     return practices
 
 def get_enneagram_type():
-    enneagram_types = [
-        EnneagramType(1, "Reformer", ["Precision", "Discipline"]),
-        EnneagramType(2, "Helper", ["Empathy", "Generosity"]),
-        EnneagramType(3, "Achiever", ["Focus", "Drive"]),
-        EnneagramType(4, "Individualist", ["Creativity", "Authenticity"]),
-        EnneagramType(5, "Investigator", ["Observation", "Analysis"]),
-        EnneagramType(6, "Loyalist", ["Loyalty", "Responsibility"]),
-        EnneagramType(7, "Enthusiast", ["Enthusiasm", "Curiosity"]),
-        EnneagramType(8, "Challenger", ["Strength", "Protection"]),
-        EnneagramType(9, "Peacemaker", ["Harmony", "Peace"])
-    ]
+    enneagram_types = ENNEAGRAM_TYPES
 
     print("Select your Enneagram type:")
     for et in enneagram_types:
@@ -186,144 +153,32 @@ def modify_values(tasks, meditation_sessions, breathing_practices, initial_atten
 
     return tasks, meditation_sessions, breathing_practices, initial_attention, min_attention, max_attention
 
-def simulate(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation, apply_breathing):
-    history = []
-    attention_curve = []
-    meditation_points = []
-    breathing_points = []
-    total_attention_gain = 0
-    total_breathing_gain = 0
-    current_time = 0
-    attention_level = initial_attention
-
-    # Apply initial Enneagram effects
-    attention_level = enneagram_type.apply_effects(attention_level)
-
-    for task in tasks:
-        current_time = task.start_time
-        task_end_time = task.start_time + task.duration
-        while current_time < task_end_time:
-            if apply_meditation:
-                for session in meditation_sessions:
-                    if session.start_time <= current_time < session.start_time + session.duration:
-                        attention_level += session.effectiveness
-                        if attention_level > max_attention:
-                            attention_level = max_attention
-                        meditation_points.append((current_time, attention_level))
-                        total_attention_gain += session.effectiveness
-
-            if apply_breathing:
-                for practice in breathing_practices:
-                    if practice.start_time <= current_time < practice.start_time + practice.duration:
-                        attention_level += practice.effectiveness
-                        if attention_level > max_attention:
-                            attention_level = max_attention
-                        breathing_points.append((current_time, attention_level))
-                        total_breathing_gain += practice.effectiveness
-
-            # Apply Law of Octaves and Law of Three
-            if (current_time % 7 == 0):  # Law of Octaves
-                attention_level += 10  # Example boost for octave
-            if (current_time % 3 == 0):  # Law of Three
-                attention_level -= 5  # Example reduction for interval
-
-            attention_level -= task.difficulty
-            #if attention_level < min_attention:
-                #attention_level = min_attention
-
-            history.append((current_time, task.task_id, attention_level, task.difficulty))
-            attention_curve.append((current_time, task.task_id, task.difficulty, attention_level))
-            current_time += 1
-
-    accumulated_fatigue = sum(task.difficulty for task in tasks)
-    avg_external_factors = sum(task.criticality for task in tasks) / len(tasks) if tasks else 0
-    return history, attention_curve, meditation_points, breathing_points, total_attention_gain, total_breathing_gain, accumulated_fatigue, avg_external_factors
-
-
-def plot_simulation(history, tasks, attention_curve, meditation_points, breathing_points, min_attention, meditation_sessions, breathing_practices):
+def plot_simulation(result, tasks, min_attention, meditation_sessions, breathing_practices):
+    import matplotlib.pyplot as plt
+    from attention_core.plotting import draw_simulation
     plt.figure(figsize=(12, 6))
-    attention_times = [entry[0] for entry in attention_curve]
-    attention_levels = [entry[3] for entry in attention_curve]
-
-    plt.plot(attention_times, attention_levels, label='Attention Level', color='b')
-
-    for task in tasks:
-        plt.axvspan(task.start_time, task.start_time + task.duration, alpha=0.2, color='yellow', label=f'Task: {task.name}')
-
-    for session in meditation_sessions:
-        plt.axvspan(session.start_time, session.start_time + session.duration, alpha=0.2, color='green', label='Meditation')
-
-    for practice in breathing_practices:
-        plt.axvspan(practice.start_time, practice.start_time + practice.duration, alpha=0.2, color='purple', label='Breathing')
-
-    for meditation_time, attention_level in meditation_points:
-        plt.scatter(meditation_time, attention_level, color='r', s=50, label='Meditation Point' if meditation_time == meditation_points[0][0] else "")
-
-    for breathing_time, attention_level in breathing_points:
-        plt.scatter(breathing_time, attention_level, color='pink', s=50, label='Breathing Point' if breathing_time == breathing_points[0][0] else "")
-
-    # Highlight Law of Octaves and Law of Three intervals
-    for time in range(int(max(attention_times))):
-        if time % 7 == 0:
-            plt.axvline(x=time, color='blue', linestyle='--', label='Law of Octaves' if time == 0 else "")
-        if time % 3 == 0:
-            plt.axvline(x=time, color='red', linestyle='--', label='Law of Three' if time == 0 else "")
-
-    plt.axhline(y=min_attention, color='gray', linestyle='--', label='Min Attention Threshold')
-    plt.xlabel('Global Clock (minutes)')
-    plt.ylabel('Attention Level')
-    plt.title('Attention Level Over Time Considering Fatigue, Task Difficulty, Meditation, and Breathing Practices')
-    plt.grid(True)
-    plt.legend(loc='upper left', bbox_to_anchor=(1, 1), title="Legend")
+    draw_simulation(plt.gca(), result, tasks, min_attention, meditation_sessions, breathing_practices)
     plt.tight_layout()
     plt.show()
 
 
-def plot_correction_curve(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type):
-    # Simulate without meditation and breathing
-    _, attention_curve_no_meditation, _, _, _, _, _, _ = simulate(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation=False, apply_breathing=False)
-    # Simulate with meditation and breathing
-    _, attention_curve_with_meditation_breathing, _, _, _, _, _, _ = simulate(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation=True, apply_breathing=True)
-
+def plot_correction_curve(variants, min_attention):
+    import matplotlib.pyplot as plt
+    from attention_core.plotting import draw_correction_curve
     plt.figure(figsize=(12, 6))
-
-    # Plot attention curve without meditation and breathing
-    times_no_meditation = [entry[0] for entry in attention_curve_no_meditation]
-    levels_no_meditation = [entry[3] for entry in attention_curve_no_meditation]
-    plt.plot(times_no_meditation, levels_no_meditation, label='Attention without Meditation/Breathing', color='b')
-
-    # Plot attention curve with meditation and breathing
-    times_with_meditation_breathing = [entry[0] for entry in attention_curve_with_meditation_breathing]
-    levels_with_meditation_breathing = [entry[3] for entry in attention_curve_with_meditation_breathing]
-    plt.plot(times_with_meditation_breathing, levels_with_meditation_breathing, label='Attention with Meditation/Breathing', color='g')
-
-    plt.axhline(y=min_attention, color='gray', linestyle='--', label='Min Attention Threshold')
-    plt.xlabel('Global Clock (minutes)')
-    plt.ylabel('Attention Level')
-    plt.title('Attention Level Correction Curve Due to Meditation and Breathing Practices')
-    plt.grid(True)
-    plt.legend(loc='upper left', bbox_to_anchor=(1, 1), title="Legend")
+    draw_correction_curve(plt.gca(), variants, min_attention)
     plt.tight_layout()
     plt.show()
 
 
-def explain_attention_curve(attention_task_ids, task_names, fatigue_factors, continuous_times, attention_levels, meditation_points, breathing_points, total_fatigue, avg_external_factors):
+def explain_attention_curve(result, tasks):
+    from attention_core.result import analysis_lines
     print("\nAttention Curve Analysis:")
-    previous_task = None
-    for idx, task_id in enumerate(attention_task_ids):
-        if task_id is None or task_id >= len(task_names):
-            task_name = "No task"
-        else:
-            task_name = task_names[task_id]
+    for line in analysis_lines(result, tasks):
+        print(line)
 
-        if task_name != previous_task:
-            print(f"Time: {continuous_times[idx]} minutes - Attention shifted to: {task_name}")
-            print(f"Fatigue Factor: {fatigue_factors[idx]}")
-            print(f"Attention Level: {attention_levels[idx]}")
-            previous_task = task_name
-
-    print(f"Total Accumulated Fatigue: {total_fatigue}")
-    print(f"Average External Factors: {avg_external_factors}")
+    print(f"Total Accumulated Fatigue: {result.accumulated_fatigue}")
+    print(f"Average External Factors: {result.avg_external_factors}")
 
 def create_custom_template():
     print("Enter your custom template details:")
@@ -344,56 +199,87 @@ def create_custom_template():
     )
     return custom_task
 
-# Main program
-while True:
-    tasks = get_task_details()
-    initial_attention = validate_input("Enter the initial attention level (e.g., 100): ", float, "Please enter a valid initial attention level.")
-    min_attention = validate_input("Enter the minimum attention threshold (e.g., 50): ", float, "Please enter a valid minimum attention threshold.")
-    max_attention = validate_input("Enter the maximum attention level (e.g., 100): ", float, "Please enter a valid maximum attention level.")
-    meditation_sessions = get_meditation_sessions()
-    breathing_practices = get_breathing_practices()
-    enneagram_type = get_enneagram_type()
+def interactive(overlap='latest'):
+    from attention_core.cache import CachedSimulator
+    from attention_core.incremental import IncrementalSimulator
+    # Remembers the last run so that after an edit only the changed part of the timeline is re-simulated,
+    # and every earlier result, so running an unchanged or reverted schedule is not simulated again
+    simulator = CachedSimulator(simulator=IncrementalSimulator())
+    while True:
+        tasks = get_task_details()
+        initial_attention = validate_input("Enter the initial attention level (e.g., 100): ", float, "Please enter a valid initial attention level.")
+        min_attention = validate_input("Enter the minimum attention threshold (e.g., 50): ", float, "Please enter a valid minimum attention threshold.")
+        max_attention = validate_input("Enter the maximum attention level (e.g., 100): ", float, "Please enter a valid maximum attention level.")
+        meditation_sessions = get_meditation_sessions()
+        breathing_practices = get_breathing_practices()
+        enneagram_type = get_enneagram_type()
 
-    # Choose Enneagram keyword
-    #enneagram_keyword = input("Enter a keyword for your Enneagram type influence: ")
+        # Choose Enneagram keyword
+        #enneagram_keyword = input("Enter a keyword for your Enneagram type influence: ")
 
-    tasks, meditation_sessions, breathing_practices, initial_attention, min_attention, max_attention = modify_values(tasks, meditation_sessions, breathing_practices, initial_attention, min_attention, max_attention)
+        tasks, meditation_sessions, breathing_practices, initial_attention, min_attention, max_attention = modify_values(tasks, meditation_sessions, breathing_practices, initial_attention, min_attention, max_attention)
 
-    history, attention_curve, meditation_points, breathing_points, total_attention_gain, total_breathing_gain, accumulated_fatigue, avg_external_factors = simulate(
-        tasks, initial_attention, min_attention, max_attention,
-        meditation_sessions, breathing_practices, enneagram_type, apply_meditation=True, apply_breathing=True
-    )
-    plot_simulation(history, tasks, attention_curve, meditation_points, breathing_points, min_attention, meditation_sessions, breathing_practices)
-    plot_correction_curve(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type)
-
-    total_attention_recovered = sum(session.duration * session.effectiveness for session in meditation_sessions)
-    total_breathing_recovered = sum(practice.duration * practice.effectiveness for practice in breathing_practices)
-    print(f"\nTotal attention gain from meditation: {total_attention_recovered}")
-    print(f"Total attention gain from breathing practices: {total_breathing_recovered}")
-
-    continuous_times = [entry[0] for entry in attention_curve]
-    attention_levels = [entry[3] for entry in attention_curve]
-
-    explain_attention_curve(
-        [entry[1] for entry in attention_curve],
-        [task.name for task in tasks],
-        [entry[2] for entry in attention_curve],
-        continuous_times,
-        attention_levels,
-        meditation_points,
-        breathing_points,
-        accumulated_fatigue,
-        avg_external_factors
-    )
+        # Baseline and intervention curves come out of the same pass over the timeline
+        variants = simulator.simulate_variants(
+            tasks, initial_attention, min_attention, max_attention,
+            meditation_sessions, breathing_practices, enneagram_type, names=('baseline', 'combined'), overlap=overlap
+        )
+        result = variants.output('combined')
+        plot_simulation(result, tasks, min_attention, meditation_sessions, breathing_practices)
+        plot_correction_curve(variants, min_attention)
+
+        total_attention_recovered = sum(session.duration * session.effectiveness for session in meditation_sessions)
+        total_breathing_recovered = sum(practice.duration * practice.effectiveness for practice in breathing_practices)
+        print(f"\nTotal attention gain from meditation: {total_attention_recovered}")
+        print(f"Total attention gain from breathing practices: {total_breathing_recovered}")
+
+        explain_attention_curve(result, tasks)
+
+        action = input("Do you want to run the program again, modify values, or exit? (run/modify/exit): ").strip().lower()
+        if action == "exit":
+            break
+        elif action == "modify":
+            tasks, meditation_sessions, breathing_practices, initial_attention, min_attention, max_attention = modify_values(tasks, meditation_sessions, breathing_practices, initial_attention, min_attention, max_attention)
+        elif action == "run":
+            continue
+        else:
+            print("Invalid option. Exiting the program.")
+            break
 
-    action = input("Do you want to run the program again, modify values, or exit? (run/modify/exit): ").strip().lower()
-    if action == "exit":
-        break
-    elif action == "modify":
-        tasks, meditation_sessions, breathing_practices, initial_attention, min_attention, max_attention = modify_values(tasks, meditation_sessions, breathing_practices, initial_attention, min_attention, max_attention)
-    elif action == "run":
-        continue
-    else:
-        print("Invalid option. Exiting the program.")
-        break
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate attention over a schedule. Without schedule files it asks for one interactively.")
+    parser.add_argument('schedules', nargs='*', help="JSON or CSV schedule files to simulate unattended")
+    parser.add_argument('-o', '--output', default='results', help="directory for the per-plan curves and summary.csv (default: results)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--voluntary', action='store_true', help="include voluntary intention")
+    parser.add_argument('--cache', metavar='DIR', help="keep simulated results in DIR and reuse them for unchanged plans")
+    parser.add_argument('--overlap', choices=('latest', 'earliest', 'hardest', 'list'), default='latest',
+                        help="give minutes where tasks overlap to the task that started latest (default), started earliest or is hardest, so every plan runs on one forward clock and the other tasks drop those minutes; 'list' runs each task's minutes in list order instead, repeating overlapped ones")
+    parser.add_argument('--trace', metavar='FILE', help="write a Chrome trace of where the run spent its time to FILE; simulates in this process")
+    args = parser.parse_args(argv)
+    if args.trace:
+        from attention_core.instrument import recording
+        with recording() as recorder:
+            status = run(args, workers=1)
+        recorder.write_chrome_trace(args.trace)
+        return status
+    return run(args, args.workers)
+
+
+def run(args, workers):
+    overlap = None if args.overlap == 'list' else args.overlap
+    if not args.schedules:
+        interactive(overlap)
+        return
+    from attention_core.runner import run_files
+    rows = run_files(args.schedules, args.output, workers, voluntary=args.voluntary, cache_dir=args.cache, overlap=overlap)
+    failed = [row for row in rows if row['error']]
+    print(f"Simulated {len(rows) - len(failed)} plans from {len(args.schedules)} files into {args.output}")
+    for row in failed:
+        print(f"  {row['path']}: {row['error']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
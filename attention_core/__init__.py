@@ -0,0 +1,42 @@
+import importlib
+
+# Public name -> submodule that defines it. Submodules are only imported when one of their names is
+# first used, so `import attention_core.model` does not pull in numpy and the front ends start quickly.
+# Names of submodules are left to the import system: attention_core.sweep is the sweep submodule, and
+# the function that runs a sweep is attention_core.sweep.sweep().
+_EXPORTS = {
+    'BatchResult': 'batch', 'simulate_batch': 'batch',
+    'SimulationResult': 'result', 'Explanation': 'result',
+    'VariantResult': 'engine', 'simulate': 'engine', 'simulate_variants': 'engine', 'simulate_with_voluntary': 'engine',
+    'EventCurve': 'events', 'simulate_events': 'events',
+    'MonteCarloResult': 'montecarlo', 'simulate_monte_carlo': 'montecarlo',
+    'RosterResult': 'roster', 'simulate_roster': 'roster',
+    'IntervalIndex': 'intervals',
+    'OVERLAP_RULES': 'clock', 'owner_segments': 'clock', 'merge_ticks': 'clock',
+    'Recorder': 'instrument', 'recording': 'instrument',
+    'Task': 'model', 'MeditationSession': 'model', 'BreathingPractice': 'model', 'EnneagramType': 'model',
+    'ENNEAGRAM_TYPES': 'model', 'Schedule': 'model', 'Person': 'model',
+    'SweepTable': 'sweep', 'iter_sweep': 'sweep', 'parameter_grid': 'sweep',
+    'OptimizationResult': 'optimize', 'Placement': 'optimize', 'optimize_sessions': 'optimize',
+    'IncrementalSimulator': 'incremental',
+    'ResultCache': 'cache', 'CachedSimulator': 'cache', 'simulation_key': 'cache',
+    'iter_simulation': 'stream', 'summarize': 'stream', 'write_blocks': 'stream',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    source = _EXPORTS[name]
+    module = importlib.import_module(f".{source}", __name__)
+    for export in _EXPORTS:
+        if _EXPORTS[export] == source:
+            globals()[export] = getattr(module, export)
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
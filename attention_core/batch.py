@@ -0,0 +1,159 @@
+import numpy as np
+
+from .engine import BREATHING, LAW, MEDITATION, TASK, clamped_cumsum, compile_schedules, voluntary_levels
+from .model import Schedule, Task
+
+# Largest rows x operations matrix iter_shared_clock() evaluates at once
+_BLOCK_CELLS = 1 << 22
+
+
+class BatchResult:
+    # Row i belongs to schedules[i]; minutes past the end of a shorter schedule are NaN
+    def __init__(self, times, attention, lengths, total_attention_gain, total_breathing_gain, total_voluntary_intention_gain, accumulated_fatigue, avg_external_factors):
+        self.times = times
+        self.attention = attention
+        self.lengths = lengths
+        self.total_attention_gain = total_attention_gain
+        self.total_breathing_gain = total_breathing_gain
+        self.total_voluntary_intention_gain = total_voluntary_intention_gain
+        self.accumulated_fatigue = accumulated_fatigue
+        self.avg_external_factors = avg_external_factors
+
+    def __len__(self):
+        return len(self.lengths)
+
+
+def _columns(owner, count):
+    # Position of each flat entry inside its schedule's row
+    counts = np.bincount(owner, minlength=count)
+    first = np.cumsum(counts) - counts
+    return np.arange(len(owner)) - first[owner], counts
+
+
+def simulate_batch(schedules, apply_meditation=True, apply_breathing=True, voluntary=False, overlap=None):
+    # Evaluates N schedules with one compile and one kernel call instead of N calls to simulate()
+    count = len(schedules)
+    timeline = compile_schedules(schedules, apply_meditation, apply_breathing, overlap)
+    op_col, op_counts = _columns(timeline.op_schedule, count)
+    tick_col, lengths = _columns(timeline.tick_schedule, count)
+    width = op_counts.max() if count else 0
+
+    add = np.zeros((count, width))
+    cap = np.full((count, width), np.inf)
+    add[timeline.op_schedule, op_col] = timeline.op_add
+    cap[timeline.op_schedule, op_col] = timeline.op_cap
+    start_levels = np.array([float(schedule.start_level()) for schedule in schedules])
+    task_ops = timeline.kind_mask(TASK)
+
+    voluntary_gain = np.zeros(count)
+    if voluntary:
+        levels = np.empty((count, width))
+        is_task = np.zeros((count, width), dtype=bool)
+        is_task[timeline.op_schedule[task_ops], op_col[task_ops]] = True
+        for i, schedule in enumerate(schedules):
+            used = op_counts[i]
+            relief = np.where(is_task[i, :used], -0.5 * add[i, :used], 0.0)
+            levels[i, :used], below = voluntary_levels(start_levels[i], add[i, :used], cap[i, :used], relief, is_task[i, :used], schedule.min_attention)
+            voluntary_gain[i] = relief[below].sum()
+    else:
+        levels = clamped_cumsum(start_levels[:, None], add, cap)
+
+    times = np.full((count, lengths.max() if count else 0), np.nan)
+    attention = np.full(times.shape, np.nan)
+    times[timeline.tick_schedule, tick_col] = timeline.times
+    rows, cols = timeline.op_schedule[task_ops], op_col[task_ops]
+    attention[rows, tick_col[timeline.op_tick[task_ops]]] = levels[rows, cols]
+
+    meditation = timeline.kind_mask(MEDITATION)
+    breathing = timeline.kind_mask(BREATHING)
+    fatigue = np.array([float(sum(task.difficulty for task in schedule.tasks)) for schedule in schedules])
+    criticality = np.array([float(sum(task.criticality for task in schedule.tasks)) for schedule in schedules])
+    num_tasks = np.array([len(schedule.tasks) for schedule in schedules])
+    return BatchResult(
+        times, attention, lengths,
+        np.bincount(timeline.op_schedule[meditation], weights=timeline.op_add[meditation], minlength=count),
+        np.bincount(timeline.op_schedule[breathing], weights=timeline.op_add[breathing], minlength=count),
+        voluntary_gain, fatigue,
+        np.divide(criticality, num_tasks, out=np.zeros(count), where=num_tasks > 0),
+    )
+
+
+def task_minutes(tasks, overlap=None):
+    # Minutes, law ops and task ops of `tasks` without any sessions, with the tasks numbered by position
+    # so task_ids tell which task each minute belongs to. `overlap` lays them out like compile_schedules().
+    tasks = [Task(i, task.name, task.base_attention, task.difficulty, task.criticality, task.duration, task.start_time)
+             for i, task in enumerate(tasks)]
+    return compile_schedules([Schedule(tasks, [], [], None, None, None, np.inf)], False, False, overlap)
+
+
+def _voluntary_block(level, add, cap, slots, min_attention, relieved, hovering):
+    # voluntary_levels() for all rows of one iter_shared_clock() block at once; every minute is `slots`
+    # ops ending with its task op. Unless some row was `hovering` around min_attention in the block
+    # before, first tries the closed form with each row's task ops relieved the way its last one was,
+    # which holds for the whole block unless some row crosses min_attention in it. If one does, steps
+    # through the block a minute at a time for all rows together, each minute's sessions and law
+    # folded into one map x -> min(x + s, m) per row.
+    # Returns the levels after every task op, the level after the block, whether each row's last task
+    # op was relieved and whether any row crossed min_attention.
+    drain = add[:, slots - 1::slots]
+    if not hovering:
+        step = add.copy()
+        step[:, slots - 1::slots] = np.where(relieved[:, None], 0.5 * drain, drain)
+        levels = clamped_cumsum(level[:, None], step, cap)
+        if np.array_equal(levels[:, slots - 2::slots] < min_attention[:, None], np.broadcast_to(relieved[:, None], drain.shape)):
+            return levels[:, slots - 1::slots], levels[:, -1], relieved, False
+    add, cap = add.reshape(drain.shape + (slots,)), cap.reshape(drain.shape + (slots,))
+    shift, top = np.zeros(drain.shape), np.full(drain.shape, np.inf)
+    for j in range(slots - 1):
+        shift += add[:, :, j]
+        top = np.minimum(top, cap[:, :, j] - shift)
+    top += shift
+    attention = np.empty(drain.shape[::-1])
+    crossed = np.zeros(len(level), dtype=bool)
+    for t, (s, m, d) in enumerate(zip(shift.T, top.T, drain.T)):
+        level = np.minimum(level + s, m)
+        below = level < min_attention
+        crossed |= below != relieved
+        relieved = below
+        level = level + np.where(relieved, 0.5 * d, d)
+        attention[t] = level
+    return attention.T, level, relieved, bool(crossed.any())
+
+
+def iter_shared_clock(timeline, start_levels, min_attention, max_attention, starts, ends, effectiveness, difficulty, voluntary=False):
+    # Simulates many rows that share the minutes of one set of tasks (`timeline` from task_minutes())
+    # but each have their own start level, thresholds (one per row), task difficulties (rows x tasks)
+    # and sessions (rows x sessions: start, end and effectiveness, meditation sessions before breathing
+    # practices, each in list order). Rows with fewer sessions pad theirs with ones that start at inf.
+    # Yields (ticks, attention) for one block of minutes at a time, attention being rows x minutes.
+    rows, n = len(start_levels), len(timeline)
+    laws = timeline.op_add[timeline.op_kind == LAW]
+    earliest, latest = starts.min(axis=0, initial=np.inf), ends.max(axis=0, initial=-np.inf)
+    max_attention = np.broadcast_to(np.asarray(max_attention, dtype=float), (rows,))
+    min_attention = np.broadcast_to(np.asarray(min_attention, dtype=float), (rows,))
+    level = np.asarray(start_levels, dtype=float)
+    relieved, hovering = level < min_attention, False
+    block = max(1, _BLOCK_CELLS // max(rows * (starts.shape[1] + 2), 1))
+    for first in range(0, n, block):
+        ticks = slice(first, min(first + block, n))
+        times = timeline.times[ticks]
+        # Every minute holds one op per session some row runs during the block, then the laws and the
+        # task; sessions nobody runs would add nothing and get no slot
+        used = np.flatnonzero((earliest <= times.max()) & (latest > times.min()))
+        slots = len(used) + 2
+        # rows x minutes x sessions
+        active = (starts[:, None, used] <= times[None, :, None]) & (times[None, :, None] < ends[:, None, used])
+        add = np.empty((rows, len(times), slots))
+        cap = np.full(add.shape, np.inf)
+        add[:, :, :-2] = np.where(active, effectiveness[:, None, used], 0.0)
+        cap[:, :, :-2] = np.where(active, max_attention[:, None, None], np.inf)
+        add[:, :, -2] = laws[ticks]
+        add[:, :, -1] = -difficulty[:, timeline.task_ids[ticks]]
+        add = add.reshape(rows, -1)
+        cap = cap.reshape(rows, -1)
+        if voluntary:
+            attention, level, relieved, hovering = _voluntary_block(level, add, cap, slots, min_attention, relieved, hovering)
+        else:
+            levels = clamped_cumsum(level[:, None], add, cap)
+            attention, level = levels[:, slots - 1::slots], levels[:, -1]
+        yield ticks, attention
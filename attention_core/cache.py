@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+from . import engine
+from .engine import ENGINE_VERSION, VARIANTS
+
+
+def simulation_key(kind, tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, options=()):
+    # SHA-256 of every input that can change a result, in a canonical form: numbers as floats, in list
+    # order, together with the kind of call, its options and ENGINE_VERSION
+    inputs = [
+        ENGINE_VERSION, kind,
+        [[task.task_id, str(task.name), float(task.base_attention), float(task.difficulty), float(task.criticality),
+          float(task.duration), float(task.start_time)] for task in tasks],
+        [[float(s.start_time), float(s.duration), float(s.effectiveness)] for s in meditation_sessions],
+        [[str(p.name), float(p.start_time), float(p.duration), float(p.effectiveness)] for p in breathing_practices],
+        [enneagram_type.type_id, enneagram_type.name],
+        float(initial_attention), float(min_attention), float(max_attention), list(options),
+    ]
+    return hashlib.sha256(json.dumps(inputs, separators=(',', ':')).encode()).hexdigest()
+
+
+class ResultCache:
+    # Least-recently-used results by simulation_key(), holding at most `max_bytes` of arrays in memory.
+    # With a directory every result is also pickled there, so other processes and later sessions find
+    # it too. Cached results are shared between callers and must not be modified. One cache can serve
+    # several threads, e.g. a window's live chart and its background runs.
+    def __init__(self, max_bytes=256 << 20, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.nbytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries or (self.directory is not None and os.path.exists(self._path(key)))
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+        if self.directory is not None:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    value = pickle.load(f)
+            except FileNotFoundError:
+                pass
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+                # Truncated or written by an incompatible version; the next put() replaces it
+                pass
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, value)
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+        if self.directory is not None:
+            # Written under a temporary name and renamed, so a reader never sees half a file
+            handle, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(handle, 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporary, self._path(key))
+            except BaseException:
+                os.unlink(temporary)
+                raise
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _remember(self, key, value):
+        size = getattr(value, 'nbytes', 0)
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            self.nbytes -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+        if disk and self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith('.pkl'):
+                    os.unlink(os.path.join(self.directory, name))
+
+    def stats(self):
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'entries': len(self._entries), 'nbytes': self.nbytes}
+
+
+class CachedSimulator:
+    # Drop-in replacement for simulate()/simulate_with_voluntary()/simulate_variants() that returns the
+    # stored result when the same inputs were simulated before. Misses go to `simulator`: the engine by
+    # default, or anything with the same methods, such as an IncrementalSimulator.
+    def __init__(self, cache=None, simulator=engine):
+        self.cache = cache if cache is not None else ResultCache()
+        self.simulator = simulator
+
+    def simulate(self, tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation, apply_breathing, overlap=None):
+        args = (tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type)
+        key = simulation_key('simulate', *args, (bool(apply_meditation), bool(apply_breathing), overlap))
+        return self.cache.get_or_compute(key, lambda: self.simulator.simulate(*args, apply_meditation, apply_breathing, overlap=overlap))
+
+    def simulate_with_voluntary(self, tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation, apply_breathing, overlap=None):
+        args = (tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type)
+        key = simulation_key('simulate_with_voluntary', *args, (bool(apply_meditation), bool(apply_breathing), overlap))
+        return self.cache.get_or_compute(key, lambda: self.simulator.simulate_with_voluntary(*args, apply_meditation, apply_breathing, overlap=overlap))
+
+    def simulate_variants(self, tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, names=tuple(VARIANTS), progress=None, overlap=None):
+        args = (tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type)
+        key = simulation_key('simulate_variants', *args, list(names) + [overlap])
+        return self.cache.get_or_compute(key, lambda: self.simulator.simulate_variants(*args, names=names, progress=progress, overlap=overlap))
@@ -0,0 +1,67 @@
+import heapq
+
+import numpy as np
+
+# Which task a minute covered by several tasks belongs to: the one that started last (an interruption
+# takes over until it ends), the one that started first or the most difficult one. The other tasks
+# drop the minute rather than doing it later: under 'earliest', b at 5..14 overlapping a at 0..10 only
+# keeps 10..14. Ties go to the task earlier in the list.
+OVERLAP_RULES = ('latest', 'earliest', 'hardest')
+
+
+def _priority(task, index, overlap):
+    if overlap == 'latest':
+        return (-float(task.start_time), index)
+    if overlap == 'earliest':
+        return (float(task.start_time), index)
+    return (-float(task.difficulty), index)
+
+
+def owner_segments(tasks, overlap='latest'):
+    # Splits the time the tasks cover into segments [start, end) that each belong to a single task,
+    # by position in `tasks`. Sweeps the start and end times in order, keeping the running tasks in a
+    # heap ordered by `overlap`; tasks that have ended leave the heap once they reach its top.
+    if overlap not in OVERLAP_RULES:
+        raise ValueError(f"Unknown overlap rule: {overlap}")
+    starts = [float(task.start_time) for task in tasks]
+    ends = [float(task.start_time + task.duration) for task in tasks]
+    order = sorted((i for i in range(len(tasks)) if starts[i] < ends[i]), key=starts.__getitem__)
+    times = sorted({starts[i] for i in order} | {ends[i] for i in order})
+    segments, running, following = [], [], 0
+    for start, end in zip(times[:-1], times[1:]):
+        while following < len(order) and starts[order[following]] <= start:
+            heapq.heappush(running, _priority(tasks[order[following]], order[following], overlap))
+            following += 1
+        while running and ends[running[0][-1]] <= start:
+            heapq.heappop(running)
+        if not running:
+            continue
+        owner = running[0][-1]
+        if segments and segments[-1][1] == start and segments[-1][2] == owner:
+            segments[-1][1] = end
+        else:
+            segments.append([start, end, owner])
+    if not segments:
+        return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)
+    starts, ends, owners = zip(*segments)
+    return np.array(starts), np.array(ends), np.array(owners, dtype=np.int64)
+
+
+def merge_ticks(times, owner, tasks, task_schedule, overlap='latest'):
+    # Puts the minutes of every schedule on one forward clock. Minute i was laid out for
+    # tasks[owner[i]], of schedule task_schedule[owner[i]]; it is kept only when that task owns its time
+    # under `overlap`, so no time is simulated twice, and the kept minutes are ordered by schedule and
+    # time whatever order the tasks were listed in.
+    keep = np.zeros(len(times), dtype=bool)
+    tick_schedule = task_schedule[owner]
+    for schedule in np.unique(task_schedule):
+        members = np.flatnonzero(task_schedule == schedule)
+        starts, ends, owners = owner_segments([tasks[i] for i in members], overlap)
+        ticks = np.flatnonzero(tick_schedule == schedule)
+        segment = np.searchsorted(starts, times[ticks], side='right') - 1
+        inside = segment >= 0
+        segment = np.maximum(segment, 0)
+        keep[ticks] = inside & (times[ticks] < ends[segment]) & (members[owners[segment]] == owner[ticks]) if len(starts) else False
+    kept = np.flatnonzero(keep)
+    kept = kept[np.lexsort((times[kept], tick_schedule[kept]))]
+    return times[kept], owner[kept]
@@ -0,0 +1,447 @@
+import numpy as np
+
+from . import instrument
+from .clock import merge_ticks
+from .intervals import IntervalIndex, range_hits
+from .model import Schedule
+from .result import BREATHING_FLAG, MEDITATION_FLAG, NO_TASK, VOLUNTARY_FLAG, SimulationResult
+
+# Kinds of operation in a compiled timeline, in the order they are applied within a minute
+MEDITATION = 0
+BREATHING = 1
+LAW = 2
+TASK = 3
+
+# First block the voluntary kernel evaluates before checking for a regime change
+_MIN_WINDOW = 256
+
+# When regime changes come fewer than this many ops apart on average, the voluntary kernel steps
+# from task op to task op instead, this many ops at a time before it checks again
+_SCALAR_GAP = 32
+_SCALAR_STRETCH = 2048
+
+# At most one checkpoint is kept per block of this many ops
+CHECKPOINT_BLOCK = 4096
+
+# Bump whenever a change alters what simulate() and friends return, so cached results from before are not reused
+ENGINE_VERSION = 2
+
+# (apply_meditation, apply_breathing, voluntary intention) for every curve the front ends draw
+VARIANTS = {
+    'baseline': (False, False, False),
+    'meditation': (True, False, False),
+    'breathing': (False, True, False),
+    'combined': (True, True, False),
+    'voluntary': (True, True, True),
+}
+
+
+class Timeline:
+    def __init__(self, times, task_ids, difficulty, tick_schedule, op_tick, op_kind, op_source, op_add, op_cap, op_schedule):
+        # One entry per simulated minute
+        self.times = times
+        self.task_ids = task_ids
+        self.difficulty = difficulty
+        self.tick_schedule = tick_schedule
+        # One entry per change to the attention level
+        self.op_tick = op_tick
+        self.op_kind = op_kind
+        self.op_source = op_source
+        self.op_add = op_add
+        self.op_cap = op_cap
+        self.op_schedule = op_schedule
+
+    def __len__(self):
+        return len(self.times)
+
+    def kind_mask(self, kind):
+        return self.op_kind == kind
+
+    @property
+    def nbytes(self):
+        return sum(value.nbytes for value in vars(self).values())
+
+
+def _tick_times(starts, durations):
+    counts = np.where(durations > 0, np.ceil(np.where(durations > 0, durations, 0)) + 1, 0).astype(np.int64)
+    owner = np.repeat(np.arange(len(starts)), counts)
+    first = np.cumsum(counts) - counts
+    times = starts[owner] + (np.arange(counts.sum()) - first[owner])
+    # Fractional start times replay `current_time += 1` so they round exactly like the loop did
+    for i in np.flatnonzero((counts > 0) & (starts != np.floor(starts))):
+        steps = np.ones(counts[i])
+        steps[0] = starts[i]
+        times[first[i]:first[i] + counts[i]] = np.cumsum(steps)
+    keep = times < (starts + durations)[owner]
+    return times[keep], owner[keep]
+
+
+def _flatten(schedules, attribute):
+    items = [item for schedule in schedules for item in getattr(schedule, attribute)]
+    owner = np.repeat(np.arange(len(schedules)), [len(getattr(schedule, attribute)) for schedule in schedules])
+    return items, owner
+
+
+def _keyed(schedule, times):
+    keys = np.empty(len(times), dtype=complex)
+    keys.real = schedule
+    keys.imag = times
+    return keys
+
+
+@instrument.timed('compile')
+def compile_schedules(schedules, apply_meditation=True, apply_breathing=True, overlap=None):
+    # Compiles every schedule into one flat Timeline; tick_schedule and op_schedule say which one each entry belongs to.
+    # By default the minutes of each task follow one another in list order, like the original loop that
+    # reset its clock to every task's start time. With an overlap rule out of clock.OVERLAP_RULES each
+    # schedule instead gets one forward clock: minutes in time order and none twice.
+    tasks, task_schedule = _flatten(schedules, 'tasks')
+    starts = np.array([float(task.start_time) for task in tasks])
+    durations = np.array([float(task.duration) for task in tasks])
+    with instrument.phase('compile.ticks'):
+        times, owner = _tick_times(starts, durations)
+        if overlap is not None:
+            times, owner = merge_ticks(times, owner, tasks, task_schedule, overlap)
+    task_ids = np.array([task.task_id for task in tasks], dtype=np.int64)[owner]
+    difficulty = np.array([float(task.difficulty) for task in tasks])[owner]
+    return compile_ticks(schedules, times, task_ids, difficulty, task_schedule[owner], apply_meditation, apply_breathing)
+
+
+def compile_ticks(schedules, times, task_ids, difficulty, tick_schedule, apply_meditation=True, apply_breathing=True):
+    # Builds the ops of minutes that have already been laid out; compile_schedules() lays out every
+    # minute of every task, the streaming mode only a block of them at a time
+    max_attention = np.array([float(schedule.max_attention) for schedule in schedules])
+    n = len(times)
+    instrument.count('ticks', n)
+
+    hit_tick, hit_kind, hit_source, hit_add = [], [], [], []
+    single = len(schedules) == 1
+    if apply_meditation or apply_breathing:
+        # Complex numbers sort lexicographically, so (schedule, time) pairs compare exactly across schedules
+        tick_keys = times if single else _keyed(tick_schedule, times)
+        tick_order = np.argsort(tick_keys)
+    for kind, attribute, enabled in ((MEDITATION, 'meditation_sessions', apply_meditation), (BREATHING, 'breathing_practices', apply_breathing)):
+        if not enabled:
+            continue
+        name = 'meditation' if kind == MEDITATION else 'breathing'
+        with instrument.phase(f'compile.{name}'):
+            sessions, session_schedule = _flatten(schedules, attribute)
+            if single:
+                ticks, sources = IntervalIndex(sessions).hits(times, tick_order)
+            else:
+                session_starts = np.array([float(s.start_time) for s in sessions])
+                session_ends = np.array([float(s.start_time + s.duration) for s in sessions])
+                ticks, sources = range_hits(tick_keys, _keyed(session_schedule, session_starts),
+                                            _keyed(session_schedule, session_ends), tick_order)
+        instrument.count(f'{name}_hits', len(ticks))
+        effectiveness = np.array([float(s.effectiveness) for s in sessions])
+        hit_tick.append(ticks)
+        hit_kind.append(np.full(len(ticks), kind))
+        hit_source.append(sources)
+        hit_add.append(effectiveness[sources] if len(sources) else np.empty(0))
+    hit_tick = np.concatenate(hit_tick) if hit_tick else np.empty(0, dtype=np.int64)
+    hit_kind = np.concatenate(hit_kind) if hit_kind else np.empty(0, dtype=np.int64)
+    hit_source = np.concatenate(hit_source) if hit_source else np.empty(0, dtype=np.int64)
+    hit_add = np.concatenate(hit_add) if hit_add else np.empty(0)
+
+    # Within a minute: meditations in list order, then breathing practices, then the laws, then the task.
+    # Only the session hits need sorting; every minute contributes exactly one law op and one task op.
+    order = np.lexsort((hit_source, hit_kind, hit_tick))
+    hits_through = np.cumsum(np.bincount(hit_tick, minlength=n)) if n else np.empty(0, dtype=np.int64)
+    law_pos = 2 * np.arange(n) + hits_through
+    total = 2 * n + len(hit_tick)
+    hit_pos = 2 * hit_tick[order] + np.arange(len(hit_tick))
+
+    op_tick = np.empty(total, dtype=np.int64)
+    op_kind = np.empty(total, dtype=np.int64)
+    op_source = np.zeros(total, dtype=np.int64)
+    op_add = np.empty(total)
+    op_tick[hit_pos] = hit_tick[order]
+    op_kind[hit_pos] = hit_kind[order]
+    op_source[hit_pos] = hit_source[order]
+    op_add[hit_pos] = hit_add[order]
+    op_tick[law_pos] = op_tick[law_pos + 1] = np.arange(n)
+    op_kind[law_pos] = LAW
+    op_kind[law_pos + 1] = TASK
+    # Law of Octaves (+10 every 7th minute) and Law of Three (-5 every 3rd minute)
+    with instrument.phase('compile.laws'):
+        op_add[law_pos] = np.where(np.mod(times, 7) == 0, 10.0, 0.0) - np.where(np.mod(times, 3) == 0, 5.0, 0.0)
+    op_add[law_pos + 1] = -difficulty
+    op_schedule = tick_schedule[op_tick]
+    op_cap = np.where(op_kind <= BREATHING, max_attention[op_schedule], np.inf)
+    return Timeline(times, task_ids, difficulty, tick_schedule, op_tick, op_kind, op_source, op_add, op_cap, op_schedule)
+
+
+def lay_out_ticks(tasks, overlap=None):
+    # The minutes compile_schedules() lays out for one schedule's tasks: their times and the position in
+    # `tasks` of the task each one belongs to
+    times, owner = _tick_times(np.array([float(task.start_time) for task in tasks]), np.array([float(task.duration) for task in tasks]))
+    if overlap is not None:
+        times, owner = merge_ticks(times, owner, tasks, np.zeros(len(tasks), dtype=np.int64), overlap)
+    return times, owner
+
+
+def compile_schedule(tasks, meditation_sessions, breathing_practices, max_attention, apply_meditation=True, apply_breathing=True, overlap=None):
+    schedule = Schedule(tasks, meditation_sessions, breathing_practices, None, None, None, max_attention)
+    return compile_schedules([schedule], apply_meditation, apply_breathing, overlap)
+
+
+def clamped_cumsum(start_level, add, cap):
+    # Applies level = min(level + add[k], cap[k]) for every k along the last axis without a Python loop.
+    # Each step is a map x -> min(x + a, b); composing them gives S_n + min(x0, min_k(b_k - S_k)).
+    total = np.cumsum(add, axis=-1)
+    return total + np.minimum(start_level, np.minimum.accumulate(cap - total, axis=-1))
+
+
+def voluntary_levels(start_level, add, cap, relief, task_ops, min_attention):
+    # Same as clamped_cumsum, except that task ops add `relief` back whenever the level
+    # going into them is below min_attention. Runs the closed form block by block and
+    # restarts from the first minute that switches between the two regimes. Blocks are
+    # sized from the running average distance between switches; when that drops below
+    # _SCALAR_GAP the level hovers around min_attention and _step_levels() is cheaper.
+    n = len(add)
+    levels = np.empty(n)
+    below = np.zeros(n, dtype=bool)
+    pos, level, regime = 0, start_level, False
+    window, gap, last_flip = _MIN_WINDOW, _MIN_WINDOW, 0
+    while pos < n:
+        if gap < _SCALAR_GAP:
+            end = min(pos + _SCALAR_STRETCH, n)
+            level, regime, flips = _step_levels(level, regime, add[pos:end], cap[pos:end], relief[pos:end],
+                                                task_ops[pos:end], min_attention, levels[pos:end], below[pos:end])
+            gap = (gap + (end - pos) / (flips + 1)) / 2
+            window, last_flip, pos = max(int(2 * gap), _SCALAR_GAP), end, end
+            continue
+        end = min(pos + window, n)
+        step = add[pos:end] + relief[pos:end] if regime else add[pos:end]
+        chunk = clamped_cumsum(level, step, cap[pos:end])
+        before = np.concatenate(([level], chunk[:-1]))
+        flips = np.flatnonzero(task_ops[pos:end] & ((before < min_attention) != regime))
+        if len(flips):
+            end = pos + flips[0]
+            gap = (gap + end - last_flip) / 2
+            window, last_flip = max(int(2 * gap), _SCALAR_GAP), end
+        else:
+            window *= 2
+        levels[pos:end] = chunk[:end - pos]
+        below[pos:end] = regime
+        if end > pos:
+            level = levels[end - 1]
+        if len(flips):
+            regime = not regime
+        pos = end
+    return levels, below
+
+
+def _step_levels(level, regime, add, cap, relief, task_ops, min_attention, levels, below):
+    # voluntary_levels() over a short stretch where the regime keeps switching, filling `levels` and
+    # `below` in place. Only task ops can switch it and the ops between two of them never depend on
+    # it, so each such run is folded into one map x -> min(x + s, m) and the loop visits task ops
+    # alone; the levels then come from one closed form under the regimes it found.
+    # Returns the level and regime it ends with and how many times the regime switched.
+    start_level, start_regime, level = level, regime, float(level)
+    tasks = np.flatnonzero(task_ops)
+    starts = np.concatenate(([0], tasks[:-1] + 1))
+    total = np.cumsum(add)
+    offset = np.concatenate(([0.0], total))
+    # The run of other ops before task op i is [starts[i], tasks[i]), empty when the two are equal
+    lowest = np.minimum.reduceat(cap - total, np.column_stack((starts, tasks)).ravel())[::2] if len(tasks) else np.empty(0)
+    shift = offset[tasks] - offset[starts]
+    top = np.where(tasks > starts, offset[tasks] + lowest, np.inf)
+    flips = []
+    for k, s, m, a, relieved, c in zip(tasks.tolist(), shift.tolist(), top.tolist(), add[tasks].tolist(),
+                                       (add[tasks] + relief[tasks]).tolist(), cap[tasks].tolist()):
+        level += s
+        if level > m:
+            level = m
+        if (level < min_attention) != regime:
+            regime = not regime
+            flips.append(k)
+        level += relieved if regime else a
+        if level > c:
+            level = c
+    switched = np.zeros(len(add), dtype=np.int64)
+    switched[flips] = 1
+    below[:] = (np.cumsum(switched) % 2 == 1) != start_regime
+    levels[:] = clamped_cumsum(start_level, np.where(below, add + relief, add), cap)
+    return (levels[-1] if len(levels) else start_level), regime, len(flips)
+
+
+def checkpoints(timeline):
+    # Op positions where a minute starts a task or changes how many sessions are running,
+    # keeping the first one in every block of CHECKPOINT_BLOCK ops. Always includes 0.
+    n = len(timeline)
+    if not n:
+        return np.zeros(1, dtype=np.int64)
+    running = np.bincount(timeline.op_tick[timeline.op_kind <= BREATHING], minlength=n)
+    first_op = np.flatnonzero(timeline.op_kind == LAW) - running
+    event = np.ones(n, dtype=bool)
+    event[1:] = ((timeline.task_ids[1:] != timeline.task_ids[:-1]) | (timeline.times[1:] != timeline.times[:-1] + 1)
+                 | (running[1:] != running[:-1]))
+    positions = first_op[event]
+    _, first = np.unique(positions // CHECKPOINT_BLOCK, return_index=True)
+    return positions[first]
+
+
+def _applied(kinds, variant):
+    # Ops a variant applies: laws and tasks always, sessions only when the variant switches them on
+    apply_meditation, apply_breathing, _ = variant
+    return (kinds >= LAW) | ((kinds == MEDITATION) & apply_meditation) | ((kinds == BREATHING) & apply_breathing)
+
+
+def _count_clamps(start_level, levels, add, cap):
+    # Ops where max_attention cut the level short, going by the level each op started from
+    before = np.concatenate((np.reshape(start_level, np.shape(levels)[:-1] + (1,)), levels[..., :-1]), axis=-1)
+    instrument.count('clamps', int((before + add > cap).sum()))
+
+
+@instrument.timed('run')
+def run_timeline(timeline, start_levels, variants, min_attention=None, first=0, bounds=None, progress=None):
+    # Evaluates ops[first:] for every variant in one walk over the timeline, one checkpoint segment at
+    # a time. `start_levels` holds each variant's level going into op `first`. Every segment only
+    # depends on the levels it starts from, so resuming at a checkpoint reproduces a full run bit for bit.
+    # `progress(done, total)` is called after every segment with the number of minutes simulated so far;
+    # an exception raised from it stops the run.
+    if bounds is None:
+        bounds = checkpoints(timeline)
+    n = len(timeline.op_add)
+    levels = np.empty((len(variants), n - first))
+    below = np.zeros((len(variants), n - first), dtype=bool)
+    level = np.array(start_levels, dtype=float)
+    clamp_rows = [i for i, variant in enumerate(variants) if not variant[2]]
+    voluntary_rows = [i for i, variant in enumerate(variants) if variant[2]]
+    edges = np.append(bounds[bounds >= first], n)
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end == start:
+            continue
+        add, cap, kinds = timeline.op_add[start:end], timeline.op_cap[start:end], timeline.op_kind[start:end]
+        cols = slice(start - first, end - first)
+        applied = np.array([_applied(kinds, variant) for variant in variants])
+        if clamp_rows:
+            mask = applied[clamp_rows]
+            row_add, row_cap = np.where(mask, add, 0.0), np.where(mask, cap, np.inf)
+            with instrument.phase('run.clamp'):
+                levels[clamp_rows, cols] = clamped_cumsum(level[clamp_rows, None], row_add, row_cap)
+            if instrument.enabled():
+                _count_clamps(level[clamp_rows], levels[clamp_rows, cols], row_add, row_cap)
+        task_ops = kinds == TASK
+        for i in voluntary_rows:
+            row_add, row_cap = np.where(applied[i], add, 0.0), np.where(applied[i], cap, np.inf)
+            relief = np.where(task_ops, -0.5 * row_add, 0.0)
+            with instrument.phase('run.voluntary'):
+                levels[i, cols], below[i, cols] = voluntary_levels(level[i], row_add, row_cap, relief, task_ops, min_attention)
+            if instrument.enabled():
+                _count_clamps(level[i], levels[i, cols], row_add + np.where(below[i, cols], relief, 0.0), row_cap)
+                instrument.count('voluntary_activations', int((below[i, cols] & task_ops).sum()))
+        instrument.count('segments')
+        level = levels[:, cols.stop - 1].copy()
+        if progress is not None:
+            progress(int(timeline.op_tick[end - 1]) + 1, len(timeline))
+    return levels, below
+
+
+def _running_total(values, seed=0):
+    # Sequential sum, matching the `total += ...` accumulation of the loop
+    return float(np.cumsum(np.concatenate(([seed], values)))[-1]) if len(values) else seed
+
+
+def _summary(tasks):
+    accumulated_fatigue = sum(task.difficulty for task in tasks)
+    avg_external_factors = sum(task.criticality for task in tasks) / len(tasks) if tasks else 0
+    return accumulated_fatigue, avg_external_factors
+
+
+class Checkpoint:
+    # Level of every variant just before op `position`
+    def __init__(self, position, level):
+        self.position = position
+        self.level = level
+
+
+@instrument.timed('output')
+def build_output(tasks, timeline, levels, below, start_level, variant, previous=None, summary=None):
+    # Builds the SimulationResult simulate()/simulate_with_voluntary() return for one variant. When the
+    # run is streamed block by block, `previous` is the result of the block before this one: its totals
+    # carry over and the initial point is not repeated. `summary` is _summary(tasks) worked out earlier.
+    apply_meditation, apply_breathing, voluntary = variant
+    task_ops = timeline.kind_mask(TASK)
+    event_kind = np.zeros(len(task_ops), dtype=np.uint8)
+    event_kind[timeline.kind_mask(MEDITATION) & apply_meditation] = MEDITATION_FLAG
+    event_kind[timeline.kind_mask(BREATHING) & apply_breathing] = BREATHING_FLAG
+    voluntary_ops = task_ops & below
+    event_kind[voluntary_ops] = VOLUNTARY_FLAG
+    events = np.flatnonzero(event_kind)
+    flags = np.zeros(len(timeline), dtype=np.uint8)
+    np.bitwise_or.at(flags, timeline.op_tick[events], event_kind[events])
+    seeds = (0, 0, 0) if previous is None else (previous.total_attention_gain, previous.total_breathing_gain, previous.total_voluntary_intention_gain)
+    meditation_gain = _running_total(timeline.op_add[event_kind == MEDITATION_FLAG], seeds[0])
+    breathing_gain = _running_total(timeline.op_add[event_kind == BREATHING_FLAG], seeds[1])
+    voluntary_gain = _running_total(-0.5 * timeline.op_add[voluntary_ops], seeds[2]) if voluntary else 0
+    accumulated_fatigue, avg_external_factors = summary if summary is not None else _summary(tasks)
+    columns = [timeline.times, timeline.task_ids.astype(np.int32), timeline.difficulty, levels[task_ops], flags]
+    if voluntary and previous is None:
+        # Ensure the attention line starts from point 0
+        columns = [np.concatenate(([initial], column)).astype(column.dtype)
+                   for initial, column in zip((0, NO_TASK, 0, start_level, 0), columns)]
+    return SimulationResult(*columns, timeline.times[timeline.op_tick[events]], levels[events], event_kind[events], voluntary,
+                            meditation_gain, breathing_gain, voluntary_gain, accumulated_fatigue, avg_external_factors)
+
+
+class VariantResult:
+    # Several variants of one schedule evaluated together; curve() gives a variant's per-minute levels
+    # and output() the same SimulationResult simulate() / simulate_with_voluntary() would return for it.
+    # The tasks are copied and summarized here, so editing the caller's list afterwards changes neither
+    # this result nor a cached copy of it.
+    def __init__(self, tasks, timeline, names, variants, levels, below, start_level):
+        self.tasks = tuple(tasks)
+        self.summary = _summary(self.tasks)
+        self.timeline = timeline
+        self.names = names
+        self.variants = variants
+        self.levels = levels
+        self.below = below
+        self.start_level = start_level
+
+    @property
+    def times(self):
+        return self.timeline.times
+
+    @property
+    def nbytes(self):
+        return self.timeline.nbytes + self.levels.nbytes + self.below.nbytes
+
+    def curve(self, name):
+        return self.levels[self.names.index(name)][self.timeline.kind_mask(TASK)]
+
+    def output(self, name):
+        i = self.names.index(name)
+        return build_output(self.tasks, self.timeline, self.levels[i], self.below[i], self.start_level, self.variants[i], summary=self.summary)
+
+
+def _run_variants(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, variants, progress=None, overlap=None):
+    timeline = compile_schedule(tasks, meditation_sessions, breathing_practices, max_attention, overlap=overlap)
+    start_level = enneagram_type.apply_effects(initial_attention)
+    levels, below = run_timeline(timeline, [start_level] * len(variants), variants, min_attention, progress=progress)
+    return timeline, start_level, levels, below
+
+
+@instrument.timed('simulate')
+def simulate(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation, apply_breathing, overlap=None):
+    variant = (apply_meditation, apply_breathing, False)
+    timeline, start_level, levels, below = _run_variants(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, [variant], overlap=overlap)
+    return build_output(tasks, timeline, levels[0], below[0], start_level, variant)
+
+
+@instrument.timed('simulate_with_voluntary')
+def simulate_with_voluntary(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation, apply_breathing, overlap=None):
+    variant = (apply_meditation, apply_breathing, True)
+    timeline, start_level, levels, below = _run_variants(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, [variant], overlap=overlap)
+    return build_output(tasks, timeline, levels[0], below[0], start_level, variant)
+
+
+@instrument.timed('simulate_variants')
+def simulate_variants(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, names=tuple(VARIANTS), progress=None, overlap=None):
+    # One pass over the timeline for every requested curve, instead of one simulate() call per curve
+    variants = [VARIANTS[name] for name in names]
+    timeline, start_level, levels, below = _run_variants(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, variants, progress, overlap)
+    return VariantResult(tasks, timeline, list(names), variants, levels, below, start_level)
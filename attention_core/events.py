@@ -0,0 +1,246 @@
+import numpy as np
+
+from .engine import clamped_cumsum
+from .model import Schedule
+
+# Times within this many steps of a boundary count as on it, so 0.1-minute steps still land on whole minutes
+_EPS = 1e-9
+
+# Smallest block of segments the voluntary walk evaluates at once before checking for a switch
+_MIN_WINDOW = 256
+
+# Law of Octaves (+10 on each multiple of 7 minutes) and Law of Three (-5 on each multiple of 3 minutes)
+LAWS = ((7, 10.0), (3, -5.0))
+
+
+class EventCurve:
+    # A run of simulate_events() as segments of equal steps. Segment i covers count[i] steps of `step`
+    # minutes of task task_id[i] from minute time[i]; each of them maps the level x to min(x + add[i], cap[i]),
+    # starting from start[i]. relief[i] says whether the voluntary intention halved the drain there.
+    # Nothing is stored per step: sample() expands the segments when a per-step curve is wanted.
+    def __init__(self, step, time, count, task_id, start, add, cap, relief, voluntary,
+                 total_attention_gain, total_breathing_gain, total_voluntary_intention_gain, accumulated_fatigue, avg_external_factors):
+        self.step = step
+        self.time = time
+        self.count = count
+        self.task_id = task_id
+        self.start = start
+        self.add = add
+        self.cap = cap
+        self.relief = relief
+        self.voluntary = voluntary
+        self.total_attention_gain = total_attention_gain
+        self.total_breathing_gain = total_breathing_gain
+        self.total_voluntary_intention_gain = total_voluntary_intention_gain
+        self.accumulated_fatigue = accumulated_fatigue
+        self.avg_external_factors = avg_external_factors
+
+    def __len__(self):
+        return len(self.count)
+
+    @property
+    def steps(self):
+        return int(self.count.sum())
+
+    def end_levels(self):
+        # Level after the last step of every segment
+        return _after(self.start, self.count, self.add, self.cap)
+
+    @property
+    def final_level(self):
+        return float(self.end_levels()[-1]) if len(self) else None
+
+    def sample(self):
+        # (time, task_id, level) after every step, the attention curve simulate() gives at one-minute steps
+        segment = np.repeat(np.arange(len(self)), self.count)
+        k = np.arange(len(segment)) - np.repeat(np.cumsum(self.count) - self.count, self.count)
+        return (self.time[segment] + k * self.step, self.task_id[segment],
+                _after(self.start[segment], k + 1, self.add[segment], self.cap[segment]))
+
+
+def _after(level, steps, add, cap):
+    # Level after `steps` applications of x -> min(x + add, cap): the cap binds at the last step when add >= 0
+    # and at the first one otherwise
+    return np.minimum(level + steps * add, cap + (steps - 1) * np.minimum(add, 0))
+
+
+class _Active:
+    # Sum of effectiveness and number of sessions with start <= time < end, for many times at once
+    def __init__(self, sessions):
+        starts = np.array([float(s.start_time) for s in sessions])
+        ends = np.array([float(s.start_time + s.duration) for s in sessions])
+        effectiveness = np.array([float(s.effectiveness) for s in sessions])
+        usable = starts < ends
+        by_start, by_end = np.argsort(starts[usable]), np.argsort(ends[usable])
+        self.starts, self.ends = starts[usable][by_start], ends[usable][by_end]
+        self.start_sums = np.concatenate(([0], np.cumsum(effectiveness[usable][by_start])))
+        self.end_sums = np.concatenate(([0], np.cumsum(effectiveness[usable][by_end])))
+        self.boundaries = np.unique(np.concatenate((self.starts, self.ends)))
+
+    def at(self, times, tolerance):
+        started = np.searchsorted(self.starts, times + tolerance, side='right')
+        ended = np.searchsorted(self.ends, times + tolerance, side='right')
+        return self.start_sums[started] - self.end_sums[ended], started - ended
+
+
+def _steps(offsets, step, round_up):
+    scaled = offsets / step
+    return (np.ceil(scaled - _EPS) if round_up else np.floor(scaled + _EPS)).astype(np.int64)
+
+
+def _task_segments(task, step, active):
+    # First step, step count, start time and law total of every segment of one task. A segment ends
+    # where a session starts or ends and around every step that contains a multiple of 3 or 7 minutes.
+    start, duration = float(task.start_time), float(task.duration)
+    n = int(_steps(np.array(duration), step, True)) if duration > 0 else 0
+    end = start + n * step
+    cuts = [np.array([0, n])]
+    for sessions in active:
+        inside = sessions.boundaries[(sessions.boundaries > start) & (sessions.boundaries < end)]
+        cuts.append(_steps(inside - start, step, True))
+    law_steps, law_adds = [], []
+    for period, add in LAWS:
+        multiples = np.arange(np.ceil(start / period - _EPS), np.ceil(end / period - _EPS)) * period
+        law_steps.append(np.clip(_steps(multiples - start, step, False), 0, max(n - 1, 0)))
+        law_adds.append(np.full(len(multiples), add))
+    law_steps, law_adds = np.concatenate(law_steps), np.concatenate(law_adds)
+    cuts.extend((law_steps, law_steps + 1))
+    cuts = np.unique(np.clip(np.concatenate(cuts), 0, n))
+    first = cuts[:-1]
+    law = np.zeros(len(first))
+    np.add.at(law, np.searchsorted(first, law_steps), law_adds)
+    return first, np.diff(cuts), start + first * step, law
+
+
+def _regime_steps(level, add, cap, gain, session_cap, law, min_attention, relief, count):
+    # How many steps from the first one keep the same relief decision. From the second step on the level
+    # going into the drain is monotone, so the first step that flips can be found by bisection.
+    def flips(k):
+        before = min(float(_after(level, k - 1, add, cap)) + gain, session_cap) + law
+        return (before < min_attention) != relief
+    if not flips(count):
+        return count
+    lo, hi = 1, count
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if flips(mid):
+            hi = mid
+        else:
+            lo = mid
+    return lo
+
+
+def simulate_events(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type,
+                    apply_meditation=True, apply_breathing=True, voluntary=False, resolution=1.0):
+    # Event-driven counterpart of simulate() / simulate_with_voluntary(). Each task still runs on its own
+    # clock from its start time, in list order even where tasks overlap (there is no `overlap` rule here),
+    # but in steps of `resolution` minutes: sessions add effectiveness and the task drains difficulty in
+    # proportion to the step, and a law fires on the step that contains its multiple of 7 or 3 minutes,
+    # so the laws also apply to fractional start times. Between two events (a session or practice
+    # starting or ending, a law step, or a switch of the voluntary intention) every step is the same
+    # map, evaluated in closed form; the work grows with the number of events, not with the length of
+    # the schedule or the resolution. At one-minute resolution and whole-minute start times it gives
+    # simulate()'s curve up to floating point rounding.
+    schedule = Schedule(tasks, meditation_sessions, breathing_practices, enneagram_type, initial_attention, min_attention, max_attention)
+    step = float(resolution)
+    indexes = [_Active(sessions) if applied else None for sessions, applied in ((meditation_sessions, apply_meditation), (breathing_practices, apply_breathing))]
+    active = [index for index in indexes if index is not None]
+    tolerance = _EPS * step
+    columns = {'first_time': [], 'count': [], 'task_id': [], 'law': [], 'drain': []}
+    for task in tasks:
+        first, count, first_time, law = _task_segments(task, step, active)
+        columns['first_time'].append(first_time)
+        columns['count'].append(count)
+        columns['task_id'].append(np.full(len(count), task.task_id, dtype=np.int64))
+        columns['law'].append(law)
+        columns['drain'].append(np.full(len(count), float(task.difficulty) * step))
+    first_time, count, task_id, law, drain = (np.concatenate(columns[name]) if tasks else np.empty(0)
+                                              for name in ('first_time', 'count', 'task_id', 'law', 'drain'))
+    count, task_id = count.astype(np.int64), task_id.astype(np.int64)
+
+    # Per-step gain from meditation and from breathing in every segment, and whether any session caps the level
+    gains, running = [], np.zeros(len(count), dtype=np.int64)
+    for index in indexes:
+        if index is None:
+            gains.append(np.zeros(len(count)))
+            continue
+        total, number = index.at(first_time, tolerance)
+        gains.append(total * step)
+        running += number
+    gain = gains[0] + gains[1]
+    session_cap = np.where(running > 0, float(max_attention), np.inf)
+    start_level = float(schedule.start_level())
+
+    if not voluntary:
+        add = gain + law - drain
+        cap = session_cap + law - drain
+        ends = clamped_cumsum(start_level, count * add, cap + (count - 1) * np.minimum(add, 0))
+        start = np.concatenate(([start_level], ends[:-1]))
+        relief = np.zeros(len(count), dtype=bool)
+        segment = np.arange(len(count))
+        pieces = (first_time, count, start, add, cap, relief)
+    else:
+        pieces, segment = _voluntary(start_level, float(min_attention), step, first_time, count, gain, session_cap, law, drain)
+    first_time, count, start, add, cap, relief = pieces
+    accumulated_fatigue = sum(task.difficulty for task in tasks)
+    avg_external_factors = sum(task.criticality for task in tasks) / len(tasks) if tasks else 0
+    voluntary_gain = float((count * 0.5 * drain[segment])[relief].sum()) if voluntary else 0
+    by_segment = np.bincount(segment, weights=count, minlength=len(gain)) if len(segment) else np.zeros(len(gain))
+    return EventCurve(step, first_time, count, task_id[segment], start, add, cap, relief, voluntary,
+                      float((by_segment * gains[0]).sum()), float((by_segment * gains[1]).sum()), voluntary_gain,
+                      accumulated_fatigue, avg_external_factors)
+
+
+def _split(level, min_attention, step, time, left, gain, session_cap, law, drain, segment, out):
+    # Pieces of one segment, split at every step where the level going into the drain crosses
+    # min_attention; returns the level after the segment
+    while left:
+        relief = min(level + gain, session_cap) + law < min_attention
+        d = drain * (0.5 if relief else 1.0)
+        add, cap = gain + law - d, session_cap + law - d
+        run = _regime_steps(level, add, cap, gain, session_cap, law, min_attention, relief, left) if left > 1 else 1
+        out.append([np.array([value]) for value in (time, run, level, add, cap, relief, segment)])
+        level = float(_after(level, run, add, cap))
+        time += run * step
+        left -= run
+    return level
+
+
+def _voluntary(start_level, min_attention, step, first_time, count, gain, session_cap, law, drain):
+    # Evaluates blocks of segments in closed form under the relief decision of the block's first step,
+    # like voluntary_levels() does with ops. A segment keeps that decision throughout when its first,
+    # second and last steps do, since the level going into the drain is monotone from the second step
+    # on. The first segment that does not is split step-exactly and the next block starts after it.
+    n = len(count)
+    out = []
+    level, pos, window = start_level, 0, _MIN_WINDOW
+    while pos < n:
+        end = min(pos + window, n)
+        g, c, l, scap = gain[pos:end], count[pos:end], law[pos:end], session_cap[pos:end]
+        relief = min(level + g[0], scap[0]) + l[0] < min_attention
+        d = drain[pos:end] * (0.5 if relief else 1.0)
+        add, cap = g + l - d, scap + l - d
+        ends = clamped_cumsum(level, c * add, cap + (c - 1) * np.minimum(add, 0))
+        starts = np.concatenate(([level], ends[:-1]))
+        first = np.minimum(starts + g, scap) + l
+        second = np.minimum(_after(starts, 1, add, cap) + g, scap) + l
+        last = np.minimum(_after(starts, np.maximum(c - 1, 1), add, cap) + g, scap) + l
+        wrong = ((first < min_attention) != relief) | ((c > 1) & (((second < min_attention) != relief) | ((last < min_attention) != relief)))
+        flips = np.flatnonzero(wrong)
+        kept = flips[0] if len(flips) else end - pos
+        if kept:
+            out.append([first_time[pos:pos + kept], c[:kept], starts[:kept], add[:kept], cap[:kept],
+                        np.full(kept, relief), np.arange(pos, pos + kept)])
+            level = float(ends[kept - 1])
+        if len(flips):
+            i = pos + kept
+            level = _split(level, min_attention, step, float(first_time[i]), int(count[i]), float(gain[i]), float(session_cap[i]),
+                           float(law[i]), float(drain[i]), i, out)
+            pos, window = i + 1, _MIN_WINDOW
+        else:
+            pos, window = end, window * 2
+    if not out:
+        return (np.empty(0), np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0), np.empty(0, dtype=bool)), np.empty(0, dtype=np.int64)
+    columns = [np.concatenate(column) for column in zip(*out)]
+    return (columns[0].astype(float), columns[1].astype(np.int64), columns[2].astype(float), columns[3].astype(float),
+            columns[4].astype(float), columns[5].astype(bool)), columns[6].astype(np.int64)
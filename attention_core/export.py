@@ -0,0 +1,111 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .engine import simulate_variants
+from .plotting import draw_correction_curve, draw_simulation
+
+FIGURES = ('simulation', 'correction')
+
+_worker_state = {}
+
+
+class FigureTemplate:
+    # A 12x6 figure on the Agg canvas, built once and redrawn for every scenario. Nothing here goes
+    # through pyplot, so it works without a display and never blocks on plt.show().
+    def __init__(self, figsize=(12, 6), dpi=100):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+
+    def draw(self, draw, *args):
+        # draw(ax, *args) onto the cleared axes
+        self.ax.clear()
+        draw(self.ax, *args)
+        self.figure.tight_layout()
+        return self.figure
+
+    def save(self, fmt='png', path=None):
+        # Writes the current drawing to `path`, or returns it in a BytesIO when no path is given
+        target = path if path is not None else BytesIO()
+        self.figure.savefig(target, format=fmt)
+        if path is None:
+            target.seek(0)
+        return target
+
+
+class ExportReport:
+    # outputs[i] belongs to schedules[i] and maps (figure, format) to a file path or the rendered bytes
+    def __init__(self, outputs, figures, seconds):
+        self.outputs = outputs
+        self.figures = figures
+        self.seconds = seconds
+
+    @property
+    def figures_per_second(self):
+        return self.figures / self.seconds if self.seconds else 0.0
+
+
+def render_schedule(schedule, templates=None, formats=('png',), directory=None, name='scenario', voluntary=False, overlap=None):
+    # Renders the simulation and correction-curve figures of one Schedule in every format. With a
+    # directory the figures are written to <directory>/<name>_<figure>.<format>; without one the
+    # rendered bytes are returned. `overlap` is passed on to simulate_variants().
+    if templates is None:
+        templates = {figure: FigureTemplate() for figure in FIGURES}
+    names = ('baseline', 'combined', 'voluntary') if voluntary else ('baseline', 'combined')
+    variants = simulate_variants(schedule.tasks, schedule.initial_attention, schedule.min_attention, schedule.max_attention,
+                                 schedule.meditation_sessions, schedule.breathing_practices, schedule.enneagram_type, names=names, overlap=overlap)
+    drawings = {
+        'simulation': (draw_simulation, variants.output(names[-1]), schedule.tasks, schedule.min_attention, schedule.meditation_sessions, schedule.breathing_practices),
+        'correction': (draw_correction_curve, variants, schedule.min_attention),
+    }
+    outputs = {}
+    for figure in FIGURES:
+        template = templates[figure]
+        template.draw(*drawings[figure])
+        for fmt in formats:
+            if directory is None:
+                outputs[(figure, fmt)] = template.save(fmt).getvalue()
+            else:
+                outputs[(figure, fmt)] = template.save(fmt, os.path.join(directory, f"{name}_{figure}.{fmt}"))
+    return outputs
+
+
+def _render_chunk(chunk, templates, formats, directory, voluntary, overlap=None):
+    return [(i, render_schedule(schedule, templates, formats, directory, f"scenario_{i}", voluntary, overlap)) for i, schedule in chunk]
+
+
+def _init_worker(formats, directory, voluntary, overlap):
+    # Every worker builds its figure templates once and reuses them for all of its scenarios
+    _worker_state['templates'] = {figure: FigureTemplate() for figure in FIGURES}
+    _worker_state['args'] = (formats, directory, voluntary, overlap)
+
+
+def _run_chunk(chunk):
+    return _render_chunk(chunk, _worker_state['templates'], *_worker_state['args'])
+
+
+def export_schedules(schedules, formats=('png',), directory=None, max_workers=None, chunk_size=4, voluntary=False, overlap=None):
+    # Renders both figures of every schedule across worker processes; max_workers=1 renders inline
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    runs = list(enumerate(schedules))
+    chunks = [runs[i:i + chunk_size] for i in range(0, len(runs), chunk_size)]
+    outputs = [None] * len(runs)
+    start = time.perf_counter()
+    if max_workers == 1:
+        templates = {figure: FigureTemplate() for figure in FIGURES}
+        for chunk in chunks:
+            for i, rendered in _render_chunk(chunk, templates, formats, directory, voluntary, overlap):
+                outputs[i] = rendered
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(formats, directory, voluntary, overlap)) as pool:
+            futures = [pool.submit(_run_chunk, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                for i, rendered in future.result():
+                    outputs[i] = rendered
+    return ExportReport(outputs, len(runs) * len(FIGURES), time.perf_counter() - start)
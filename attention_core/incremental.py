@@ -0,0 +1,189 @@
+import numpy as np
+
+from .engine import (BREATHING, MEDITATION, VARIANTS, Checkpoint, Timeline, VariantResult, build_output, checkpoints, compile_ticks,
+                     lay_out_ticks, run_timeline)
+from .model import Schedule
+
+
+class _Run:
+    def __init__(self, timeline, owner, inputs, start_level, min_attention, bounds, states, levels, below):
+        self.timeline = timeline
+        # Position in the task list of the task every minute belongs to
+        self.owner = owner
+        # What the timeline was compiled from, see _inputs()
+        self.inputs = inputs
+        self.start_level = start_level
+        self.min_attention = min_attention
+        self.bounds = bounds
+        self.states = states
+        self.levels = levels
+        self.below = below
+
+
+def _inputs(tasks, meditation_sessions, breathing_practices, max_attention, overlap):
+    # The values a timeline depends on, copied so that edits to the objects afterwards show up as changes
+    return ([(task.task_id, float(task.difficulty), float(task.duration), float(task.start_time)) for task in tasks],
+            [(float(s.start_time), float(s.duration), float(s.effectiveness)) for s in meditation_sessions],
+            [(float(s.start_time), float(s.duration), float(s.effectiveness)) for s in breathing_practices],
+            float(max_attention), overlap)
+
+
+def _edited(old, new):
+    # (first, old_end, new_end) such that old[first:old_end] became new[first:new_end] and the rest is the same
+    first, shortest = 0, min(len(old), len(new))
+    while first < shortest and old[first] == new[first]:
+        first += 1
+    same = 0
+    while same < shortest - first and old[-1 - same] == new[-1 - same]:
+        same += 1
+    return first, len(old) - same, len(new) - same
+
+
+def _renumbered(positions, end, grown):
+    # Positions in a list whose items from `end` on moved by `grown`
+    return np.where(positions >= end, positions + grown, positions)
+
+
+def _relaid(run, tasks, keys, overlap):
+    # The minutes of `tasks` from run's, laying out again only the ones the edited tasks could own.
+    # Returns times and owners, and the old minutes [head, tail) replaced by new ones [head, end).
+    first, old_end, new_end = _edited(run.inputs[0], keys)
+    times, owner = run.timeline.times, run.owner
+    if overlap is None:
+        # Every task's minutes follow the previous task's, in list order
+        head, tail = np.searchsorted(owner, [first, old_end])
+        middle, middle_owner = lay_out_ticks(tasks[first:new_end])
+        middle_owner = middle_owner + first
+    else:
+        # Minutes in time order; the edit can only move owners within the time its tasks cover
+        spans = [(start, start + duration) for _, _, duration, start in run.inputs[0][first:old_end] + keys[first:new_end] if duration > 0]
+        lo, hi = (min(span[0] for span in spans), max(span[1] for span in spans)) if spans else (np.inf, np.inf)
+        head, tail = np.searchsorted(times, [lo, hi])
+        nearby = np.array([k for k, (_, _, duration, start) in enumerate(keys) if start < hi and start + duration > lo], dtype=np.int64)
+        middle, middle_owner = lay_out_ticks([tasks[k] for k in nearby], overlap)
+        inside = (middle >= lo) & (middle < hi)
+        middle, middle_owner = middle[inside], nearby[middle_owner[inside]]
+    grown = new_end - old_end
+    times = np.concatenate((times[:head], middle, times[tail:]))
+    owner = np.concatenate((_renumbered(owner[:head], old_end, grown), middle_owner, _renumbered(owner[tail:], old_end, grown)))
+    return times, owner, int(head), int(tail), int(head + len(middle))
+
+
+def _patched(run, tasks, meditation_sessions, breathing_practices, inputs):
+    # run.timeline after an edit: the ops of the minutes the edit can reach are compiled again and all
+    # others reused. Returns the timeline, its owners and the first op that differs from run's.
+    times, owner, head, tail, end = _relaid(run, tasks, inputs[0], inputs[4])
+    old, n = run.timeline, len(times)
+    # New minutes [start, stop) get new ops; the old ones before them and after them keep theirs
+    start, stop = (head, end) if tail > head or end > head else (n, 0)
+    moved = []
+    for kind, index in ((MEDITATION, 1), (BREATHING, 2)):
+        first, old_end, new_end = _edited(run.inputs[index], inputs[index])
+        moved.append((kind, old_end, new_end - old_end))
+        touched = np.zeros(n, dtype=bool)
+        for session_start, duration, _ in run.inputs[index][first:old_end] + inputs[index][first:new_end]:
+            touched |= (times >= session_start) & (times < session_start + duration)
+        touched = np.flatnonzero(touched)
+        if len(touched):
+            start, stop = min(start, int(touched[0])), max(stop, int(touched[-1]) + 1)
+    stop = max(start, stop)
+    grown = n - len(old)
+    ops_head, ops_tail = np.searchsorted(old.op_tick, [start, stop - grown])
+    task_ids = np.array([task.task_id for task in tasks], dtype=np.int64)[owner]
+    difficulty = np.array([float(task.difficulty) for task in tasks])[owner]
+    schedule = Schedule(tasks, meditation_sessions, breathing_practices, None, None, None, inputs[3])
+    middle = compile_ticks([schedule], times[start:stop], task_ids[start:stop], difficulty[start:stop], np.zeros(stop - start, dtype=np.int64))
+    spliced = {name: np.concatenate((getattr(old, name)[:ops_head], getattr(middle, name), getattr(old, name)[ops_tail:]))
+               for name in ('op_kind', 'op_source', 'op_add', 'op_cap')}
+    spliced['op_tick'] = np.concatenate((old.op_tick[:ops_head], middle.op_tick + start, old.op_tick[ops_tail:] + grown))
+    # Reused ops never come from an edited session, only from ones that moved along the list
+    reused = np.ones(len(spliced['op_kind']), dtype=bool)
+    reused[ops_head:ops_head + len(middle.op_kind)] = False
+    for kind, old_end, shift in moved:
+        spliced['op_source'][reused & (spliced['op_kind'] == kind) & (spliced['op_source'] >= old_end)] += shift
+    timeline = Timeline(times, task_ids, difficulty, np.zeros(n, dtype=np.int64), spliced['op_tick'], spliced['op_kind'],
+                        spliced['op_source'], spliced['op_add'], spliced['op_cap'], np.zeros(len(spliced['op_kind']), dtype=np.int64))
+    return timeline, owner, int(ops_head)
+
+
+def _compiled(tasks, meditation_sessions, breathing_practices, max_attention, overlap):
+    # compile_schedule(), also returning the owners of the minutes
+    times, owner = lay_out_ticks(tasks, overlap)
+    task_ids = np.array([task.task_id for task in tasks], dtype=np.int64)[owner]
+    difficulty = np.array([float(task.difficulty) for task in tasks])[owner]
+    schedule = Schedule(tasks, meditation_sessions, breathing_practices, None, None, None, max_attention)
+    return compile_ticks([schedule], times, task_ids, difficulty, np.zeros(len(times), dtype=np.int64)), owner
+
+
+def _states(bounds, levels, checkpoint):
+    # Checkpoint of every variant at each bound from checkpoint.position onwards
+    positions = bounds[bounds >= checkpoint.position]
+    level = np.concatenate((np.asarray(checkpoint.level, dtype=float)[:, None], levels), axis=1)[:, positions - checkpoint.position]
+    return [Checkpoint(int(p), level[:, j]) for j, p in enumerate(positions)]
+
+
+class IncrementalSimulator:
+    # Drop-in replacement for simulate()/simulate_with_voluntary()/simulate_variants() that remembers the
+    # last run of each kind of call. After an edit it resumes from the latest checkpoint before the first
+    # changed op and reuses the levels before it; the result is identical to a full run.
+    def __init__(self):
+        self._runs = {}
+        self.resumed_from = 0
+
+    def simulate(self, tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation, apply_breathing, overlap=None):
+        return self._output((apply_meditation, apply_breathing, False), tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, overlap)
+
+    def simulate_with_voluntary(self, tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation, apply_breathing, overlap=None):
+        return self._output((apply_meditation, apply_breathing, True), tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, overlap)
+
+    def simulate_variants(self, tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, names=tuple(VARIANTS), progress=None, overlap=None):
+        variants = tuple(VARIANTS[name] for name in names)
+        run, _ = self._run(variants, tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, progress, overlap)
+        return VariantResult(tasks, run.timeline, list(names), list(variants), run.levels, run.below, run.start_level)
+
+    def clear(self):
+        self._runs.clear()
+
+    def _output(self, variant, tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, overlap=None):
+        run, _ = self._run((variant,), tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, overlap=overlap)
+        return build_output(tasks, run.timeline, run.levels[0], run.below[0], run.start_level, variant)
+
+    def _resume_point(self, previous, changed, bounds, start_level, min_attention, variants):
+        if previous is None or previous.start_level != start_level or (any(v[2] for v in variants) and previous.min_attention != min_attention):
+            return 0
+        # Both runs must have split everything before the resume point into the same segments
+        n = min(len(bounds), len(previous.bounds))
+        same = np.flatnonzero((bounds[:n] != previous.bounds[:n]) | (bounds[:n] > changed))
+        common = int(same[0]) if len(same) else n
+        return common - 1 if common else 0
+
+    def _run(self, variants, tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, progress=None, overlap=None):
+        # A run stopped by an exception from `progress` leaves the previous run in place
+        # After an edit only the ops of the minutes it can reach are compiled again, and the first of
+        # them is where the results can start to differ
+        inputs = _inputs(tasks, meditation_sessions, breathing_practices, max_attention, overlap)
+        previous = self._runs.get(variants)
+        if previous is not None and previous.inputs[3:] == inputs[3:]:
+            timeline, owner, changed = _patched(previous, tasks, meditation_sessions, breathing_practices, inputs)
+        else:
+            timeline, owner = _compiled(tasks, meditation_sessions, breathing_practices, max_attention, overlap)
+            changed = 0
+        start_level = enneagram_type.apply_effects(initial_attention)
+        bounds = checkpoints(timeline)
+
+        index = self._resume_point(previous, changed, bounds, start_level, min_attention, variants)
+        if index:
+            checkpoint = previous.states[index]
+        else:
+            checkpoint = Checkpoint(0, np.full(len(variants), float(start_level)))
+        suffix, suffix_below = run_timeline(timeline, checkpoint.level, variants, min_attention, checkpoint.position, bounds, progress)
+        if index:
+            levels = np.concatenate((previous.levels[:, :checkpoint.position], suffix), axis=1)
+            below = np.concatenate((previous.below[:, :checkpoint.position], suffix_below), axis=1)
+        else:
+            levels, below = suffix, suffix_below
+        states = (previous.states[:index] if index else []) + _states(bounds, suffix, checkpoint)
+        run = _Run(timeline, owner, inputs, start_level, min_attention, bounds, states, levels, below)
+        self._runs[variants] = run
+        self.resumed_from = checkpoint.position
+        return run, checkpoint
@@ -0,0 +1,100 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# The Recorder of the recording() block in progress. While it is None every hook returns at once.
+_recorder = None
+_NOT_RECORDING = contextlib.nullcontext()
+
+
+class Recorder:
+    # Collects how long each phase of the engine, the plotting and the explanation took and what they
+    # counted along the way (ticks, session hits, clamps at max_attention, voluntary-intention
+    # activations, points drawn), from every thread, until recording() finishes
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # list.append is atomic, so phases from other threads need no lock
+            self.spans.append((name, start, time.perf_counter(), threading.get_ident()))
+
+    def count(self, name, amount):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def metrics(self):
+        # {'phases': {name: {'calls', 'seconds'}}, 'counters': {name: total}}; a phase's seconds
+        # include the phases nested inside it
+        phases = {}
+        for name, start, end, _ in self.spans:
+            entry = phases.setdefault(name, {'calls': 0, 'seconds': 0.0})
+            entry['calls'] += 1
+            entry['seconds'] += end - start
+        return {'phases': phases, 'counters': dict(self.counters)}
+
+    def chrome_trace(self):
+        # Trace Event Format, for chrome://tracing or https://ui.perfetto.dev: one complete event per
+        # phase on the thread that ran it, and the counters as one counter event at the end
+        pid = os.getpid()
+        events = [{'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6}
+                  for name, start, end, tid in self.spans]
+        end = max((span[2] for span in self.spans), default=self.origin)
+        events.append({'name': 'counters', 'ph': 'C', 'pid': pid, 'tid': 0, 'ts': (end - self.origin) * 1e6, 'args': dict(self.counters)})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+@contextlib.contextmanager
+def recording(recorder=None):
+    # with recording() as recorder: simulate(...); recorder.metrics()
+    global _recorder
+    previous, _recorder = _recorder, recorder if recorder is not None else Recorder()
+    try:
+        yield _recorder
+    finally:
+        _recorder = previous
+
+
+def enabled():
+    # For counters that cost something to work out: compute them only when someone is recording
+    return _recorder is not None
+
+
+def phase(name):
+    recorder = _recorder
+    return _NOT_RECORDING if recorder is None else recorder.phase(name)
+
+
+def count(name, amount=1):
+    recorder = _recorder
+    if recorder is not None:
+        recorder.count(name, amount)
+
+
+def timed(name):
+    # Records every call of the decorated function as phase `name`
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            recorder = _recorder
+            if recorder is None:
+                return function(*args, **kwargs)
+            with recorder.phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,38 @@
+import numpy as np
+
+
+class IntervalIndex:
+    # [start_time, start_time + duration) of meditation sessions or breathing practices, looked up
+    # for a whole array of minutes at once. Overlapping sessions are all active at once and are
+    # reported with their position in the list, exactly like scanning it.
+    def __init__(self, sessions):
+        self.sessions = list(sessions)
+        self.starts = np.array([float(s.start_time) for s in self.sessions])
+        self.ends = np.array([float(s.start_time + s.duration) for s in self.sessions])
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def hits(self, times, order=None):
+        # Every (minute index, session index) pair with start <= times[minute] < end
+        return range_hits(times, self.starts, self.ends, order)
+
+
+def range_hits(times, starts, ends, order=None):
+    # `order` lets callers that query the same times repeatedly sort them only once
+    times = np.asarray(times)
+    if not len(starts) or not len(times):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    if order is None:
+        order = np.argsort(times)
+    ordered = times[order]
+    lo = np.searchsorted(ordered, starts, side='left')
+    hi = np.searchsorted(ordered, ends, side='left')
+    counts = np.maximum(hi - lo, 0)
+    return order[expand_ranges(lo, counts)], np.repeat(np.arange(len(starts)), counts)
+
+
+def expand_ranges(first, counts):
+    # Concatenation of arange(first[i], first[i] + counts[i]) for every i
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(first, counts) + offsets
@@ -0,0 +1,58 @@
+import queue
+import threading
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Job:
+    # Runs work(progress) on a background thread so a Tk window stays responsive. The work calls
+    # progress(done, total) as it goes, e.g. as the `progress` argument of simulate_variants(). The
+    # thread posts ('progress', done, total) and finally ('done', value), ('error', exception) or
+    # ('cancelled',) to a queue that the main loop drains with poll(). After cancel() the next
+    # progress call raises Cancelled, so the work stops at its next segment boundary.
+    def __init__(self, work):
+        self._messages = queue.Queue()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(work,), daemon=True)
+        self.finished = False
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _progress(self, done, total):
+        if self._cancel.is_set():
+            raise Cancelled()
+        self._messages.put(('progress', done, total))
+
+    def _run(self, work):
+        try:
+            value = work(self._progress)
+        except Cancelled:
+            self._messages.put(('cancelled',))
+        except Exception as error:
+            self._messages.put(('error', error))
+        else:
+            # Cancelled after the last progress call: the value is finished but nobody wants it any more
+            self._messages.put(('cancelled',) if self._cancel.is_set() else ('done', value))
+
+    def poll(self):
+        # Messages posted since the last call, with consecutive progress updates collapsed into the latest
+        messages = []
+        while True:
+            try:
+                message = self._messages.get_nowait()
+            except queue.Empty:
+                break
+            if messages and message[0] == messages[-1][0] == 'progress':
+                messages[-1] = message
+            else:
+                messages.append(message)
+            if message[0] != 'progress':
+                self.finished = True
+        return messages
@@ -0,0 +1,85 @@
+class Task:
+    def __init__(self, task_id, name, base_attention, difficulty, criticality, duration, start_time):
+        self.task_id = task_id
+        self.name = name
+        self.base_attention = base_attention
+        self.difficulty = difficulty
+        self.criticality = criticality
+        self.duration = duration
+        self.start_time = start_time
+
+
+class MeditationSession:
+    def __init__(self, start_time, duration, effectiveness):
+        self.start_time = start_time
+        self.duration = duration
+        self.effectiveness = effectiveness
+
+
+class BreathingPractice:
+    def __init__(self, name, start_time, duration, effectiveness):
+        self.name = name
+        self.start_time = start_time
+        self.duration = duration
+        self.effectiveness = effectiveness
+
+
+class EnneagramType:
+    def __init__(self, type_id, name, transmutation_practices):
+        self.type_id = type_id
+        self.name = name
+        self.transmutation_practices = transmutation_practices
+
+    def apply_effects(self, attention_level):
+        # Example effects based on Enneagram type
+        if self.type_id == 1:
+            attention_level += 5  # Reformer gets a slight attention boost
+        elif self.type_id == 2:
+            attention_level += 3  # Helper gets a smaller attention boost
+        # Add other types and effects as needed
+        return attention_level
+
+
+ENNEAGRAM_TYPES = [
+    EnneagramType(1, "Reformer", ["Precision", "Discipline"]),
+    EnneagramType(2, "Helper", ["Empathy", "Generosity"]),
+    EnneagramType(3, "Achiever", ["Focus", "Drive"]),
+    EnneagramType(4, "Individualist", ["Creativity", "Authenticity"]),
+    EnneagramType(5, "Investigator", ["Observation", "Analysis"]),
+    EnneagramType(6, "Loyalist", ["Loyalty", "Responsibility"]),
+    EnneagramType(7, "Enthusiast", ["Enthusiasm", "Curiosity"]),
+    EnneagramType(8, "Challenger", ["Strength", "Protection"]),
+    EnneagramType(9, "Peacemaker", ["Harmony", "Peace"])
+]
+
+
+class Schedule:
+    # Everything one call to simulate() needs, bundled so that many plans can be passed around at once
+    def __init__(self, tasks, meditation_sessions, breathing_practices, enneagram_type, initial_attention, min_attention, max_attention):
+        self.tasks = tasks
+        self.meditation_sessions = meditation_sessions
+        self.breathing_practices = breathing_practices
+        self.enneagram_type = enneagram_type
+        self.initial_attention = initial_attention
+        self.min_attention = min_attention
+        self.max_attention = max_attention
+
+    def start_level(self):
+        return self.enneagram_type.apply_effects(self.initial_attention)
+
+
+class Person:
+    # One member of a team in a roster run: the shared tasks and meditation sessions, seen with their own
+    # Enneagram type, thresholds and breathing practices
+    def __init__(self, name, enneagram_type, initial_attention, min_attention, max_attention, breathing_practices=()):
+        self.name = name
+        self.enneagram_type = enneagram_type
+        self.initial_attention = initial_attention
+        self.min_attention = min_attention
+        self.max_attention = max_attention
+        self.breathing_practices = list(breathing_practices)
+
+    def schedule(self, tasks, meditation_sessions, breathing_practices=()):
+        # Their day as a single plan: the team's breathing practices, then their own
+        return Schedule(tasks, meditation_sessions, list(breathing_practices) + self.breathing_practices, self.enneagram_type,
+                        self.initial_attention, self.min_attention, self.max_attention)
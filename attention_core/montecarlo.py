@@ -0,0 +1,63 @@
+import numpy as np
+
+from .batch import iter_shared_clock, task_minutes
+
+
+class MonteCarloResult:
+    # Per-minute statistics over all replicates: bands[i] is the percentiles[i]-th percentile of the
+    # attention level at times, below_probability the share of replicates under min_attention
+    def __init__(self, times, percentiles, bands, below_probability, min_attention, replicates, seed):
+        self.times = times
+        self.percentiles = percentiles
+        self.bands = bands
+        self.below_probability = below_probability
+        self.min_attention = min_attention
+        self.replicates = replicates
+        self.seed = seed
+
+    def __len__(self):
+        return len(self.times)
+
+    def band(self, percentile):
+        return self.bands[list(self.percentiles).index(percentile)]
+
+
+def _normal(rng, sd, shape):
+    # Row r only depends on the seed, not on how many replicates are drawn. Without noise it is exactly
+    # zero and draws nothing, so a run without any noise reproduces simulate() in every replicate.
+    return rng.normal(0.0, sd, shape) if sd else np.zeros(shape)
+
+
+def _noisy(values, sd, rng, replicates):
+    # Clipped at zero, so noise never turns a task into a rest or a session into a drain
+    noisy = values + _normal(rng, sd, (replicates, len(values)))
+    return np.maximum(noisy, 0.0) if sd else noisy
+
+
+def simulate_monte_carlo(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type,
+                         replicates=1000, difficulty_sd=0.0, effectiveness_sd=0.0, jitter_sd=0.0, enneagram_sd=0.0,
+                         apply_meditation=True, apply_breathing=True, voluntary=False, percentiles=(5, 50, 95), seed=None, overlap=None):
+    # Simulates `replicates` noisy copies of the schedule at once. Every replicate draws its own task
+    # difficulties, session effectiveness, session start times (shifted by jitter_sd minutes; tasks keep
+    # the clock the bands are drawn against) and Enneagram offset from normal distributions with the
+    # given standard deviations. Each kind of noise has its own stream spawned from `seed`, so the same
+    # seed gives the same result and switching one kind of noise on does not change the others' draws.
+    # `overlap` puts the tasks on one forward clock, see compile_schedules().
+    sessions = list(meditation_sessions) + list(breathing_practices)
+    difficulty_rng, effectiveness_rng, jitter_rng, enneagram_rng = (np.random.default_rng(stream) for stream in np.random.SeedSequence(seed).spawn(4))
+    difficulty = _noisy(np.array([float(task.difficulty) for task in tasks]), difficulty_sd, difficulty_rng, replicates)
+    effectiveness = _noisy(np.array([float(s.effectiveness) for s in sessions]), effectiveness_sd, effectiveness_rng, replicates)
+    starts = np.array([float(s.start_time) for s in sessions])
+    starts = starts + _normal(jitter_rng, jitter_sd, (replicates, len(sessions)))
+    ends = starts + np.array([float(s.duration) for s in sessions])
+    start_levels = enneagram_type.apply_effects(initial_attention) + _normal(enneagram_rng, enneagram_sd, replicates)
+    enabled = np.array([apply_meditation] * len(meditation_sessions) + [apply_breathing] * len(breathing_practices), dtype=bool)
+
+    timeline = task_minutes(tasks, overlap)
+    bands = np.empty((len(percentiles), len(timeline)))
+    below_probability = np.empty(len(timeline))
+    for ticks, attention in iter_shared_clock(timeline, start_levels, min_attention, max_attention, starts[:, enabled], ends[:, enabled],
+                                              effectiveness[:, enabled], difficulty, voluntary):
+        bands[:, ticks] = np.percentile(attention, percentiles, axis=0)
+        below_probability[ticks] = (attention < min_attention).mean(axis=0)
+    return MonteCarloResult(timeline.times, tuple(percentiles), bands, below_probability, min_attention, replicates, seed)
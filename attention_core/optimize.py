@@ -0,0 +1,167 @@
+import numpy as np
+
+from .engine import BREATHING, MEDITATION, TASK, clamped_cumsum, compile_schedules
+from .intervals import expand_ranges, range_hits
+from .model import Schedule
+
+OBJECTIVES = ('minutes_above_min', 'lowest_attention')
+
+# Largest candidates x operations matrix evaluated at once
+_BLOCK_CELLS = 1 << 22
+
+
+class Placement:
+    # A session chosen by the optimizer. It has the attributes the engine reads from
+    # MeditationSession / BreathingPractice, so it can be added to a schedule as is.
+    def __init__(self, kind, start_time, duration, effectiveness, name="Optimized"):
+        self.kind = kind
+        self.name = name
+        self.start_time = start_time
+        self.duration = duration
+        self.effectiveness = effectiveness
+
+
+class OptimizationResult:
+    def __init__(self, schedule, placements, score, baseline_score, evaluated, pruned):
+        self.schedule = schedule
+        self.placements = placements
+        self.score = score
+        self.baseline_score = baseline_score
+        self.evaluated = evaluated
+        self.pruned = pruned
+
+
+def _with_sessions(schedule, meditation_sessions, breathing_practices):
+    return Schedule(schedule.tasks, meditation_sessions, breathing_practices, schedule.enneagram_type,
+                    schedule.initial_attention, schedule.min_attention, schedule.max_attention)
+
+
+def score_levels(levels, min_attention, objective):
+    levels = np.atleast_2d(np.asarray(levels, dtype=float))
+    if objective == 'minutes_above_min':
+        return (levels >= min_attention).sum(axis=-1)
+    return levels.min(axis=-1, initial=np.inf)
+
+
+def _best_placement(schedule, kind, effectiveness, durations, start_step, objective, incumbent, overlap=None):
+    # Scores every (start, duration) candidate for one more session of `kind` and returns the best.
+    # The schedule is compiled once with a zero-effect probe session covering every minute, so each
+    # candidate only has to switch the probe on over its own minutes. Candidates are re-simulated
+    # from their first affected minute onwards and skipped when an upper bound on their score
+    # cannot beat the best found so far.
+    times = compile_schedules([schedule], False, False, overlap).times
+    if not len(times):
+        return None, 0, 0
+    low, high = np.floor(times.min()), times.max() + 1
+    probe = Placement(kind, low, high - low, 0.0)
+    meditation = list(schedule.meditation_sessions) + ([probe] if kind == 'meditation' else [])
+    breathing = list(schedule.breathing_practices) + ([probe] if kind == 'breathing' else [])
+    timeline = compile_schedules([_with_sessions(schedule, meditation, breathing)], overlap=overlap)
+    kind_code, probe_source = (MEDITATION, len(meditation) - 1) if kind == 'meditation' else (BREATHING, len(breathing) - 1)
+    slot_pos = np.flatnonzero((timeline.op_kind == kind_code) & (timeline.op_source == probe_source))
+    task_pos = np.flatnonzero(timeline.op_kind == TASK)
+
+    add = timeline.op_add
+    cap = timeline.op_cap.copy()
+    cap[slot_pos] = np.inf
+    start_level = schedule.start_level()
+    levels = clamped_cumsum(start_level, add, cap)
+    base = levels[task_pos]
+    min_attention = schedule.min_attention
+
+    starts = np.arange(low, high, start_step)
+    cand_start = np.repeat(starts, len(durations))
+    cand_duration = np.tile(np.asarray(durations, dtype=float), len(starts))
+    hit_tick, hit_cand = range_hits(times, cand_start, cand_start + cand_duration)
+    count = len(cand_start)
+    hits = np.bincount(hit_cand, minlength=count)
+    hit_first = np.cumsum(hits) - hits
+    first_tick = np.full(count, len(times))
+    np.minimum.at(first_tick, hit_cand, hit_tick)
+
+    # Every op is 1-Lipschitz and non-decreasing, so a candidate can lift any later minute by at most effectiveness x hits
+    lift = max(float(effectiveness), 0.0) * hits
+    if objective == 'minutes_above_min':
+        prefix = np.concatenate(([0], np.cumsum(base >= min_attention)))
+        bound = prefix[first_tick].astype(float)
+        for value in np.unique(lift):
+            chosen = lift == value
+            suffix = np.concatenate((np.cumsum((base >= min_attention - value)[::-1])[::-1], [0]))
+            bound[chosen] += suffix[first_tick[chosen]]
+    else:
+        prefix = np.concatenate(([np.inf], np.minimum.accumulate(base)))
+        suffix = np.concatenate((np.minimum.accumulate(base[::-1])[::-1], [np.inf]))
+        bound = np.minimum(prefix[first_tick], suffix[first_tick] + lift)
+
+    order = np.flatnonzero(hits > 0)
+    order = order[np.argsort(-bound[order], kind='stable')]
+    block_size = max(1, _BLOCK_CELLS // len(add))
+    best_score, best = incumbent, None
+    evaluated = 0
+    for i in range(0, len(order), block_size):
+        block = order[i:i + block_size]
+        if best_score is not None:
+            block = block[bound[block] > best_score]
+            if not len(block):
+                break
+        first = first_tick[block].min()
+        pmin = slot_pos[first]
+        block_add = np.tile(add[pmin:], (len(block), 1))
+        block_cap = np.tile(cap[pmin:], (len(block), 1))
+        idx = expand_ranges(hit_first[block], hits[block])
+        rows = np.repeat(np.arange(len(block)), hits[block])
+        cols = slot_pos[hit_tick[idx]] - pmin
+        block_add[rows, cols] = effectiveness
+        block_cap[rows, cols] = schedule.max_attention
+        out = clamped_cumsum(levels[pmin - 1] if pmin else start_level, block_add, block_cap)
+        tail = out[:, task_pos[first:] - pmin]
+        if objective == 'minutes_above_min':
+            scores = prefix[first] + score_levels(tail, min_attention, objective)
+        else:
+            scores = np.minimum(prefix[first], score_levels(tail, min_attention, objective))
+        evaluated += len(block)
+        winner = int(np.argmax(scores))
+        if best_score is None or scores[winner] > best_score:
+            best_score = scores[winner]
+            c = block[winner]
+            best = (best_score, Placement(kind, float(cand_start[c]), float(cand_duration[c]), effectiveness))
+    return best, evaluated, count - evaluated
+
+
+def optimize_sessions(schedule, meditation_budget=0, breathing_budget=0, durations=(5, 10, 15), start_step=1,
+                      meditation_effectiveness=5, breathing_effectiveness=3, objective='minutes_above_min', overlap=None):
+    # Greedily places the budgeted sessions one at a time, each at the start time and duration
+    # that improves `objective` the most given the sessions already placed. `overlap` puts the tasks on
+    # one forward clock, see compile_schedules().
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+    meditation = list(schedule.meditation_sessions)
+    breathing = list(schedule.breathing_practices)
+    current = _with_sessions(schedule, meditation, breathing)
+    timeline = compile_schedules([current], overlap=overlap)
+    baseline = score_levels(clamped_cumsum(current.start_level(), timeline.op_add, timeline.op_cap)[timeline.op_kind == TASK],
+                            current.min_attention, objective)[0]
+    remaining = {'meditation': meditation_budget, 'breathing': breathing_budget}
+    effectiveness = {'meditation': meditation_effectiveness, 'breathing': breathing_effectiveness}
+    placements = []
+    score = baseline
+    evaluated = pruned = 0
+    while any(remaining.values()):
+        best = None
+        for kind in remaining:
+            if not remaining[kind]:
+                continue
+            found, n_evaluated, n_pruned = _best_placement(current, kind, effectiveness[kind], durations, start_step, objective,
+                                                           best[0] if best else None, overlap)
+            evaluated += n_evaluated
+            pruned += n_pruned
+            if found is not None:
+                best = found
+        if best is None:
+            break
+        score, placement = best
+        placements.append(placement)
+        remaining[placement.kind] -= 1
+        (meditation if placement.kind == 'meditation' else breathing).append(placement)
+        current = _with_sessions(schedule, meditation, breathing)
+    return OptimizationResult(current, placements, score, baseline, evaluated, pruned)
@@ -0,0 +1,321 @@
+import numpy as np
+from matplotlib.collections import LineCollection, PolyCollection
+
+from . import instrument
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: keeps the first and last point and, from each of threshold - 2
+    # equal buckets in between, the point that spans the largest triangle with the point kept from
+    # the previous bucket and the mean of the next one. Peaks and dips survive; flat runs do not.
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    # Mean of every bucket, and of the last point for the final bucket's "next" term
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    mean_x = np.append(sums_x / sizes, x[-1])
+    mean_y = np.append(sums_y / sizes, y[-1])
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - mean_x[i + 1]) * (by - y[a]) - (x[a] - bx) * (mean_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def minmax_downsample(x, y, threshold):
+    # First, lowest, highest and last point of each of threshold / 4 equal buckets, in order. With a
+    # bucket per pixel column the line covers the same pixels as the full curve, and unlike lttb() it
+    # needs no Python loop, so it is cheap enough to run on every redraw of a live chart.
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 4:
+        return x, y
+    size = -(-n // (threshold // 4))
+    rows = -(-n // size)
+    padded = np.full(rows * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(rows, size)
+    first = np.arange(rows) * size
+    keep = np.unique(np.concatenate((first, first + np.nanargmin(padded, axis=1), first + np.nanargmax(padded, axis=1),
+                                     np.minimum(first + size, n) - 1)))
+    return x[keep], y[keep]
+
+
+def envelope(x, low, high, threshold):
+    # Lowest `low` and highest `high` of each of threshold / 2 equal buckets, at the bucket's first and
+    # last x, so a band filled between them covers every pixel the full band would
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 2:
+        return x, np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+    size = -(-n // (threshold // 2))
+    rows = -(-n // size)
+    padded = np.full((2, rows * size), np.nan)
+    padded[0, :n], padded[1, :n] = low, high
+    padded = padded.reshape(2, rows, size)
+    first = np.arange(rows) * size
+    last = np.minimum(first + size, n) - 1
+    return (np.column_stack((x[first], x[last])).ravel(), np.repeat(np.nanmin(padded[0], axis=1), 2),
+            np.repeat(np.nanmax(padded[1], axis=1), 2))
+
+
+def _pixel_width(ax):
+    return int(ax.figure.get_figwidth() * ax.figure.dpi)
+
+
+def _pixel_height(ax):
+    return int(ax.figure.get_figheight() * ax.figure.dpi)
+
+
+def _cells(values, pixels):
+    low, high = values.min(), values.max()
+    return ((values - low) * (pixels / (high - low)) if high > low else np.zeros(len(values))).astype(np.int64)
+
+
+def thin_points(ax, times, levels):
+    # Points that fall into the same pixel of the figure draw the same marker; keep the first of each
+    times = np.asarray(times, dtype=float)
+    levels = np.asarray(levels, dtype=float)
+    width, height = _pixel_width(ax), _pixel_height(ax)
+    if len(times) <= width:
+        return times, levels
+    cells = _cells(times, width) * (height + 1) + _cells(levels, height)
+    _, keep = np.unique(cells, return_index=True)
+    keep.sort()
+    return times[keep], levels[keep]
+
+
+@instrument.timed('plot.curve')
+def plot_curve(ax, x, y, **kwargs):
+    # Plots a long curve downsampled to about one point per pixel of the figure's width
+    return ax.plot(*lttb(x, y, _pixel_width(ax)), **kwargs)
+
+
+@instrument.timed('plot.points')
+def scatter_points(ax, times, levels, **kwargs):
+    # One artist per category of point; nothing at all when there are no points, like the per-point loop
+    if len(times):
+        times, levels = thin_points(ax, times, levels)
+        instrument.count('points_drawn', len(times))
+        return ax.scatter(times, levels, **kwargs)
+
+
+@instrument.timed('plot.spans')
+def draw_spans(ax, starts, ends, **kwargs):
+    # Like one axvspan per (start, end) pair, but a single artist with a single legend entry
+    if not len(starts):
+        return
+    x = np.column_stack((starts, starts, ends, ends))
+    y = np.tile([0, 1, 1, 0], (len(x), 1))
+    spans = PolyCollection(np.stack((x, y), axis=-1), transform=ax.get_xaxis_transform(), **kwargs)
+    # Only the x extent counts towards the data limits, and the view is rescaled once before drawing
+    # rather than on every call, which matters when a plan draws one collection per task name
+    ax.add_collection(spans, autolim=False)
+    ax.update_datalim(np.column_stack((x.ravel(), np.zeros(x.size))), updatey=False)
+    ax.autoscale(None, axis='x')
+    return spans
+
+
+@instrument.timed('plot.tasks')
+def draw_task_spans(ax, tasks, **kwargs):
+    # The time of every task as draw_spans() collections, one per task name with a 'Task: name' legend
+    # entry, in the order the names first appear
+    spans = {}
+    for task in tasks:
+        starts, ends = spans.setdefault(task.name, ([], []))
+        starts.append(task.start_time)
+        ends.append(task.start_time + task.duration)
+    return [draw_spans(ax, starts, ends, label=f'Task: {name}', **kwargs) for name, (starts, ends) in spans.items()]
+
+
+@instrument.timed('plot.laws')
+def draw_law_markers(ax, end_time):
+    # Law of Octaves (every 7th minute) and Law of Three (every 3rd minute) as one dashed line collection each.
+    # Once there are more markers than pixels across the figure they merge into a band, so only
+    # about one per pixel is drawn.
+    end = max(int(end_time), 0)
+    for step, color, label in ((7, 'blue', 'Law of Octaves'), (3, 'red', 'Law of Three')):
+        stride = step * max(1, -(-end // (step * _pixel_width(ax))))
+        marks = np.arange(0, end, stride)
+        if not len(marks):
+            continue
+        segments = np.zeros((len(marks), 2, 2))
+        segments[:, :, 0] = marks[:, None]
+        segments[:, 1, 1] = 1
+        # x in data coordinates and y across the whole axes, like axvline
+        ax.add_collection(LineCollection(segments, colors=color, linestyles='--', label=label, transform=ax.get_xaxis_transform()))
+
+
+@instrument.timed('plot.simulation')
+def draw_simulation(ax, result, tasks, min_attention, meditation_sessions, breathing_practices):
+    # The attention-over-time chart of one run, drawn onto `ax`
+    plot_curve(ax, result.time, result.attention, label='Attention Level', color='b')
+
+    draw_task_spans(ax, tasks, alpha=0.2, color='yellow')
+
+    draw_spans(ax, [session.start_time for session in meditation_sessions], [session.start_time + session.duration for session in meditation_sessions], alpha=0.2, color='green', label='Meditation')
+    draw_spans(ax, [practice.start_time for practice in breathing_practices], [practice.start_time + practice.duration for practice in breathing_practices], alpha=0.2, color='purple', label='Breathing')
+
+    scatter_points(ax, *result.points('meditation'), color='r', s=50, label='Meditation Point')
+    scatter_points(ax, *result.points('breathing'), color='pink', s=50, label='Breathing Point')
+    scatter_points(ax, *result.points('voluntary'), color='orange', s=50, label='Voluntary Intention')
+
+    # Highlight Law of Octaves and Law of Three intervals
+    if len(result):
+        draw_law_markers(ax, result.time.max())
+
+    ax.axhline(y=min_attention, color='gray', linestyle='--', label='Min Attention Threshold')
+    ax.set_xlabel('Global Clock (minutes)')
+    ax.set_ylabel('Attention Level')
+    if result.voluntary:
+        ax.set_title('Attention Level Over Time Considering Fatigue, Task Difficulty, Meditation, Breathing Practices, and Voluntary Intention')
+    else:
+        ax.set_title('Attention Level Over Time Considering Fatigue, Task Difficulty, Meditation, and Breathing Practices')
+    ax.grid(True)
+    ax.legend(loc='upper left', bbox_to_anchor=(1, 1), title="Legend")
+
+
+@instrument.timed('plot.correction_curve')
+def draw_correction_curve(ax, variants, min_attention):
+    # Attention with and without meditation and breathing, from one VariantResult holding 'baseline' and 'combined'
+    plot_curve(ax, variants.times, variants.curve('baseline'), label='Attention without Meditation/Breathing', color='b')
+    plot_curve(ax, variants.times, variants.curve('combined'), label='Attention with Meditation/Breathing', color='g')
+
+    ax.axhline(y=min_attention, color='gray', linestyle='--', label='Min Attention Threshold')
+    ax.set_xlabel('Global Clock (minutes)')
+    ax.set_ylabel('Attention Level')
+    ax.set_title('Attention Level Correction Curve Due to Meditation and Breathing Practices')
+    ax.grid(True)
+    ax.legend(loc='upper left', bbox_to_anchor=(1, 1), title="Legend")
+
+
+@instrument.timed('plot.uncertainty')
+def draw_uncertainty(ax, result, color='b', probability_color='red'):
+    # Bands of a MonteCarloResult on a chart drawn by draw_simulation() or draw_correction_curve(): the
+    # outermost percentiles as a shaded band and the median as a dashed line on `ax`, and the probability
+    # of being below min_attention on a second y axis, which is returned
+    low, high = result.percentiles[0], result.percentiles[-1]
+    ax.fill_between(*envelope(result.times, result.bands[0], result.bands[-1], _pixel_width(ax)), color=color, alpha=0.15, linewidth=0,
+                    label=f'Attention p{low:g}-p{high:g} ({result.replicates} runs)')
+    if 50 in result.percentiles:
+        plot_curve(ax, result.times, result.band(50), color=color, linestyle='--', label='Median Attention')
+    twin = ax.twinx()
+    plot_curve(twin, result.times, result.below_probability, color=probability_color, linewidth=1, alpha=0.7, label='Probability below Min Attention')
+    twin.set_ylim(0, 1)
+    twin.set_ylabel('Probability below Min Attention')
+    if ax.get_legend() is not None:
+        # One legend for both axes, moved right past the second axis' labels
+        handles, labels = ax.get_legend_handles_labels()
+        twin_handles, twin_labels = twin.get_legend_handles_labels()
+        ax.legend(handles + twin_handles, labels + twin_labels, loc='upper left', bbox_to_anchor=(1.08, 1), title="Legend")
+    return twin
+
+
+# Legend labels of the artists LiveChart moves on every update; everything else is background
+_SIMULATION_ANIMATED = ('Attention Level', 'Meditation Point', 'Breathing Point', 'Voluntary Intention')
+_CORRECTION_ANIMATED = ('Attention without Meditation/Breathing', 'Attention with Meditation/Breathing')
+
+# Share of the y range added above and below the data on a full redraw, so small edits still fit
+_Y_MARGIN = 0.1
+
+
+def _spans(items):
+    return tuple((float(item.start_time), float(item.duration)) for item in items)
+
+
+class LiveChart:
+    # The simulation and correction-curve charts on one Figure, redrawn while a schedule is being edited.
+    # A full redraw draws everything with `draw` (draw_simulation or a function with its signature) and
+    # draw_correction_curve; the curves and event points are animated artists, so the canvas caches the
+    # rest as a bitmap. When the next update keeps the spans, the threshold and the axis limits, it only
+    # restores that bitmap and redraws the curves and points on top (blitting). The figure's canvas must
+    # support copy_from_bbox(), like FigureCanvasAgg and FigureCanvasTkAgg.
+    def __init__(self, figure, draw=draw_simulation):
+        self.figure = figure
+        self.draw = draw
+        self.simulation_ax, self.correction_ax = figure.subplots(2, 1)
+        self.full_redraws = 0
+        self.blits = 0
+        self._key = None
+        self._artists = {}
+        self._background = None
+        figure.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def update(self, variants, tasks, min_attention, meditation_sessions, breathing_practices, name='voluntary'):
+        # `variants` is a VariantResult holding 'baseline', 'combined' and `name`
+        result = variants.output(name)
+        curves = {label: (variants.times, variants.curve(variant)) for label, variant in zip(_CORRECTION_ANIMATED, ('baseline', 'combined'))}
+        curves['Attention Level'] = (result.time, result.attention)
+        points = {label: result.points(kind) for label, kind in zip(_SIMULATION_ANIMATED[1:], ('meditation', 'breathing', 'voluntary'))}
+        key = (tuple((task.name,) + span for task, span in zip(tasks, _spans(tasks))), _spans(meditation_sessions), _spans(breathing_practices),
+               float(min_attention), result.voluntary, (float(result.time[0]), float(result.time[-1])) if len(result) else None,
+               tuple(label for label, (times, _) in points.items() if len(times)))
+        if key != self._key or self._background is None or not self._fits(curves):
+            self._redraw(variants, result, tasks, min_attention, meditation_sessions, breathing_practices, curves, points)
+            self._key = key
+            return
+        with instrument.phase('plot.blit'):
+            self._set_data(curves, points)
+            canvas = self.figure.canvas
+            canvas.restore_region(self._background)
+            self._draw_animated()
+            canvas.blit(self.figure.bbox)
+        self.blits += 1
+
+    def _set_data(self, curves, points):
+        for label, (x, y) in curves.items():
+            self._artists[label].set_data(*minmax_downsample(x, y, 4 * _pixel_width(self._artists[label].axes)))
+        for label, (times, levels) in points.items():
+            if len(times):
+                self._artists[label].set_offsets(np.column_stack(thin_points(self._artists[label].axes, times, levels)))
+
+    def _fits(self, curves):
+        for label, (_, y) in curves.items():
+            if len(y):
+                low, high = self._artists[label].axes.get_ylim()
+                if y.min() < low or y.max() > high:
+                    return False
+        return True
+
+    @instrument.timed('plot.redraw')
+    def _redraw(self, variants, result, tasks, min_attention, meditation_sessions, breathing_practices, curves, points):
+        for ax in (self.simulation_ax, self.correction_ax):
+            ax.clear()
+        self.draw(self.simulation_ax, result, tasks, min_attention, meditation_sessions, breathing_practices)
+        draw_correction_curve(self.correction_ax, variants, min_attention)
+        self._artists = {}
+        for ax, labels in ((self.simulation_ax, _SIMULATION_ANIMATED), (self.correction_ax, _CORRECTION_ANIMATED)):
+            for artist in ax.lines + ax.collections:
+                if artist.get_label() in labels:
+                    artist.set_animated(True)
+                    self._artists[artist.get_label()] = artist
+            low, high = ax.get_ylim()
+            margin = (high - low) * _Y_MARGIN
+            ax.set_ylim(low - margin, high + margin)
+        # Same downsampling as the blitted frames, so the curve does not change shape between the two
+        self._set_data(curves, points)
+        if self.figure.get_layout_engine() is None:
+            self.figure.tight_layout()
+        self.figure.canvas.draw()
+        self.full_redraws += 1
+
+    def _on_draw(self, event):
+        # Every full draw, including the ones after the window is resized, renders the figure without
+        # the animated artists; keep that as the background and put them back on top
+        self._background = self.figure.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self._artists.values():
+            self.figure.draw_artist(artist)
@@ -0,0 +1,93 @@
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas as pdf_canvas
+
+from .engine import simulate_variants
+from .export import FIGURES, FigureTemplate
+from .plotting import draw_correction_curve, draw_simulation
+from .result import analysis_lines
+
+_MARGIN = 36
+_LINE = 13
+
+
+def summary_lines(result, min_attention):
+    yield f"Total attention gain from meditation: {result.total_attention_gain}"
+    yield f"Total attention gain from breathing practices: {result.total_breathing_gain}"
+    if result.voluntary:
+        yield f"Total attention gain from voluntary intention: {result.total_voluntary_intention_gain}"
+    yield f"Total Accumulated Fatigue: {result.accumulated_fatigue}"
+    yield f"Average External Factors: {result.avg_external_factors}"
+    yield f"Minutes below the minimum attention threshold: {int((result.attention < min_attention).sum())} of {len(result)}"
+
+
+class _Writer:
+    # Lays out text and images top to bottom, starting a new page whenever the current one is full
+    def __init__(self, pdf, pagesize):
+        self.pdf = pdf
+        self.width, self.height = pagesize
+        self.pages = 0
+        self.y = None
+
+    def new_page(self):
+        if self.y is not None:
+            self.pdf.showPage()
+        self.pages += 1
+        self.y = self.height - _MARGIN
+
+    def _room(self, height):
+        if self.y is None or self.y - height < _MARGIN:
+            self.new_page()
+
+    def text(self, line, font='Helvetica', size=10):
+        self._room(_LINE)
+        self.pdf.setFont(font, size)
+        self.pdf.drawString(_MARGIN, self.y - size, line)
+        self.y -= _LINE + (size - 10)
+
+    def image(self, buffer, aspect):
+        width = self.width - 2 * _MARGIN
+        height = width * aspect
+        self._room(height)
+        self.pdf.drawImage(ImageReader(buffer), _MARGIN, self.y - height, width, height)
+        self.y -= height + _LINE
+
+
+def write_report(path, schedules, names=None, voluntary=False, pagesize=letter, dpi=100, progress=None, overlap=None):
+    # Writes one PDF for any number of Schedules: per scenario a header, the summary, both charts and
+    # the attention curve analysis. The two figures are reused for every scenario and `schedules` may
+    # be a generator, but reportlab's canvas keeps every finished page and image until save(), so the
+    # memory still grows with the report; split very many scenarios over several files. `progress` and
+    # `overlap` are passed on to simulate_variants() for every scenario. Returns the number of pages written.
+    pdf = pdf_canvas.Canvas(path, pagesize=pagesize)
+    pdf.setTitle("Attention Simulation Report")
+    writer = _Writer(pdf, pagesize)
+    templates = {figure: FigureTemplate(dpi=dpi) for figure in FIGURES}
+    aspect = templates['simulation'].figure.get_figheight() / templates['simulation'].figure.get_figwidth()
+    variant_names = ('baseline', 'combined', 'voluntary') if voluntary else ('baseline', 'combined')
+    for i, schedule in enumerate(schedules):
+        name = names[i] if names is not None else f"Scenario {i + 1}"
+        variants = simulate_variants(schedule.tasks, schedule.initial_attention, schedule.min_attention, schedule.max_attention,
+                                     schedule.meditation_sessions, schedule.breathing_practices, schedule.enneagram_type, names=variant_names,
+                                     progress=progress, overlap=overlap)
+        result = variants.output(variant_names[-1])
+
+        writer.new_page()
+        writer.text(name, 'Helvetica-Bold', 14)
+        for line in summary_lines(result, schedule.min_attention):
+            writer.text(line)
+        writer.y -= _LINE
+        templates['simulation'].draw(draw_simulation, result, schedule.tasks, schedule.min_attention,
+                                     schedule.meditation_sessions, schedule.breathing_practices)
+        writer.image(templates['simulation'].save('png'), aspect)
+        templates['correction'].draw(draw_correction_curve, variants, schedule.min_attention)
+        writer.image(templates['correction'].save('png'), aspect)
+
+        writer.text("Attention Curve Analysis:", 'Helvetica-Bold', 11)
+        for line in analysis_lines(result, schedule.tasks):
+            writer.text(line)
+    if writer.y is None:
+        writer.new_page()
+        writer.text("No scenarios.")
+    pdf.save()
+    return writer.pages
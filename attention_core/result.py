@@ -0,0 +1,141 @@
+import numpy as np
+
+from . import instrument
+
+# Bits of SimulationResult.flags, set on every minute where the event happened at least once
+MEDITATION_FLAG = 1
+BREATHING_FLAG = 2
+VOLUNTARY_FLAG = 4
+
+# Value of SimulationResult.task_id on the initial point, which belongs to no task
+NO_TASK = -1
+
+EVENT_FLAGS = {'meditation': MEDITATION_FLAG, 'breathing': BREATHING_FLAG, 'voluntary': VOLUNTARY_FLAG}
+
+
+class SimulationResult:
+    # One run of simulate() / simulate_with_voluntary() stored as one typed array per column instead of
+    # lists of tuples. Per minute: time, task_id, difficulty, attention and flags. Per meditation,
+    # breathing or voluntary intention event: event_time, event_level and event_kind (a *_FLAG bit).
+    # Iterating it yields the tuples the functions used to return, so existing unpacking still works.
+    __slots__ = ('time', 'task_id', 'difficulty', 'attention', 'flags', 'event_time', 'event_level', 'event_kind',
+                 'voluntary', 'total_attention_gain', 'total_breathing_gain', 'total_voluntary_intention_gain',
+                 'accumulated_fatigue', 'avg_external_factors')
+
+    def __init__(self, time, task_id, difficulty, attention, flags, event_time, event_level, event_kind, voluntary,
+                 total_attention_gain, total_breathing_gain, total_voluntary_intention_gain, accumulated_fatigue, avg_external_factors):
+        self.time = time
+        self.task_id = task_id
+        self.difficulty = difficulty
+        self.attention = attention
+        self.flags = flags
+        self.event_time = event_time
+        self.event_level = event_level
+        self.event_kind = event_kind
+        self.voluntary = voluntary
+        self.total_attention_gain = total_attention_gain
+        self.total_breathing_gain = total_breathing_gain
+        self.total_voluntary_intention_gain = total_voluntary_intention_gain
+        self.accumulated_fatigue = accumulated_fatigue
+        self.avg_external_factors = avg_external_factors
+
+    def __len__(self):
+        return len(self.time)
+
+    def __iter__(self):
+        return iter(self.legacy())
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.__slots__[:8])
+
+    def points(self, kind):
+        # (times, levels) of every 'meditation', 'breathing' or 'voluntary' event, as views ready to plot
+        chosen = self.event_kind == EVENT_FLAGS[kind]
+        return self.event_time[chosen], self.event_level[chosen]
+
+    def task_changes(self):
+        # Indices of the minutes whose task differs from the minute before; the first minute always counts
+        changed = np.ones(len(self.task_id), dtype=bool)
+        changed[1:] = self.task_id[1:] != self.task_id[:-1]
+        return np.flatnonzero(changed)
+
+    def legacy(self):
+        # The tuple lists simulate() / simulate_with_voluntary() used to return
+        times = self.time.tolist()
+        task_ids = [None if task_id == NO_TASK else task_id for task_id in self.task_id.tolist()]
+        difficulty = self.difficulty.tolist()
+        attention = self.attention.tolist()
+        history = list(zip(times, task_ids, attention, difficulty))
+        attention_curve = list(zip(times, task_ids, difficulty, attention))
+        meditation_points = list(zip(*(values.tolist() for values in self.points('meditation'))))
+        breathing_points = list(zip(*(values.tolist() for values in self.points('breathing'))))
+        if not self.voluntary:
+            return (history, attention_curve, meditation_points, breathing_points, self.total_attention_gain,
+                    self.total_breathing_gain, self.accumulated_fatigue, self.avg_external_factors)
+        correction_curve = list(zip(times, attention))
+        voluntary_points = list(zip(*(values.tolist() for values in self.points('voluntary'))))
+        return (history, attention_curve, correction_curve, meditation_points, breathing_points, voluntary_points,
+                self.total_attention_gain, self.total_breathing_gain, self.total_voluntary_intention_gain,
+                self.accumulated_fatigue, self.avg_external_factors)
+
+
+# Kinds of entry in an Explanation, in the order they are listed within a minute
+TASK_SHIFT = 0
+FELL_BELOW = 1
+RECOVERED = 2
+
+
+class Explanation:
+    # Index of the minutes worth explaining in one run: every shift to a differently named task and,
+    # given min_attention, every minute where attention falls below it or recovers. Built in one pass
+    # over the columns; lines() formats only the entries asked for, so a view can show any page of a
+    # month-long run and an export can stream the text straight to a file.
+    @instrument.timed('explain.index')
+    def __init__(self, result, tasks, min_attention=None):
+        self.result = result
+        self.tasks = tasks
+        self.min_attention = min_attention
+        # Consecutive tasks with the same name read as one shift, like points that belong to no task
+        codes = {}
+        lookup = np.array([codes.setdefault(task.name, len(codes)) for task in tasks] + [codes.setdefault("No task", len(codes))])
+        valid = (result.task_id >= 0) & (result.task_id < len(tasks))
+        changes = result.task_changes()
+        names = lookup[np.where(valid, result.task_id, len(tasks))[changes]]
+        shifted = np.ones(len(changes), dtype=bool)
+        shifted[1:] = names[1:] != names[:-1]
+        positions, kinds = [changes[shifted]], [np.full(int(shifted.sum()), TASK_SHIFT, dtype=np.uint8)]
+        if min_attention is not None:
+            below = result.attention < min_attention
+            crossings = np.flatnonzero(below[1:] != below[:-1]) + 1
+            if len(below) and below[0]:
+                crossings = np.concatenate(([0], crossings))
+            positions.append(crossings)
+            kinds.append(np.where(below[crossings], FELL_BELOW, RECOVERED).astype(np.uint8))
+        positions, kinds = np.concatenate(positions), np.concatenate(kinds)
+        order = np.lexsort((kinds, positions))
+        self.position = positions[order]
+        self.kind = kinds[order]
+
+    def __len__(self):
+        return len(self.position)
+
+    def lines(self, start=0, stop=None):
+        # The text of entries[start:stop], one line at a time; a task shift takes three lines
+        result = self.result
+        for idx, kind in zip(self.position[start:stop], self.kind[start:stop]):
+            if kind == TASK_SHIFT:
+                task_id = result.task_id[idx]
+                task_name = self.tasks[task_id].name if task_id != NO_TASK and task_id < len(self.tasks) else "No task"
+                yield f"Time: {result.time[idx]} minutes - Attention shifted to: {task_name}"
+                yield f"Fatigue Factor: {result.difficulty[idx]}"
+                yield f"Attention Level: {result.attention[idx]}"
+            elif kind == FELL_BELOW:
+                yield f"Time: {result.time[idx]} minutes - Attention fell below the minimum threshold: {result.attention[idx]}"
+            else:
+                yield f"Time: {result.time[idx]} minutes - Attention recovered above the minimum threshold: {result.attention[idx]}"
+
+
+def analysis_lines(result, tasks):
+    # The "Attention Curve Analysis" text of the front ends, one line at a time
+    return Explanation(result, tasks).lines()
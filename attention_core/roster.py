@@ -0,0 +1,156 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .batch import iter_shared_clock, task_minutes
+
+# Largest people x minutes matrix the percentile bands of a sharded roster are taken over at once
+_BAND_CELLS = 1 << 22
+
+_worker_state = {}
+
+
+class RosterResult:
+    # Team-level statistics per minute (below_fraction, also per group in group_below_fraction, mean and
+    # the percentile bands), per-person totals (minutes_below, lowest) and the per-minute curves of the
+    # people asked for, by position in `people`
+    def __init__(self, people, times, below_fraction, group_below_fraction, mean, percentiles, bands, minutes_below, lowest, curves):
+        self.people = people
+        self.times = times
+        self.below_fraction = below_fraction
+        self.group_below_fraction = group_below_fraction
+        self.mean = mean
+        self.percentiles = percentiles
+        self.bands = bands
+        self.minutes_below = minutes_below
+        self.lowest = lowest
+        self.curves = curves
+
+    def __len__(self):
+        return len(self.people)
+
+    def band(self, percentile):
+        return self.bands[list(self.percentiles).index(percentile)]
+
+    def curve(self, person):
+        return self.curves[person]
+
+
+def _sessions(sessions, rows):
+    starts = np.array([float(s.start_time) for s in sessions])
+    return (np.tile(starts, (rows, 1)), np.tile(starts + np.array([float(s.duration) for s in sessions]), (rows, 1)),
+            np.tile(np.array([float(s.effectiveness) for s in sessions]), (rows, 1)))
+
+
+def _personal(people):
+    # rows x most practices anyone has; shorter lists are padded with practices that never start
+    width = max((len(person.breathing_practices) for person in people), default=0)
+    starts = np.full((len(people), width), np.inf)
+    ends = np.full((len(people), width), np.inf)
+    effectiveness = np.zeros((len(people), width))
+    for i, person in enumerate(people):
+        for j, practice in enumerate(person.breathing_practices):
+            starts[i, j] = float(practice.start_time)
+            ends[i, j] = float(practice.start_time + practice.duration)
+            effectiveness[i, j] = float(practice.effectiveness)
+    return starts, ends, effectiveness
+
+
+def _simulate_people(tasks, shared, apply_breathing, voluntary, overlap, people, keep, members, percentiles):
+    # Simulates one chunk of people over the whole clock, walked in blocks of minutes that are reduced
+    # before the next one is simulated, down to sums that add up across chunks: per minute how many are
+    # below min_attention, overall and for each list of positions in `members`, and the sum of their
+    # levels; per person minutes_below and lowest. Also keeps the curves at the positions in `keep`.
+    # Percentile bands don't add up, so only a chunk that is the whole team works out `percentiles`.
+    rows = len(people)
+    columns = [_sessions(shared, rows)] + ([_personal(people)] if apply_breathing else [])
+    starts, ends, effectiveness = (np.concatenate(parts, axis=1) for parts in zip(*columns))
+    start_levels = np.array([float(person.enneagram_type.apply_effects(person.initial_attention)) for person in people])
+    min_attention = np.array([float(person.min_attention) for person in people])
+    max_attention = np.array([float(person.max_attention) for person in people])
+    difficulty = np.broadcast_to(np.array([float(task.difficulty) for task in tasks]), (rows, len(tasks)))
+
+    timeline = task_minutes(tasks, overlap)
+    n = len(timeline)
+    below_count = np.zeros(n, dtype=np.int64)
+    group_count = np.zeros((len(members), n), dtype=np.int64)
+    total = np.zeros(n)
+    bands = np.full((len(percentiles), n), np.nan)
+    kept = np.empty((len(keep), n))
+    minutes_below = np.zeros(rows, dtype=np.int64)
+    lowest = np.full(rows, np.inf)
+    if rows:
+        for ticks, attention in iter_shared_clock(timeline, start_levels, min_attention, max_attention, starts, ends, effectiveness,
+                                                  difficulty, voluntary):
+            below = attention < min_attention[:, None]
+            below_count[ticks] = below.sum(axis=0)
+            for g, positions in enumerate(members):
+                group_count[g, ticks] = below[positions].sum(axis=0)
+            total[ticks] = attention.sum(axis=0)
+            bands[:, ticks] = np.percentile(attention, percentiles, axis=0)
+            minutes_below += below.sum(axis=1)
+            lowest = np.minimum(lowest, attention.min(axis=1, initial=np.inf))
+            kept[:, ticks] = attention[keep]
+    return timeline.times, below_count, group_count, total, minutes_below, lowest, kept, bands
+
+
+def _init_worker(tasks, shared, apply_breathing, voluntary, overlap):
+    _worker_state['args'] = (tasks, shared, apply_breathing, voluntary, overlap)
+
+
+def _run_chunk(people, keep, members):
+    return _simulate_people(*_worker_state['args'], people, keep, members, ())
+
+
+def simulate_roster(tasks, meditation_sessions, breathing_practices, people, apply_meditation=True, apply_breathing=True, voluntary=False,
+                    curves=(), percentiles=(5, 50, 95), group_by=None, overlap=None, chunk_size=512, max_workers=None):
+    # Simulates the shared tasks, meditation sessions and breathing practices for every Person,
+    # each with their own Enneagram type, thresholds and breathing practices. Row i gives the same
+    # levels as simulate() on people[i].schedule(tasks, meditation_sessions, breathing_practices).
+    # `curves` lists the positions of the people whose per-minute curves to keep, or True for everyone.
+    # With `group_by`, people with the same group_by(person), e.g. their Enneagram type's name, also get
+    # a below_fraction of their own. `overlap` puts the shared tasks on one forward clock, see compile_schedules().
+    # Teams of more than chunk_size people are split into chunks that worker processes simulate, each
+    # vectorized across its people, and the per-minute counts and sums of the chunks are added up here.
+    # The percentile bands need every level at each minute together, so each chunk then sends all of its
+    # curves back; pass percentiles=() to skip the bands for teams too big for that. max_workers=1 keeps
+    # the whole team in this process, which needs no curves but the ones asked for.
+    people = list(people)
+    rows = len(people)
+    shared = (list(meditation_sessions) if apply_meditation else []) + (list(breathing_practices) if apply_breathing else [])
+    keep = np.arange(rows) if curves is True else np.array(list(curves), dtype=np.int64)
+    groups = {}
+    for i, person in enumerate(people if group_by is not None else ()):
+        groups.setdefault(group_by(person), []).append(i)
+    args = (tasks, shared, apply_breathing, voluntary, overlap)
+
+    edges = list(range(0, rows, chunk_size)) + [rows]
+    if max_workers == 1 or len(edges) <= 2:
+        times, below_count, group_count, total, minutes_below, lowest, kept, bands = _simulate_people(
+            *args, people, keep, list(groups.values()), percentiles)
+        kept = dict(zip(keep.tolist(), kept))
+    else:
+        # A chunk keeps every curve when the bands need them and otherwise just the ones asked for
+        gather = len(percentiles) > 0
+        chunks = [(first, np.arange(last - first) if gather else keep[(keep >= first) & (keep < last)] - first,
+                   [[i - first for i in members if first <= i < last] for members in groups.values()], people[first:last])
+                  for first, last in zip(edges[:-1], edges[1:])]
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=args) as pool:
+            futures = [pool.submit(_run_chunk, chunk_people, chunk_keep, members) for _, chunk_keep, members, chunk_people in chunks]
+            parts = [future.result() for future in futures]
+        times = parts[0][0]
+        below_count, group_count, total = (sum(part[k] for part in parts) for k in (1, 2, 3))
+        minutes_below, lowest = (np.concatenate([part[k] for part in parts]) for k in (4, 5))
+        kept = {}
+        for (first, chunk_keep, _, _), part in zip(chunks, parts):
+            kept.update(zip((chunk_keep + first).tolist(), part[6]))
+        bands = np.empty((len(percentiles), len(times)))
+        step = max(1, _BAND_CELLS // rows)
+        for first in range(0, len(times) if gather else 0, step):
+            ticks = slice(first, first + step)
+            bands[:, ticks] = np.percentile(np.concatenate([part[6][:, ticks] for part in parts]), percentiles, axis=0)
+        kept = {i: kept[i] for i in keep.tolist()}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        below_fraction, mean = below_count / rows, total / rows
+        group_below_fraction = {group: count / len(members) for (group, members), count in zip(groups.items(), group_count)}
+    return RosterResult(people, times, below_fraction, group_below_fraction, mean, tuple(percentiles), bands, minutes_below, lowest, kept)
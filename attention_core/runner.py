@@ -0,0 +1,204 @@
+import csv
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from . import engine
+from .cache import CachedSimulator, ResultCache
+from .model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Schedule, Task
+from .result import NO_TASK
+from .stream import summarize
+
+# Schedule-wide values; in a CSV file they are rows whose `kind` is one of these, holding `value`
+SETTINGS = ('initial_attention', 'min_attention', 'max_attention', 'enneagram_type')
+
+_worker_state = {}
+
+
+def _schedule(settings, tasks, meditation_sessions, breathing_practices):
+    # Task ids are positions in the file, like the front ends number them
+    type_id = int(float(settings.get('enneagram_type', 1)))
+    if not 1 <= type_id <= len(ENNEAGRAM_TYPES):
+        raise ValueError(f"Unknown Enneagram type: {type_id}")
+    enneagram_type = ENNEAGRAM_TYPES[type_id - 1]
+    return Schedule(
+        [Task(i, str(t.get('name', f"Task {i + 1}")), float(t.get('base_attention', 3)), float(t['difficulty']),
+              float(t.get('criticality', 0)), float(t['duration']), float(t['start_time'])) for i, t in enumerate(tasks)],
+        [MeditationSession(float(m['start_time']), float(m['duration']), float(m['effectiveness'])) for m in meditation_sessions],
+        [BreathingPractice(str(b.get('name', '')), float(b['start_time']), float(b['duration']), float(b['effectiveness'])) for b in breathing_practices],
+        enneagram_type,
+        float(settings.get('initial_attention', 100)),
+        float(settings.get('min_attention', 50)),
+        float(settings.get('max_attention', 100)),
+    )
+
+
+def _load_json(path):
+    # One plan per object; a file can hold a single object or a list of them
+    with open(path) as f:
+        data = json.load(f)
+    plans = data if isinstance(data, list) else [data]
+    return [_schedule({name: plan[name] for name in SETTINGS if name in plan}, plan.get('tasks', []),
+                      plan.get('meditation_sessions', []), plan.get('breathing_practices', [])) for plan in plans]
+
+
+def _load_csv(path):
+    # One plan per file, one row per task, meditation session, breathing practice or setting. Columns:
+    # kind, name, start_time, duration, difficulty, base_attention, criticality, effectiveness, value
+    settings, items = {}, {'task': [], 'meditation': [], 'breathing': []}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            row = {name: value for name, value in row.items() if value not in (None, '')}
+            kind = row.get('kind', '').strip().lower()
+            if kind in SETTINGS:
+                settings[kind] = row['value']
+            elif kind in items:
+                items[kind].append(row)
+            else:
+                raise ValueError(f"{path}: unknown row kind {kind!r}")
+    return [_schedule(settings, items['task'], items['meditation'], items['breathing'])]
+
+
+def load_schedules(path):
+    # Every plan in a .json or .csv schedule file
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        return _load_json(path)
+    if extension == '.csv':
+        return _load_csv(path)
+    raise ValueError(f"Unsupported schedule file: {path}")
+
+
+def write_curve(result, path):
+    # Same columns as stream.write_blocks(); the initial point of a voluntary run has an empty task_id
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('time', 'task_id', 'difficulty', 'attention', 'flags'))
+        task_ids = [None if task_id == NO_TASK else task_id for task_id in result.task_id.tolist()]
+        writer.writerows(zip(result.time.tolist(), task_ids, result.difficulty.tolist(), result.attention.tolist(), result.flags.tolist()))
+
+
+def _simulator(cache_dir):
+    # The engine itself, or with a cache directory one that reuses results any earlier run stored there
+    return engine if cache_dir is None else CachedSimulator(ResultCache(directory=cache_dir))
+
+
+def _numbered(names, indexes):
+    # Names that occur more than once get the number of their file appended, so no two curves share a file
+    counts = Counter(names)
+    return [name if counts[name] == 1 else f"{name}_file{index + 1}" for name, index in zip(names, indexes)]
+
+
+def _load_files(chunk):
+    # (index, plans or the error loading them) for every (index, path) in the chunk
+    loaded = []
+    for index, path in chunk:
+        try:
+            loaded.append((index, load_schedules(path)))
+        except (OSError, ValueError, KeyError, IndexError, TypeError) as error:
+            loaded.append((index, f"{type(error).__name__}: {error}"))
+    return loaded
+
+
+def _run_plans(index, path, plans, schedules, output_dir, voluntary, simulator=engine, overlap=None):
+    # Summary rows for a run of plans from one file, named `plans`. A plan that cannot be simulated
+    # gives a row with the error instead of stopping the whole run.
+    rows = []
+    for plan, schedule in zip(plans, schedules):
+        row = {'file': index, 'path': path, 'plan': plan, 'error': ''}
+        try:
+            run = simulator.simulate_with_voluntary if voluntary else simulator.simulate
+            result = run(schedule.tasks, schedule.initial_attention, schedule.min_attention, schedule.max_attention,
+                         schedule.meditation_sessions, schedule.breathing_practices, schedule.enneagram_type, True, True,
+                         overlap=overlap)
+            write_curve(result, os.path.join(output_dir, f"{plan}.csv"))
+        except (OSError, ValueError, KeyError, IndexError, TypeError) as error:
+            row['error'] = f"{type(error).__name__}: {error}"
+        else:
+            row.update(summarize([result], schedule.min_attention))
+            row['accumulated_fatigue'] = result.accumulated_fatigue
+            row['avg_external_factors'] = result.avg_external_factors
+        rows.append(row)
+    return rows
+
+
+def _run_chunk(chunk, output_dir, voluntary, simulator=engine, overlap=None):
+    return [row for index, path, plans, schedules in chunk
+            for row in _run_plans(index, path, plans, schedules, output_dir, voluntary, simulator, overlap)]
+
+
+def _init_worker(output_dir, voluntary, cache_dir, overlap):
+    _worker_state['args'] = (output_dir, voluntary, _simulator(cache_dir), overlap)
+
+
+def _run_worker_chunk(chunk):
+    return _run_chunk(chunk, *_worker_state['args'])
+
+
+def _plan_chunks(runs, chunk_size):
+    # Splits (index, path, plans, schedules) into pieces of at most chunk_size plans, so the plans of
+    # a big file are spread over several workers, and packs consecutive small ones together
+    chunks, chunk, size = [], [], 0
+    for index, path, plans, schedules in runs:
+        for first in range(0, len(plans), chunk_size):
+            piece = (index, path, plans[first:first + chunk_size], schedules[first:first + chunk_size])
+            if size + len(piece[2]) > chunk_size:
+                chunks.append(chunk)
+                chunk, size = [], 0
+            chunk.append(piece)
+            size += len(piece[2])
+    return chunks + [chunk] if chunk else chunks
+
+
+def _plan_work(paths, loaded, chunk_size):
+    # Names every plan of the loaded files and returns the rows of the files that failed to load, the
+    # chunks of plans to simulate and every plan's position in the summary.
+    # Files from different directories can share a name, and a plan of a file holding several
+    # (<stem>_<n>) can be named like another file; number those so their curves do not overwrite each
+    # other. That takes the number of plans in every file, so it waits for all of them to load.
+    stems = _numbered([os.path.splitext(os.path.basename(path))[0] for path in paths], range(len(paths)))
+    names = [[stem] if isinstance(loaded[i], str) or len(loaded[i]) <= 1 else [f"{stem}_{n + 1}" for n in range(len(loaded[i]))]
+             for i, stem in enumerate(stems)]
+    numbered = iter(_numbered([plan for plans in names for plan in plans], [i for i, plans in enumerate(names) for _ in plans]))
+    names = [[next(numbered) for _ in plans] for plans in names]
+    failed = [{'file': i, 'path': path, 'plan': names[i][0], 'error': loaded[i]} for i, path in enumerate(paths) if isinstance(loaded[i], str)]
+    chunks = _plan_chunks([(i, path, names[i], loaded[i]) for i, path in enumerate(paths) if not isinstance(loaded[i], str)], chunk_size)
+    return failed, chunks, {plan: position for position, plan in enumerate(plan for plans in names for plan in plans)}
+
+
+def run_files(paths, output_dir, max_workers=None, chunk_size=16, voluntary=False, cache_dir=None, overlap=None):
+    # Simulates every plan in every schedule file across worker processes. Each plan's per-minute curve
+    # goes to <output_dir>/<plan>.csv, named after its file, and one summary row per plan to
+    # <output_dir>/summary.csv in the order of `paths`. Returns the summary rows. With `cache_dir`,
+    # plans simulated by an earlier run with the same inputs are read back from there instead. `overlap`
+    # puts each plan's tasks on one forward clock, see compile_schedules().
+    # The workers first load the files, chunk_size at a time, and then simulate the plans they hold in
+    # chunks of up to chunk_size plans; no file is read twice.
+    os.makedirs(output_dir, exist_ok=True)
+    files = list(enumerate(paths))
+    file_chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+    if max_workers == 1:
+        loaded = dict(item for chunk in file_chunks for item in _load_files(chunk))
+        rows, chunks, order = _plan_work(paths, loaded, chunk_size)
+        simulator = _simulator(cache_dir)
+        for chunk in chunks:
+            rows.extend(_run_chunk(chunk, output_dir, voluntary, simulator, overlap))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(output_dir, voluntary, cache_dir, overlap)) as pool:
+            loaded = dict(item for items in pool.map(_load_files, file_chunks) for item in items)
+            rows, chunks, order = _plan_work(paths, loaded, chunk_size)
+            futures = [pool.submit(_run_worker_chunk, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                rows.extend(future.result())
+    rows.sort(key=lambda row: order[row['plan']])
+    names = {}
+    for row in rows:
+        names.update(dict.fromkeys(row))
+    with open(os.path.join(output_dir, 'summary.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(names), restval=np.nan)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
@@ -0,0 +1,125 @@
+import csv
+
+import numpy as np
+
+from .clock import owner_segments
+from .engine import build_output, compile_ticks, run_timeline
+from .model import Schedule
+from .result import NO_TASK
+
+# Minutes per block yielded by iter_simulation()
+BLOCK_MINUTES = 1 << 16
+
+
+def _task_minutes(task, size):
+    # The minutes of one task in pieces of at most `size`, laid out exactly like compile_schedules() does
+    start, duration = float(task.start_time), float(task.duration)
+    if not duration > 0:
+        return
+    count = int(np.ceil(duration)) + 1
+    end = start + duration
+    fractional = start != np.floor(start)
+    last = None
+    for first in range(0, count, size):
+        steps = min(size, count - first)
+        if not fractional:
+            times = start + np.arange(first, first + steps)
+        else:
+            # Replays `current_time += 1` from the last minute of the previous piece
+            times = np.cumsum(np.concatenate(([start if last is None else last + 1], np.ones(steps - 1))))
+            last = times[-1]
+        times = times[times < end]
+        if not len(times):
+            return
+        yield times
+
+
+def _listed_minutes(tasks, size):
+    for task in tasks:
+        for times in _task_minutes(task, size):
+            yield task, times
+
+
+def _owned_minutes(tasks, size, overlap):
+    # The minutes merge_ticks() keeps: those of the task owning each segment of time under `overlap`, in time order
+    starts, ends, owners = owner_segments(tasks, overlap)
+    for start, end, owner in zip(starts, ends, owners):
+        for times in _task_minutes(tasks[owner], size):
+            if times[0] >= end:
+                break
+            times = times[(times >= start) & (times < end)]
+            if len(times):
+                yield tasks[owner], times
+
+
+def _minute_blocks(tasks, size, overlap=None):
+    # (times, task_ids, difficulty) for `size` minutes at a time, in the order the tasks are listed or,
+    # with an overlap rule, on one forward clock like compile_schedules() lays them out
+    pieces, filled = [], 0
+    for task, times in _listed_minutes(tasks, size) if overlap is None else _owned_minutes(tasks, size, overlap):
+        while len(times):
+            piece, times = times[:size - filled], times[size - filled:]
+            pieces.append((piece, np.full(len(piece), task.task_id, dtype=np.int64), np.full(len(piece), float(task.difficulty))))
+            filled += len(piece)
+            if filled == size:
+                yield tuple(np.concatenate(column) for column in zip(*pieces))
+                pieces, filled = [], 0
+    if pieces:
+        yield tuple(np.concatenate(column) for column in zip(*pieces))
+
+
+def iter_simulation(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type,
+                    apply_meditation=True, apply_breathing=True, voluntary=False, block_minutes=BLOCK_MINUTES, overlap=None):
+    # Runs simulate() (or simulate_with_voluntary() when `voluntary`) over `block_minutes` minutes at a
+    # time and yields one SimulationResult per block, so memory stays constant however long the
+    # schedule is. The level and the gain totals carry over from block to block; each block's totals
+    # are the run's totals so far. Levels match a full run up to floating point rounding. `overlap` puts
+    # the tasks on one forward clock, see compile_schedules().
+    schedule = Schedule(tasks, meditation_sessions, breathing_practices, enneagram_type, initial_attention, min_attention, max_attention)
+    variant = (apply_meditation, apply_breathing, voluntary)
+    start_level = schedule.start_level()
+    level = start_level
+    previous = None
+    for times, task_ids, difficulty in _minute_blocks(tasks, block_minutes, overlap):
+        timeline = compile_ticks([schedule], times, task_ids, difficulty, np.zeros(len(times), dtype=np.int64), apply_meditation, apply_breathing)
+        levels, below = run_timeline(timeline, [level], [variant], min_attention)
+        previous = build_output(tasks, timeline, levels[0], below[0], start_level, variant, previous)
+        level = levels[0, -1]
+        yield previous
+
+
+def summarize(blocks, min_attention):
+    # Folds a stream of blocks into the per-run metrics sweep() reports, plus the first minute below min_attention
+    summary = {'minutes': 0, 'final_attention': np.nan, 'lowest_attention': np.nan, 'mean_attention': np.nan,
+               'minutes_below_min': 0, 'first_below_min': np.nan, 'total_attention_gain': 0, 'total_breathing_gain': 0,
+               'total_voluntary_intention_gain': 0}
+    total = 0.0
+    for block in blocks:
+        if not len(block):
+            continue
+        below = np.flatnonzero(block.attention < min_attention)
+        if len(below) and np.isnan(summary['first_below_min']):
+            summary['first_below_min'] = float(block.time[below[0]])
+        summary['minutes'] += len(block)
+        summary['minutes_below_min'] += len(below)
+        summary['final_attention'] = float(block.attention[-1])
+        summary['lowest_attention'] = float(np.fmin(summary['lowest_attention'], block.attention.min()))
+        total += float(block.attention.sum())
+        summary['total_attention_gain'] = block.total_attention_gain
+        summary['total_breathing_gain'] = block.total_breathing_gain
+        summary['total_voluntary_intention_gain'] = block.total_voluntary_intention_gain
+    if summary['minutes']:
+        summary['mean_attention'] = total / summary['minutes']
+    return summary
+
+
+def write_blocks(blocks, path):
+    # Writes every minute of the stream to a CSV file and passes the blocks on, so it can sit in front of
+    # another consumer: summarize(write_blocks(iter_simulation(...), path), min_attention)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('time', 'task_id', 'difficulty', 'attention', 'flags'))
+        for block in blocks:
+            task_ids = [None if task_id == NO_TASK else task_id for task_id in block.task_id.tolist()]
+            writer.writerows(zip(block.time.tolist(), task_ids, block.difficulty.tolist(), block.attention.tolist(), block.flags.tolist()))
+            yield block
@@ -0,0 +1,128 @@
+import copy
+import csv
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .batch import simulate_batch
+from .model import Schedule
+
+# Parameters a sweep can vary, applied on top of the base schedule
+PARAMETERS = (
+    'initial_attention', 'min_attention', 'max_attention',
+    'meditation_effectiveness', 'breathing_effectiveness',
+    'meditation_offset', 'breathing_offset', 'task_offset',
+)
+
+_worker_state = {}
+
+
+class SweepTable:
+    # One row per run, one column per parameter and metric
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns['run']) if 'run' in self.columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def rows(self):
+        names = list(self.columns)
+        for values in zip(*(self.columns[name] for name in names)):
+            yield dict(zip(names, values))
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            writer.writerows(zip(*(self.columns[name].tolist() for name in self.columns)))
+
+
+def parameter_grid(**axes):
+    # parameter_grid(initial_attention=[80, 100], meditation_offset=[0, 15]) -> cartesian product as dicts
+    for name in axes:
+        if name not in PARAMETERS:
+            raise ValueError(f"Unknown sweep parameter: {name}")
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+
+def _shifted(items, offset, effectiveness=None):
+    shifted = []
+    for item in items:
+        item = copy.copy(item)
+        item.start_time = item.start_time + offset
+        if effectiveness is not None:
+            item.effectiveness = effectiveness
+        shifted.append(item)
+    return shifted
+
+
+def apply_parameters(schedule, params):
+    return Schedule(
+        _shifted(schedule.tasks, params.get('task_offset', 0)),
+        _shifted(schedule.meditation_sessions, params.get('meditation_offset', 0), params.get('meditation_effectiveness')),
+        _shifted(schedule.breathing_practices, params.get('breathing_offset', 0), params.get('breathing_effectiveness')),
+        schedule.enneagram_type,
+        params.get('initial_attention', schedule.initial_attention),
+        params.get('min_attention', schedule.min_attention),
+        params.get('max_attention', schedule.max_attention),
+    )
+
+
+def _evaluate(schedule, chunk, voluntary, overlap=None):
+    schedules = [apply_parameters(schedule, params) for _, params in chunk]
+    result = simulate_batch(schedules, voluntary=voluntary, overlap=overlap)
+    min_attention = np.array([float(s.min_attention) for s in schedules])[:, None]
+    has_minutes = result.lengths > 0
+    attention = np.where(np.isnan(result.attention), np.inf, result.attention)
+    rows = []
+    for i, (run, params) in enumerate(chunk):
+        length = result.lengths[i]
+        row = {'run': run}
+        row.update(params)
+        row['minutes'] = int(length)
+        row['final_attention'] = float(result.attention[i, length - 1]) if has_minutes[i] else np.nan
+        row['lowest_attention'] = float(attention[i].min()) if has_minutes[i] else np.nan
+        row['mean_attention'] = float(np.nanmean(result.attention[i])) if has_minutes[i] else np.nan
+        row['minutes_below_min'] = int((attention[i] < min_attention[i]).sum())
+        row['total_attention_gain'] = float(result.total_attention_gain[i])
+        row['total_breathing_gain'] = float(result.total_breathing_gain[i])
+        row['total_voluntary_intention_gain'] = float(result.total_voluntary_intention_gain[i])
+        rows.append(row)
+    return rows
+
+
+def _init_worker(schedule, voluntary, overlap):
+    _worker_state['schedule'] = schedule
+    _worker_state['voluntary'] = voluntary
+    _worker_state['overlap'] = overlap
+
+
+def _run_chunk(chunk):
+    return _evaluate(_worker_state['schedule'], chunk, _worker_state['voluntary'], _worker_state['overlap'])
+
+
+def iter_sweep(schedule, grid, chunk_size=64, max_workers=None, voluntary=False, overlap=None):
+    # Yields one row per run as soon as the chunk holding it finishes, in completion order. `overlap`
+    # puts every run's tasks on one forward clock, see compile_schedules().
+    runs = list(enumerate(grid))
+    chunks = [runs[i:i + chunk_size] for i in range(0, len(runs), chunk_size)]
+    if max_workers == 1:
+        for chunk in chunks:
+            yield from _evaluate(schedule, chunk, voluntary, overlap)
+        return
+    # The base schedule is sent to each worker once; chunks only carry parameter dicts
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(schedule, voluntary, overlap)) as pool:
+        futures = [pool.submit(_run_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def sweep(schedule, grid, chunk_size=64, max_workers=None, voluntary=False, overlap=None):
+    rows = sorted(iter_sweep(schedule, grid, chunk_size, max_workers, voluntary, overlap), key=lambda row: row['run'])
+    names = list(rows[0]) if rows else ['run']
+    return SweepTable({name: np.array([row.get(name, np.nan) for row in rows]) for name in names})
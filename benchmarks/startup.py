@@ -0,0 +1,93 @@
+# Cold-start benchmark for the command line and the Tk window. Runs every entry point in a fresh
+# interpreter several times and keeps the best wall time; exits with status 1 when one takes longer
+# than its budget or loads a library that should only be imported on first use.
+#
+#   python benchmarks/startup.py
+#   python benchmarks/startup.py --repeat 10 --budget gui_window=0.8
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries none of the entry points may load before the user asks for a run, a plot or a PDF
+HEAVY = ('numpy', 'matplotlib', 'reportlab', 'PIL')
+
+# Seconds; generous enough for a loaded CI machine, far below what eager imports cost
+BUDGETS = {'cli_help': 0.5, 'cli_import': 0.5, 'gui_window': 1.0}
+
+# Each probe runs its entry point, then prints which heavy libraries ended up in sys.modules
+_REPORT = "import json, sys; print(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))"
+
+PROBES = {
+    'cli_help': (
+        "import runpy, sys\n"
+        "sys.argv = ['Attention_main.py', '--help']\n"
+        "try:\n"
+        "    runpy.run_path('Attention_main.py', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    ),
+    'cli_import': "import Attention_main\n",
+    # Builds the whole window, draws it once and closes it instead of entering the event loop
+    'gui_window': (
+        "import runpy, tkinter\n"
+        "def show_once(self, n=0):\n"
+        "    self.update()\n"
+        "    self.destroy()\n"
+        "tkinter.Misc.mainloop = show_once\n"
+        "runpy.run_path('Attention_Main_GUI.py')\n"
+    ),
+}
+
+
+def run_probe(name):
+    code = PROBES[name] + _REPORT.format(heavy=HEAVY)
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if process.returncode:
+        return None, None, process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit status {process.returncode}"
+    return seconds, json.loads(process.stdout.strip().splitlines()[-1]), None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the CLI and the Tk window")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', action='append', default=[], metavar='NAME=SECONDS')
+    args = parser.parse_args(argv)
+    budgets = dict(BUDGETS)
+    for item in args.budget:
+        name, seconds = item.split('=')
+        budgets[name] = float(seconds)
+
+    failed = False
+    for name in PROBES:
+        times, loaded, error = [], [], None
+        for _ in range(args.repeat):
+            seconds, heavy, error = run_probe(name)
+            if error:
+                break
+            times.append(seconds)
+            loaded = heavy
+        if error:
+            # The Tk window cannot be built without a display; that is not a regression
+            if name == 'gui_window' and 'display' in error.lower():
+                print(f"{name:12s} skipped: {error}")
+                continue
+            print(f"{name:12s} FAILED: {error}")
+            failed = True
+            continue
+        best = min(times)
+        ok = best <= budgets[name] and not loaded
+        failed = failed or not ok
+        note = f" loads {', '.join(loaded)} at startup" if loaded else ""
+        print(f"{name:12s} {best * 1000:7.1f} ms (budget {budgets[name] * 1000:.0f} ms){note} {'ok' if ok else 'FAILED'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
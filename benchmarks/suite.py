@@ -0,0 +1,217 @@
+# Benchmarks for the simulation, plotting and explanation paths on seeded synthetic schedules. Every
+# stage is timed on its own (best of --repeat runs) and measured once more under tracemalloc for its
+# peak memory; `run` saves the results as JSON and `compare` reports every stage that got slower or
+# bigger than the threshold between two saved runs, exiting with status 1 if there is one.
+#
+#   python benchmarks/suite.py run -o before.json
+#   python benchmarks/suite.py run --sizes small,medium --repeat 3 -o after.json
+#   python benchmarks/suite.py compare before.json after.json --threshold 0.1
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# tasks, meditation sessions, breathing practices, horizon in minutes
+SIZES = {
+    'small': (8, 3, 3, 480),
+    'medium': (60, 30, 30, 10080),
+    'large': (400, 200, 200, 43200),
+}
+
+# Timings shorter than this many seconds are too noisy to call a regression
+NOISE_SECONDS = 0.002
+
+
+def make_schedule(tasks, meditation_sessions, breathing_practices, horizon, seed=0):
+    # A reproducible plan: back-to-back tasks with random lengths filling `horizon` minutes, and
+    # sessions and practices at random times within it, some of them overlapping
+    import numpy as np
+    from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Schedule, Task
+    rng = np.random.default_rng(seed)
+    cuts = np.sort(rng.choice(np.arange(1, horizon), size=tasks - 1, replace=False)) if tasks > 1 else np.empty(0, dtype=np.int64)
+    starts = np.concatenate(([0], cuts))
+    durations = np.diff(np.append(starts, horizon))
+    return Schedule(
+        [Task(i, f"Task {i + 1}", float(rng.integers(1, 6)), float(rng.integers(1, 6)), float(rng.integers(0, 6)), float(duration), float(start))
+         for i, (start, duration) in enumerate(zip(starts, durations))],
+        [MeditationSession(float(rng.integers(0, horizon)), float(rng.integers(5, 31)), float(rng.uniform(0.5, 3)))
+         for _ in range(meditation_sessions)],
+        [BreathingPractice(f"Practice {i + 1}", float(rng.integers(0, horizon)), float(rng.integers(2, 11)), float(rng.uniform(0.5, 2)))
+         for i in range(breathing_practices)],
+        ENNEAGRAM_TYPES[int(rng.integers(0, len(ENNEAGRAM_TYPES)))],
+        100.0, 50.0, 100.0,
+    )
+
+
+def _arguments(schedule):
+    return (schedule.tasks, schedule.initial_attention, schedule.min_attention, schedule.max_attention,
+            schedule.meditation_sessions, schedule.breathing_practices, schedule.enneagram_type)
+
+
+def _simulate(schedule):
+    from attention_core.engine import simulate
+    return lambda: simulate(*_arguments(schedule), True, True)
+
+
+def _simulate_with_voluntary(schedule):
+    from attention_core.engine import simulate_with_voluntary
+    return lambda: simulate_with_voluntary(*_arguments(schedule), True, True)
+
+
+def _simulate_with_voluntary_dense(schedule):
+    # The same tasks at difficulty 2 under one session of 1.5 per minute running the whole plan, which
+    # outweighs the halved drain but not the full one: the level hovers around min_attention and the
+    # voluntary intention switches on and off every few minutes
+    from attention_core.engine import simulate_with_voluntary
+    from attention_core.model import MeditationSession, Task
+    tasks = [Task(task.task_id, task.name, task.base_attention, 2.0, task.criticality, task.duration, task.start_time)
+             for task in schedule.tasks]
+    horizon = max(task.start_time + task.duration for task in tasks)
+    arguments = (tasks, 50.0, 50.0, 100.0, [MeditationSession(0.0, horizon, 1.5)], [], schedule.enneagram_type)
+    return lambda: simulate_with_voluntary(*arguments, True, True)
+
+
+def _plot_simulation(schedule):
+    # What plot_simulation() draws, rendered off screen instead of shown
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from attention_core.engine import simulate
+    from attention_core.plotting import draw_simulation
+    result = simulate(*_arguments(schedule), True, True)
+
+    def run():
+        figure = Figure(figsize=(12, 6))
+        FigureCanvasAgg(figure)
+        draw_simulation(figure.gca(), result, schedule.tasks, schedule.min_attention, schedule.meditation_sessions, schedule.breathing_practices)
+        figure.tight_layout()
+        figure.canvas.draw()
+    return run
+
+
+def _explain(schedule):
+    # The lines explain_attention_curve() prints, without printing them
+    from attention_core.engine import simulate
+    from attention_core.result import analysis_lines
+    result = simulate(*_arguments(schedule), True, True)
+    return lambda: sum(1 for _ in analysis_lines(result, schedule.tasks))
+
+
+# Each stage prepares its inputs from a schedule outside the measurement and returns what to measure
+STAGES = {
+    'simulate': _simulate,
+    'simulate_with_voluntary': _simulate_with_voluntary,
+    'simulate_with_voluntary_dense': _simulate_with_voluntary_dense,
+    'plot_simulation': _plot_simulation,
+    'explain': _explain,
+}
+
+
+def measure(run, repeat):
+    run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'mean_seconds': sum(times) / len(times), 'peak_bytes': peak}
+
+
+def _commit():
+    try:
+        process = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return process.stdout.strip() or None
+
+
+def run_suite(sizes, stages, repeat, seed):
+    import matplotlib
+    import numpy as np
+    # The larger plans have one legend entry per task, more than tight_layout() can make room for
+    warnings.filterwarnings('ignore', message='Tight layout not applied')
+    results = {}
+    for size in sizes:
+        schedule = make_schedule(*SIZES[size], seed=seed)
+        for stage in stages:
+            name = f"{stage}/{size}"
+            results[name] = measure(STAGES[stage](schedule), repeat)
+            print(f"{name:40s} {results[name]['seconds'] * 1000:9.1f} ms {results[name]['peak_bytes'] / 2 ** 20:8.1f} MiB")
+    return {
+        'meta': {'commit': _commit(), 'python': platform.python_version(), 'numpy': np.__version__, 'matplotlib': matplotlib.__version__,
+                 'machine': platform.platform(), 'repeat': repeat, 'seed': seed, 'sizes': {size: SIZES[size] for size in sizes},
+                 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+
+
+def compare(before, after, threshold, memory_threshold):
+    # Lines for every stage in both runs, and whether any of them regressed
+    lines, regressed = [], False
+    for name in before['results']:
+        if name not in after['results']:
+            continue
+        old, new = before['results'][name], after['results'][name]
+        time_ratio = new['seconds'] / old['seconds'] if old['seconds'] else 1.0
+        memory_ratio = new['peak_bytes'] / old['peak_bytes'] if old['peak_bytes'] else 1.0
+        slower = time_ratio > 1 + threshold and new['seconds'] - old['seconds'] > NOISE_SECONDS
+        bigger = memory_ratio > 1 + memory_threshold
+        regressed = regressed or slower or bigger
+        flags = ', '.join(flag for flag, hit in (('SLOWER', slower), ('MORE MEMORY', bigger)) if hit)
+        lines.append(f"{name:40s} {old['seconds'] * 1000:9.1f} -> {new['seconds'] * 1000:9.1f} ms ({time_ratio - 1:+7.1%})"
+                     f" {old['peak_bytes'] / 2 ** 20:8.1f} -> {new['peak_bytes'] / 2 ** 20:8.1f} MiB ({memory_ratio - 1:+7.1%}) {flags}")
+    return lines, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the simulation, plotting and explanation paths")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help="time every stage and save the results as JSON")
+    run.add_argument('-o', '--output', help="JSON file for the results (default: only print them)")
+    run.add_argument('--sizes', default='small,medium,large', help=f"comma-separated schedule sizes out of {', '.join(SIZES)}")
+    run.add_argument('--stages', default=','.join(STAGES), help=f"comma-separated stages out of {', '.join(STAGES)}")
+    run.add_argument('--repeat', type=int, default=5)
+    run.add_argument('--seed', type=int, default=0)
+    check = commands.add_parser('compare', help="report the stages that regressed between two saved runs")
+    check.add_argument('before')
+    check.add_argument('after')
+    check.add_argument('--threshold', type=float, default=0.1, help="allowed slowdown as a fraction (default: 0.1)")
+    check.add_argument('--memory-threshold', type=float, default=0.1, help="allowed peak memory growth as a fraction (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        sizes, stages = args.sizes.split(','), args.stages.split(',')
+        unknown = [name for name in sizes if name not in SIZES] + [name for name in stages if name not in STAGES]
+        if unknown:
+            parser.error(f"unknown size or stage: {', '.join(unknown)}")
+        report = run_suite(sizes, stages, args.repeat, args.seed)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        return 0
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    lines, regressed = compare(before, after, args.threshold, args.memory_threshold)
+    for line in lines:
+        print(line)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+# The per-minute loops simulate() and simulate_with_voluntary() ran before the engine was vectorized, kept
+# unchanged so the tests can check the engine still gives the same results
+
+
+def simulate_with_voluntary(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation, apply_breathing):
+    history = []
+    attention_curve = []
+    correction_curve = []  # Correction curve initialization
+    meditation_points = []
+    breathing_points = []
+    voluntary_intention_points = []
+    total_attention_gain = 0
+    total_breathing_gain = 0
+    total_voluntary_intention_gain = 0
+    current_time = 0
+    attention_level = initial_attention
+
+    # Apply initial Enneagram effects
+    attention_level = enneagram_type.apply_effects(attention_level)
+
+    # Ensure the attention line starts from point 0
+    history.append((current_time, None, attention_level, 0))
+    attention_curve.append((current_time, None, 0, attention_level))
+    correction_curve.append((current_time, attention_level))
+
+    for task in tasks:
+        current_time = task.start_time
+        task_end_time = task.start_time + task.duration
+        while current_time < task_end_time:
+            if apply_meditation:
+                for session in meditation_sessions:
+                    if session.start_time <= current_time < session.start_time + session.duration:
+                        attention_level += session.effectiveness
+                        if attention_level > max_attention:
+                            attention_level = max_attention
+                        meditation_points.append((current_time, attention_level))
+                        total_attention_gain += session.effectiveness
+
+            if apply_breathing:
+                for practice in breathing_practices:
+                    if practice.start_time <= current_time < practice.start_time + practice.duration:
+                        attention_level += practice.effectiveness
+                        if attention_level > max_attention:
+                            attention_level = max_attention
+                        breathing_points.append((current_time, attention_level))
+                        total_breathing_gain += practice.effectiveness
+
+            # Apply Law of Octaves and Law of Three
+            if (current_time % 7 == 0):  # Law of Octaves
+                attention_level += 10  # Example boost for octave
+            if (current_time % 3 == 0):  # Law of Three
+                attention_level -= 5  # Example reduction for interval
+
+            # Adjust the rate of decrease when attention is below the minimum threshold
+            if attention_level < min_attention:
+                attention_level -= task.difficulty * 0.5  # Reduce the rate by half
+                voluntary_intention_points.append((current_time, attention_level))
+                total_voluntary_intention_gain += task.difficulty * 0.5
+            else:
+                attention_level -= task.difficulty
+
+            history.append((current_time, task.task_id, attention_level, task.difficulty))
+            attention_curve.append((current_time, task.task_id, task.difficulty, attention_level))
+            correction_curve.append((current_time, attention_level))  # Update correction curve
+            current_time += 1
+
+    accumulated_fatigue = sum(task.difficulty for task in tasks)
+    avg_external_factors = sum(task.criticality for task in tasks) / len(tasks) if tasks else 0
+    return history, attention_curve, correction_curve, meditation_points, breathing_points, voluntary_intention_points, total_attention_gain, total_breathing_gain, total_voluntary_intention_gain, accumulated_fatigue, avg_external_factors
+
+
+def simulate(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type, apply_meditation, apply_breathing):
+    history = []
+    attention_curve = []
+    meditation_points = []
+    breathing_points = []
+    total_attention_gain = 0
+    total_breathing_gain = 0
+    current_time = 0
+    attention_level = initial_attention
+
+    # Apply initial Enneagram effects
+    attention_level = enneagram_type.apply_effects(attention_level)
+
+    for task in tasks:
+        current_time = task.start_time
+        task_end_time = task.start_time + task.duration
+        while current_time < task_end_time:
+            if apply_meditation:
+                for session in meditation_sessions:
+                    if session.start_time <= current_time < session.start_time + session.duration:
+                        attention_level += session.effectiveness
+                        if attention_level > max_attention:
+                            attention_level = max_attention
+                        meditation_points.append((current_time, attention_level))
+                        total_attention_gain += session.effectiveness
+
+            if apply_breathing:
+                for practice in breathing_practices:
+                    if practice.start_time <= current_time < practice.start_time + practice.duration:
+                        attention_level += practice.effectiveness
+                        if attention_level > max_attention:
+                            attention_level = max_attention
+                        breathing_points.append((current_time, attention_level))
+                        total_breathing_gain += practice.effectiveness
+
+            # Apply Law of Octaves and Law of Three
+            if (current_time % 7 == 0):  # Law of Octaves
+                attention_level += 10  # Example boost for octave
+            if (current_time % 3 == 0):  # Law of Three
+                attention_level -= 5  # Example reduction for interval
+
+            attention_level -= task.difficulty
+
+            history.append((current_time, task.task_id, attention_level, task.difficulty))
+            attention_curve.append((current_time, task.task_id, task.difficulty, attention_level))
+            current_time += 1
+
+    accumulated_fatigue = sum(task.difficulty for task in tasks)
+    avg_external_factors = sum(task.criticality for task in tasks) / len(tasks) if tasks else 0
+    return history, attention_curve, meditation_points, breathing_points, total_attention_gain, total_breathing_gain, accumulated_fatigue, avg_external_factors
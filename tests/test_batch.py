@@ -0,0 +1,46 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from attention_core import engine
+from attention_core.batch import simulate_batch
+from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Schedule, Task
+
+
+def random_schedule(rng):
+    # Plans of different lengths, some with no tasks, with overlapping and out-of-order tasks
+    number = lambda a, b: rng.randint(a, b) + rng.choice((0, 0, 0.5))
+    tasks = [Task(i, f"t{i}", 3, rng.randint(1, 5), rng.randint(0, 5), number(1, 60), number(0, 200)) for i in range(rng.randint(0, 5))]
+    meditation_sessions = [MeditationSession(number(0, 200), number(1, 20), rng.randint(0, 7)) for _ in range(rng.randint(0, 3))]
+    breathing_practices = [BreathingPractice("b", number(0, 200), number(1, 10), rng.randint(0, 7)) for _ in range(rng.randint(0, 3))]
+    return Schedule(tasks, meditation_sessions, breathing_practices, ENNEAGRAM_TYPES[rng.randrange(len(ENNEAGRAM_TYPES))],
+                    rng.randint(50, 120), rng.randint(-50, 80), rng.randint(80, 120))
+
+
+@pytest.mark.parametrize('overlap', (None, 'latest'))
+@pytest.mark.parametrize('voluntary', (False, True))
+@pytest.mark.parametrize('seed', range(5))
+def test_rows_match_one_simulate_per_plan(seed, voluntary, overlap):
+    rng = random.Random(seed)
+    schedules = [random_schedule(rng) for _ in range(12)]
+    for apply_meditation, apply_breathing in ((True, True), (False, True), (False, False)):
+        batch = simulate_batch(schedules, apply_meditation, apply_breathing, voluntary, overlap)
+        assert len(batch) == len(schedules)
+        for i, schedule in enumerate(schedules):
+            run = engine.simulate_with_voluntary if voluntary else engine.simulate
+            expected = run(schedule.tasks, schedule.initial_attention, schedule.min_attention, schedule.max_attention, schedule.meditation_sessions,
+                           schedule.breathing_practices, schedule.enneagram_type, apply_meditation, apply_breathing, overlap=overlap)
+            # simulate_with_voluntary() starts with the initial point, which the batch leaves out
+            first = 1 if voluntary else 0
+            length = batch.lengths[i]
+            assert length == len(expected.time) - first
+            assert np.array_equal(batch.times[i, :length], expected.time[first:])
+            assert np.allclose(batch.attention[i, :length], expected.attention[first:], rtol=1e-9, atol=1e-9)
+            assert np.isnan(batch.attention[i, length:]).all()
+            assert math.isclose(batch.total_attention_gain[i], expected.total_attention_gain, abs_tol=1e-9)
+            assert math.isclose(batch.total_breathing_gain[i], expected.total_breathing_gain, abs_tol=1e-9)
+            assert math.isclose(batch.total_voluntary_intention_gain[i], expected.total_voluntary_intention_gain, abs_tol=1e-9)
+            assert batch.accumulated_fatigue[i] == expected.accumulated_fatigue
+            assert math.isclose(batch.avg_external_factors[i], expected.avg_external_factors)
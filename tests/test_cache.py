@@ -0,0 +1,80 @@
+import copy
+
+import numpy as np
+
+from attention_core import engine
+from attention_core.cache import CachedSimulator, ResultCache, simulation_key
+from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Task
+
+
+def schedule():
+    tasks = [Task(0, "a", 3, 1, 2, 30, 0), Task(1, "b", 3, 1, 6, 30, 30)]
+    return (tasks, 100, 50, 100, [MeditationSession(5, 10, 3)], [BreathingPractice("b", 40, 5, 2)], ENNEAGRAM_TYPES[0])
+
+
+class Sized:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+def test_key_depends_on_values_not_objects():
+    first, second = schedule(), copy.deepcopy(schedule())
+    assert simulation_key('simulate', *first, (True, True)) == simulation_key('simulate', *second, (True, True))
+    # Integers and floats of the same value are the same input
+    second[0][0].difficulty = 1.0
+    assert simulation_key('simulate', *first) == simulation_key('simulate', *second)
+
+
+def test_key_changes_with_every_input():
+    base = simulation_key('simulate', *schedule(), (True, True, None))
+    assert simulation_key('simulate_with_voluntary', *schedule(), (True, True, None)) != base
+    assert simulation_key('simulate', *schedule(), (True, False, None)) != base
+    assert simulation_key('simulate', *schedule(), (True, True, 'latest')) != base
+    changed = schedule()
+    changed[0][1].start_time = 31
+    assert simulation_key('simulate', *changed, (True, True, None)) != base
+    changed = schedule()
+    changed[5][0].effectiveness = 3
+    assert simulation_key('simulate', *changed, (True, True, None)) != base
+    assert simulation_key('simulate', *schedule()[:6], ENNEAGRAM_TYPES[1], (True, True, None)) != base
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = ResultCache(max_bytes=100)
+    cache.put('a', Sized(40))
+    cache.put('b', Sized(40))
+    assert cache.get('a') is not None
+    cache.put('c', Sized(40))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.nbytes == 80
+    # Larger than the whole cache: not kept in memory at all
+    cache.put('d', Sized(200))
+    assert 'd' not in cache and len(cache) == 2
+
+
+def test_results_survive_a_round_trip_through_disk(tmp_path):
+    simulator = CachedSimulator(ResultCache(directory=str(tmp_path)))
+    first = simulator.simulate_with_voluntary(*schedule(), True, True)
+    other = ResultCache(directory=str(tmp_path))
+    second = CachedSimulator(other).simulate_with_voluntary(*schedule(), True, True)
+    assert other.stats()['disk_hits'] == 1 and other.stats()['misses'] == 0
+    assert np.array_equal(first.attention, second.attention)
+    assert list(first) == list(second)
+
+
+def test_editing_the_task_list_does_not_change_cached_results():
+    simulator = CachedSimulator(ResultCache())
+    arguments = schedule()
+    tasks = arguments[0]
+    variants = simulator.simulate_variants(*arguments, names=('voluntary',))
+    expected = variants.output('voluntary')
+    # Attention_main.modify_values() replaces tasks in the list the cached result was made from
+    tasks[0] = Task(0, "a", 3, 4, 8, 30, 0)
+    simulator.simulate_variants(*arguments, names=('voluntary',))
+    unchanged = simulator.simulate_variants(*schedule(), names=('voluntary',)).output('voluntary')
+    assert simulator.cache.hits == 1
+    assert unchanged.accumulated_fatigue == expected.accumulated_fatigue == 2
+    assert unchanged.avg_external_factors == expected.avg_external_factors == 4.0
+    reference = engine.simulate_with_voluntary(*schedule(), True, True)
+    assert unchanged.accumulated_fatigue == reference.accumulated_fatigue
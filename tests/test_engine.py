@@ -0,0 +1,91 @@
+import math
+import random
+
+import pytest
+
+import baseline
+from attention_core import engine
+from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Task
+
+SEEDS = range(40)
+SESSIONS = ((True, True), (True, False), (False, True), (False, False))
+
+
+def random_schedule(rng, fractional=False, horizon=300):
+    # Tasks that may overlap, leave gaps or come out of order, and sessions anywhere around them
+    number = (lambda a, b: round(rng.uniform(a, b) * 2) / 2) if fractional else rng.randint
+    tasks = [Task(i, f"t{i}", number(1, 5), number(1, 5), number(0, 5), number(1, 80), number(0, horizon)) for i in range(rng.randint(0, 6))]
+    meditation_sessions = [MeditationSession(number(0, horizon), number(1, 20), number(0, 7)) for _ in range(rng.randint(0, 4))]
+    breathing_practices = [BreathingPractice("b", number(0, horizon), number(1, 10), number(0, 7)) for _ in range(rng.randint(0, 6))]
+    return tasks, meditation_sessions, breathing_practices
+
+
+def assert_same(expected, actual):
+    if isinstance(expected, (list, tuple)):
+        assert len(expected) == len(actual)
+        for x, y in zip(expected, actual):
+            assert_same(x, y)
+    elif expected is None or actual is None:
+        assert expected is actual
+    else:
+        assert math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-9), (expected, actual)
+
+
+def check(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type):
+    arguments = (tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type)
+    for apply_meditation, apply_breathing in SESSIONS:
+        assert_same(baseline.simulate(*arguments, apply_meditation, apply_breathing),
+                    engine.simulate(*arguments, apply_meditation, apply_breathing).legacy())
+        assert_same(baseline.simulate_with_voluntary(*arguments, apply_meditation, apply_breathing),
+                    engine.simulate_with_voluntary(*arguments, apply_meditation, apply_breathing).legacy())
+
+
+@pytest.mark.parametrize('fractional', (False, True))
+@pytest.mark.parametrize('seed', SEEDS)
+def test_random_schedules_match_baseline(seed, fractional):
+    rng = random.Random(seed)
+    tasks, meditation_sessions, breathing_practices = random_schedule(rng, fractional)
+    check(tasks, rng.randint(50, 120), rng.randint(-200, 60), rng.randint(60, 120), meditation_sessions, breathing_practices,
+          ENNEAGRAM_TYPES[rng.randrange(len(ENNEAGRAM_TYPES))])
+
+
+def test_laws_on_multiples_of_three_and_seven():
+    # 0, 21, 42 and 63 are multiples of both; a task starting on an odd minute shifts which ones it sees
+    tasks = [Task(0, "a", 3, 1, 2, 64, 0), Task(1, "b", 3, 2, 2, 30, 101)]
+    check(tasks, 100, 0, 100, [], [], ENNEAGRAM_TYPES[4])
+
+
+def test_clamped_at_max_attention():
+    # Sessions strong enough to hit max_attention on every minute they run, some of them stacked
+    tasks = [Task(0, "a", 3, 1, 2, 60, 0), Task(1, "b", 3, 4, 2, 40, 60)]
+    meditation_sessions = [MeditationSession(0, 30, 20), MeditationSession(10, 10, 15)]
+    breathing_practices = [BreathingPractice("b", 5, 40, 25), BreathingPractice("c", 70, 5, 30)]
+    check(tasks, 100, 50, 100, meditation_sessions, breathing_practices, ENNEAGRAM_TYPES[0])
+
+
+def test_voluntary_below_min_attention():
+    # The level falls under min_attention, climbs back above it with a session and falls again
+    tasks = [Task(0, "a", 3, 5, 2, 40, 0), Task(1, "b", 3, 3, 2, 50, 40)]
+    meditation_sessions = [MeditationSession(45, 10, 12)]
+    check(tasks, 90, 60, 100, meditation_sessions, [], ENNEAGRAM_TYPES[8])
+
+
+def test_voluntary_hovering_around_min_attention():
+    # A session that outweighs the halved drain but not the full one keeps the level crossing
+    # min_attention every few minutes, so the kernel steps from task op to task op
+    tasks = [Task(i, f"t{i}", 3, 2 + i % 3 * 0.5, 2, 500, i * 500) for i in range(12)]
+    meditation_sessions = [MeditationSession(0, 6000, 1.5), MeditationSession(2000, 300, 0.25)]
+    breathing_practices = [BreathingPractice("b", 4000, 50, 1)]
+    check(tasks, 50, 50, 60, meditation_sessions, breathing_practices, ENNEAGRAM_TYPES[2])
+
+
+def test_voluntary_starts_at_zero_and_ends_with_last_task():
+    tasks = [Task(0, "a", 3, 2, 2, 10, 5), Task(1, "b", 3, 1, 2, 7, 30)]
+    history = engine.simulate_with_voluntary(tasks, 80, 40, 100, [], [], ENNEAGRAM_TYPES[1], True, True).legacy()[0]
+    assert history[0] == (0, None, 83, 0)
+    assert history[-1][0] == 36
+    check(tasks, 80, 40, 100, [], [], ENNEAGRAM_TYPES[1])
+
+
+def test_no_tasks():
+    check([], 100, 50, 100, [MeditationSession(0, 10, 5)], [], ENNEAGRAM_TYPES[0])
@@ -0,0 +1,77 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from attention_core import engine
+from attention_core.events import simulate_events
+from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Task
+
+
+def random_schedule(rng, offset=0.0, horizon=200):
+    # Whole-minute plans, or plans shifted off the minute grid by up to `offset` minutes
+    number = lambda a, b: rng.randint(a, b) + (rng.choice((0, offset)) if offset else 0)
+    tasks = [Task(i, f"t{i}", 3, rng.randint(1, 5), 2, number(1, 60), number(0, horizon)) for i in range(rng.randint(1, 5))]
+    meditation_sessions = [MeditationSession(number(0, horizon), number(1, 20), rng.randint(0, 7)) for _ in range(rng.randint(0, 4))]
+    breathing_practices = [BreathingPractice("b", number(0, horizon), number(1, 10), rng.randint(0, 7)) for _ in range(rng.randint(0, 4))]
+    return tasks, meditation_sessions, breathing_practices
+
+
+def stepped(tasks, initial_attention, min_attention, max_attention, meditation_sessions, breathing_practices, enneagram_type,
+            apply_meditation, apply_breathing, voluntary, step):
+    # simulate_events() one step at a time: the per-minute loop with every rate scaled by the step and
+    # each law applied on the step that contains its multiple
+    level = enneagram_type.apply_effects(initial_attention)
+    times, levels = [], []
+    for task in tasks:
+        for k in range(math.ceil(task.duration / step - 1e-9)):
+            time = task.start_time + k * step
+            for sessions, applied in ((meditation_sessions, apply_meditation), (breathing_practices, apply_breathing)):
+                for session in sessions if applied else ():
+                    if session.start_time <= time + 1e-9 * step < session.start_time + session.duration:
+                        level = min(level + session.effectiveness * step, max_attention)
+            for period, add in ((7, 10), (3, -5)):
+                level += add * (math.ceil((time + step) / period - 1e-9) - math.ceil(time / period - 1e-9))
+            drain = task.difficulty * step
+            level -= 0.5 * drain if voluntary and level < min_attention else drain
+            times.append(time)
+            levels.append(level)
+    return np.array(times), np.array(levels)
+
+
+@pytest.mark.parametrize('voluntary', (False, True))
+@pytest.mark.parametrize('seed', range(30))
+def test_one_minute_steps_match_engine(seed, voluntary):
+    rng = random.Random(seed)
+    tasks, meditation_sessions, breathing_practices = random_schedule(rng)
+    arguments = (tasks, rng.randint(50, 120), rng.randint(-100, 80), 100, meditation_sessions, breathing_practices,
+                 ENNEAGRAM_TYPES[rng.randrange(len(ENNEAGRAM_TYPES))])
+    for apply_meditation, apply_breathing in ((True, True), (False, True), (False, False)):
+        curve = simulate_events(*arguments, apply_meditation, apply_breathing, voluntary, 1.0)
+        expected = (engine.simulate_with_voluntary if voluntary else engine.simulate)(*arguments, apply_meditation, apply_breathing)
+        # simulate_with_voluntary() starts with the initial point, which simulate_events() leaves out
+        first = 1 if voluntary else 0
+        times, task_ids, levels = curve.sample()
+        assert np.array_equal(times, expected.time[first:])
+        assert np.array_equal(task_ids, expected.task_id[first:])
+        assert np.allclose(levels, expected.attention[first:], rtol=1e-9, atol=1e-9)
+        assert math.isclose(curve.total_attention_gain, expected.total_attention_gain, abs_tol=1e-9)
+        assert math.isclose(curve.total_breathing_gain, expected.total_breathing_gain, abs_tol=1e-9)
+        assert math.isclose(curve.total_voluntary_intention_gain, expected.total_voluntary_intention_gain, abs_tol=1e-9)
+
+
+@pytest.mark.parametrize('resolution', (0.5, 0.25, 0.1))
+@pytest.mark.parametrize('seed', range(20))
+def test_sub_minute_steps_match_stepped_loop(seed, resolution):
+    # min_attention sits 0.37 off every level the plan can reach, so no step lands on it exactly and
+    # both sides agree on which steps the voluntary intention relieves
+    rng = random.Random(seed)
+    tasks, meditation_sessions, breathing_practices = random_schedule(rng, offset=0.5)
+    arguments = (tasks, rng.randint(50, 120), rng.randint(-100, 80) + 0.37, 100, meditation_sessions, breathing_practices,
+                 ENNEAGRAM_TYPES[rng.randrange(len(ENNEAGRAM_TYPES))])
+    for voluntary in (False, True):
+        times, levels = stepped(*arguments, True, True, voluntary, resolution)
+        curve_times, _, curve_levels = simulate_events(*arguments, True, True, voluntary, resolution).sample()
+        assert np.allclose(curve_times, times, rtol=1e-9, atol=1e-9)
+        assert np.allclose(curve_levels, levels, rtol=1e-6, atol=1e-6)
@@ -0,0 +1,76 @@
+import copy
+import random
+
+import numpy as np
+import pytest
+
+from attention_core import engine
+from attention_core.incremental import IncrementalSimulator
+from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Task
+
+EDITS = ('insert', 'delete', 'edit_task', 'move_task', 'edit_session', 'insert_session', 'delete_session')
+
+
+def schedule(rng):
+    tasks = [Task(i, f"t{i}", 3, round(rng.uniform(0.1, 5), 1), 2, rng.randint(10, 80), i * 60 + rng.choice((0, 0.5))) for i in range(10)]
+    meditation_sessions = [MeditationSession(rng.randint(0, 600), rng.randint(1, 20), round(rng.uniform(0.1, 5), 1)) for _ in range(3)]
+    breathing_practices = [BreathingPractice("b", rng.randint(0, 600), rng.randint(1, 8), round(rng.uniform(0.1, 5), 1)) for _ in range(8)]
+    return tasks, meditation_sessions, breathing_practices
+
+
+def edit(rng, kind, tasks, meditation_sessions, breathing_practices):
+    # Edits replace objects instead of changing them, the way the GUI and interactive() build new ones
+    if kind == 'insert':
+        tasks.insert(rng.randrange(len(tasks) + 1), Task(len(tasks), "new", 3, round(rng.uniform(0.1, 5), 1), 2, 30, rng.randint(0, 700)))
+    elif kind == 'delete':
+        tasks.pop(rng.randrange(len(tasks)))
+    elif kind == 'edit_task':
+        i = rng.randrange(len(tasks))
+        tasks[i] = copy.copy(tasks[i])
+        tasks[i].difficulty = round(rng.uniform(0.1, 5), 1)
+    elif kind == 'move_task':
+        # Changed in place, the way Attention_main.modify_values() does
+        tasks[rng.randrange(len(tasks))].start_time = rng.randint(0, 700)
+    elif kind == 'edit_session':
+        i = rng.randrange(len(breathing_practices))
+        breathing_practices[i] = copy.copy(breathing_practices[i])
+        breathing_practices[i].start_time = rng.randint(0, 600)
+    elif kind == 'insert_session':
+        meditation_sessions.insert(rng.randrange(len(meditation_sessions) + 1), MeditationSession(rng.randint(0, 600), rng.randint(1, 20), 1.5))
+    elif breathing_practices:
+        breathing_practices.pop(rng.randrange(len(breathing_practices)))
+
+
+def assert_identical(a, b):
+    for name in ('time', 'task_id', 'difficulty', 'attention', 'flags', 'event_time', 'event_level', 'event_kind'):
+        assert np.array_equal(getattr(a, name), getattr(b, name)), name
+    for name in ('total_attention_gain', 'total_breathing_gain', 'total_voluntary_intention_gain'):
+        assert getattr(a, name) == getattr(b, name), name
+
+
+@pytest.mark.parametrize('overlap', (None, 'latest'))
+@pytest.mark.parametrize('kind', EDITS)
+@pytest.mark.parametrize('seed', range(10))
+def test_resumed_runs_match_full_runs(monkeypatch, seed, kind, overlap):
+    # Small checkpoint blocks, so that edits late in the plan resume from the middle of it
+    monkeypatch.setattr(engine, 'CHECKPOINT_BLOCK', 16)
+    rng = random.Random(seed)
+    tasks, meditation_sessions, breathing_practices = schedule(rng)
+    simulator = IncrementalSimulator()
+    resumed = []
+    for step in range(5):
+        arguments = (tasks, 100, 40, 100, meditation_sessions, breathing_practices, ENNEAGRAM_TYPES[0])
+        assert_identical(simulator.simulate(*arguments, True, True, overlap=overlap), engine.simulate(*arguments, True, True, overlap=overlap))
+        assert_identical(simulator.simulate_with_voluntary(*arguments, True, False, overlap=overlap),
+                         engine.simulate_with_voluntary(*arguments, True, False, overlap=overlap))
+        resumed.append(simulator.resumed_from)
+        incremental = simulator.simulate_variants(*arguments, overlap=overlap)
+        full = engine.simulate_variants(*arguments, overlap=overlap)
+        # The patched timeline, down to which session every op comes from
+        compiled = engine.compile_schedule(tasks, meditation_sessions, breathing_practices, 100, overlap=overlap)
+        for name, value in vars(compiled).items():
+            assert np.array_equal(getattr(incremental.timeline, name), value), name
+        assert np.array_equal(incremental.levels, full.levels)
+        assert np.array_equal(incremental.below, full.below)
+        edit(rng, kind, tasks, meditation_sessions, breathing_practices)
+    assert any(resumed[1:])
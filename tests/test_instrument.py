@@ -0,0 +1,103 @@
+import json
+import threading
+
+import pytest
+
+from attention_core import engine, instrument
+from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Task
+from attention_core.result import Explanation
+
+
+def schedule():
+    tasks = [Task(0, "a", 3, 5, 2, 40, 0), Task(1, "b", 3, 3, 2, 50, 40)]
+    return (tasks, 90, 60, 100, [MeditationSession(45, 10, 12)], [BreathingPractice("b", 5, 10, 30)], ENNEAGRAM_TYPES[8])
+
+
+def simulate_and_explain():
+    result = engine.simulate_with_voluntary(*schedule(), True, True)
+    Explanation(result, schedule()[0], 60)
+
+
+def read_trace(recorder, tmp_path):
+    path = tmp_path / "trace.json"
+    recorder.write_chrome_trace(str(path))
+    with open(path) as f:
+        return json.load(f)
+
+
+def assert_nested(events):
+    # On each thread every phase ends before the phase it started in does: complete events either
+    # nest or follow one another, the way begin / end pairs would match up
+    for tid in {event['tid'] for event in events}:
+        stack = []
+        for event in sorted((event for event in events if event['tid'] == tid), key=lambda event: (event['ts'], -event['dur'])):
+            while stack and stack[-1] <= event['ts'] + 1e-3:
+                stack.pop()
+            end = event['ts'] + event['dur']
+            assert not stack or end <= stack[-1] + 1e-3, event
+            stack.append(end)
+
+
+def test_trace_is_json_with_one_complete_event_per_phase(tmp_path):
+    with instrument.recording() as recorder:
+        simulate_and_explain()
+    trace = read_trace(recorder, tmp_path)
+    assert trace['displayTimeUnit'] == 'ms'
+    phases = [event for event in trace['traceEvents'] if event['ph'] == 'X']
+    counters = [event for event in trace['traceEvents'] if event['ph'] == 'C']
+    assert len(phases) + len(counters) == len(trace['traceEvents']) and len(counters) == 1
+    for event in phases:
+        assert event['ts'] >= 0 and event['dur'] >= 0
+        assert event['cat'] == event['name'].split('.')[0]
+    assert_nested(phases)
+    metrics = recorder.metrics()
+    calls = {}
+    for event in phases:
+        calls[event['name']] = calls.get(event['name'], 0) + 1
+    assert calls == {name: entry['calls'] for name, entry in metrics['phases'].items()}
+    assert {'simulate_with_voluntary', 'compile', 'run', 'output', 'explain.index'} <= calls.keys()
+    assert counters[0]['args'] == metrics['counters']
+    assert counters[0]['ts'] >= max(event['ts'] + event['dur'] for event in phases) - 1e-3
+    assert metrics['counters']['ticks'] > 0
+
+
+def test_phases_from_other_threads_keep_their_own_thread(tmp_path):
+    # The threads wait for each other at the end, so that none of them exits and hands its id on
+    barrier = threading.Barrier(3)
+
+    def work():
+        simulate_and_explain()
+        barrier.wait()
+
+    with instrument.recording() as recorder:
+        threads = [threading.Thread(target=work) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    phases = [event for event in read_trace(recorder, tmp_path)['traceEvents'] if event['ph'] == 'X']
+    assert len({event['tid'] for event in phases}) == 3
+    assert_nested(phases)
+    assert recorder.metrics()['phases']['simulate_with_voluntary']['calls'] == 3
+
+
+def test_phase_is_recorded_when_it_raises():
+    with instrument.recording() as recorder:
+        with pytest.raises(ValueError):
+            with instrument.phase('failing'):
+                raise ValueError
+    assert recorder.metrics()['phases']['failing']['calls'] == 1
+
+
+def test_nothing_is_recorded_outside_recording():
+    recorder = instrument.Recorder()
+    with instrument.recording(recorder):
+        with instrument.recording() as inner:
+            simulate_and_explain()
+        assert instrument.enabled()
+    assert not instrument.enabled()
+    simulate_and_explain()
+    assert recorder.spans == [] and recorder.counters == {}
+    assert inner.metrics()['counters']['ticks'] > 0
+    trace = recorder.chrome_trace()
+    assert [event['ph'] for event in trace['traceEvents']] == ['C']
@@ -0,0 +1,30 @@
+import random
+
+import numpy as np
+import pytest
+
+from attention_core.intervals import IntervalIndex, range_hits
+from attention_core.model import MeditationSession
+
+
+def scanned(times, sessions):
+    # Every (minute, session) pair the per-minute loop would find by scanning the session list
+    return sorted((i, j) for i, time in enumerate(times) for j, s in enumerate(sessions) if s.start_time <= time < s.start_time + s.duration)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_hits_match_scanning_the_list(seed):
+    # Unsorted and repeated minutes, and sessions that overlap, touch, are empty or end before they start
+    rng = random.Random(seed)
+    times = [rng.choice((rng.randint(0, 60), rng.randint(0, 120) / 2)) for _ in range(rng.randint(0, 80))]
+    sessions = [MeditationSession(rng.randint(-5, 60) + rng.choice((0, 0.5)), rng.randint(-3, 20), 1) for _ in range(rng.randint(0, 8))]
+    ticks, sources = IntervalIndex(sessions).hits(np.array(times))
+    assert sorted(zip(ticks.tolist(), sources.tolist())) == scanned(times, sessions)
+    ticks, sources = range_hits(np.array(times), np.array([s.start_time for s in sessions], dtype=float),
+                                np.array([s.start_time + s.duration for s in sessions], dtype=float), np.argsort(times, kind='stable'))
+    assert sorted(zip(ticks.tolist(), sources.tolist())) == scanned(times, sessions)
+
+
+def test_no_minutes_or_no_sessions():
+    assert [len(a) for a in IntervalIndex([]).hits(np.arange(5.0))] == [0, 0]
+    assert [len(a) for a in IntervalIndex([MeditationSession(0, 5, 1)]).hits(np.empty(0))] == [0, 0]
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from attention_core import engine
+from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Schedule, Task
+from attention_core.optimize import Placement, optimize_sessions, score_levels
+
+
+def base_schedule():
+    # Long enough to dip under min_attention in more than one place
+    tasks = [Task(0, "a", 3, 3, 1, 30, 0), Task(1, "b", 3, 1, 2, 20, 30), Task(2, "c", 3, 4, 1, 25, 55.5)]
+    return Schedule(tasks, [MeditationSession(35, 5, 1)], [BreathingPractice("b", 5, 5, 1)], ENNEAGRAM_TYPES[2], 80, 60, 100)
+
+
+def score(schedule, meditation_sessions, breathing_practices, objective, overlap=None):
+    result = engine.simulate(schedule.tasks, schedule.initial_attention, schedule.min_attention, schedule.max_attention,
+                             meditation_sessions, breathing_practices, schedule.enneagram_type, True, True, overlap=overlap)
+    return score_levels(result.attention, schedule.min_attention, objective)[0]
+
+
+def brute_force(schedule, kind, effectiveness, durations, start_step, objective, overlap=None):
+    # Best score of one more session over every start and duration, one simulate() each
+    times = engine.compile_schedule(schedule.tasks, [], [], schedule.max_attention, overlap=overlap).times
+    best = -np.inf
+    for start in np.arange(np.floor(times.min()), times.max() + 1, start_step):
+        for duration in durations:
+            session = Placement(kind, float(start), float(duration), effectiveness)
+            meditation = list(schedule.meditation_sessions) + ([session] if kind == 'meditation' else [])
+            breathing = list(schedule.breathing_practices) + ([session] if kind == 'breathing' else [])
+            best = max(best, score(schedule, meditation, breathing, objective, overlap))
+    return best
+
+
+@pytest.mark.parametrize('overlap', (None, 'latest'))
+@pytest.mark.parametrize('kind', ('meditation', 'breathing'))
+@pytest.mark.parametrize('objective', ('minutes_above_min', 'lowest_attention'))
+def test_one_session_matches_brute_force(objective, kind, overlap):
+    schedule = base_schedule()
+    budgets = {'meditation_budget': 1} if kind == 'meditation' else {'breathing_budget': 1}
+    result = optimize_sessions(schedule, durations=(3, 10), start_step=2, meditation_effectiveness=4, breathing_effectiveness=2.5,
+                               objective=objective, overlap=overlap, **budgets)
+    effectiveness = 4 if kind == 'meditation' else 2.5
+    assert result.score == brute_force(schedule, kind, effectiveness, (3, 10), 2, objective, overlap)
+    assert result.baseline_score == score(schedule, schedule.meditation_sessions, schedule.breathing_practices, objective, overlap)
+    # The placement really scores what the optimizer says it does
+    assert [placement.kind for placement in result.placements] == [kind]
+    assert score(schedule, result.schedule.meditation_sessions, result.schedule.breathing_practices, objective, overlap) == result.score
+
+
+def test_greedy_placements_score_what_they_claim():
+    schedule = base_schedule()
+    result = optimize_sessions(schedule, meditation_budget=2, breathing_budget=1, durations=(5, 15), start_step=3)
+    assert len(result.placements) == 3 and result.score >= result.baseline_score
+    assert score(schedule, result.schedule.meditation_sessions, result.schedule.breathing_practices, 'minutes_above_min') == result.score
+    assert result.evaluated > 0 and result.pruned >= 0
+
+
+def test_unknown_objective():
+    with pytest.raises(ValueError):
+        optimize_sessions(base_schedule(), meditation_budget=1, objective='mean')
@@ -0,0 +1,45 @@
+import random
+
+import numpy as np
+import pytest
+
+from attention_core import engine
+from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Person, Task
+from attention_core.montecarlo import simulate_monte_carlo
+from attention_core.roster import simulate_roster
+from attention_core.stream import iter_simulation
+
+RULES = (None, 'latest', 'earliest', 'hardest')
+
+
+def random_schedule(rng, fractional):
+    # Tasks in random order with random starts, so most plans have overlaps and gaps
+    number = lambda a, b: rng.randint(a, b) + (rng.choice((0, 0.5, 0.25)) if fractional else 0)
+    tasks = [Task(rng.randint(0, 9), "t", 3, rng.randint(1, 5), 2, number(1, 80), number(0, 200)) for _ in range(rng.randint(1, 6))]
+    meditation_sessions = [MeditationSession(number(0, 200), number(1, 20), rng.randint(0, 7)) for _ in range(3)]
+    breathing_practices = [BreathingPractice("b", number(0, 200), number(1, 10), rng.randint(0, 7)) for _ in range(3)]
+    return tasks, meditation_sessions, breathing_practices
+
+
+@pytest.mark.parametrize('overlap', RULES)
+@pytest.mark.parametrize('seed', range(20))
+def test_entry_points_follow_the_overlap_rule(seed, overlap):
+    rng = random.Random(seed)
+    tasks, meditation_sessions, breathing_practices = random_schedule(rng, fractional=seed % 2 == 1)
+    enneagram_type = ENNEAGRAM_TYPES[rng.randrange(len(ENNEAGRAM_TYPES))]
+    arguments = (tasks, 100, 50, 100, meditation_sessions, breathing_practices, enneagram_type)
+    for voluntary in (False, True):
+        full = (engine.simulate_with_voluntary if voluntary else engine.simulate)(*arguments, True, True, overlap=overlap)
+        levels = full.attention[1:] if voluntary else full.attention
+
+        blocks = list(iter_simulation(*arguments, True, True, voluntary, rng.choice((1, 7, 64)), overlap=overlap))
+        assert np.array_equal(np.concatenate([block.time for block in blocks]), full.time)
+        assert np.array_equal(np.concatenate([block.task_id for block in blocks]), full.task_id)
+        assert np.allclose(np.concatenate([block.attention for block in blocks]), full.attention)
+
+        monte_carlo = simulate_monte_carlo(*arguments, replicates=3, voluntary=voluntary, overlap=overlap)
+        assert np.allclose(monte_carlo.band(50), levels)
+
+        roster = simulate_roster(tasks, meditation_sessions, breathing_practices, [Person("p", enneagram_type, 100, 50, 100)],
+                                 voluntary=voluntary, curves=True, overlap=overlap)
+        assert np.allclose(roster.curve(0), levels)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from attention_core.plotting import lttb, minmax_downsample
+
+
+def curve(seed, n):
+    # A random walk with a few spikes, sampled at irregular increasing times
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.uniform(0.5, 2, n))
+    y = np.cumsum(rng.normal(0, 1, n))
+    y[rng.integers(0, n, 3)] += rng.choice((-50, 50), 3)
+    return x, y
+
+
+@pytest.mark.parametrize('threshold', (3, 4, 10, 99, 500, 999))
+@pytest.mark.parametrize('seed', range(5))
+def test_lttb_keeps_the_endpoints_and_the_point_budget(seed, threshold):
+    x, y = curve(seed, 1000)
+    sampled_x, sampled_y = lttb(x, y, threshold)
+    assert len(sampled_x) == len(sampled_y) == threshold
+    assert sampled_x[0] == x[0] and sampled_y[0] == y[0]
+    assert sampled_x[-1] == x[-1] and sampled_y[-1] == y[-1]
+    # Every point is one of the input points, in order and without repeats
+    keep = np.searchsorted(x, sampled_x)
+    assert (np.diff(keep) > 0).all()
+    assert np.array_equal(x[keep], sampled_x) and np.array_equal(y[keep], sampled_y)
+
+
+def test_lttb_keeps_a_lone_spike():
+    x = np.arange(1000.0)
+    y = np.zeros(1000)
+    y[437] = 80
+    sampled_x, sampled_y = lttb(x, y, 20)
+    assert 437 in sampled_x and sampled_y.max() == 80
+
+
+@pytest.mark.parametrize('threshold', (2, 1000, 5000))
+def test_lttb_leaves_short_curves_alone(threshold):
+    x, y = curve(0, 1000)
+    sampled_x, sampled_y = lttb(x, y, threshold)
+    assert np.array_equal(sampled_x, x) and np.array_equal(sampled_y, y)
+
+
+@pytest.mark.parametrize('threshold', (4, 10, 100, 999))
+@pytest.mark.parametrize('seed', range(5))
+def test_minmax_keeps_the_endpoints_and_the_extremes(seed, threshold):
+    x, y = curve(seed, 1000)
+    sampled_x, sampled_y = minmax_downsample(x, y, threshold)
+    assert len(sampled_x) <= threshold
+    assert sampled_x[0] == x[0] and sampled_x[-1] == x[-1]
+    assert sampled_y.min() == y.min() and sampled_y.max() == y.max()
+    keep = np.searchsorted(x, sampled_x)
+    assert (np.diff(keep) > 0).all()
+    assert np.array_equal(y[keep], sampled_y)
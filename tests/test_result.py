@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from attention_core import engine
+from attention_core.model import ENNEAGRAM_TYPES, MeditationSession, Task
+from attention_core.result import Explanation, analysis_lines
+from test_engine import random_schedule
+
+
+def expected_lines(result, tasks, min_attention):
+    # The text explain_attention_curve() used to print, one point at a time, with a line for every
+    # minute where attention falls below min_attention or recovers after the shift lines of that minute
+    history = result.legacy()[0]
+    lines, previous_task, below = [], None, False
+    for time, task_id, attention, difficulty in history:
+        task_name = "No task" if task_id is None or task_id >= len(tasks) else tasks[task_id].name
+        if task_name != previous_task:
+            lines += [f"Time: {time} minutes - Attention shifted to: {task_name}", f"Fatigue Factor: {difficulty}",
+                      f"Attention Level: {attention}"]
+            previous_task = task_name
+        if min_attention is not None and (attention < min_attention) != below:
+            below = not below
+            if below:
+                lines.append(f"Time: {time} minutes - Attention fell below the minimum threshold: {attention}")
+            else:
+                lines.append(f"Time: {time} minutes - Attention recovered above the minimum threshold: {attention}")
+    return lines
+
+
+def run(seed, voluntary):
+    rng = random.Random(seed)
+    tasks, meditation_sessions, breathing_practices = random_schedule(rng, fractional=seed % 2 == 1)
+    # Repeated names, so that some consecutive tasks read as one shift
+    for task in tasks:
+        task.name = rng.choice(("a", "b", "c"))
+    min_attention = rng.randint(40, 100)
+    simulate = engine.simulate_with_voluntary if voluntary else engine.simulate
+    result = simulate(tasks, rng.randint(50, 120), min_attention, rng.randint(60, 120), meditation_sessions, breathing_practices,
+                      ENNEAGRAM_TYPES[rng.randrange(len(ENNEAGRAM_TYPES))], True, True)
+    return result, tasks, min_attention
+
+
+@pytest.mark.parametrize('voluntary', (False, True))
+@pytest.mark.parametrize('seed', range(20))
+def test_lines_match_one_pass_over_the_points(seed, voluntary):
+    result, tasks, min_attention = run(seed, voluntary)
+    assert list(Explanation(result, tasks, min_attention).lines()) == expected_lines(result, tasks, min_attention)
+    assert list(analysis_lines(result, tasks)) == expected_lines(result, tasks, None)
+
+
+@pytest.mark.parametrize('page', (1, 3, 7, 50))
+@pytest.mark.parametrize('seed', range(5))
+def test_pages_concatenate_to_the_full_text(seed, page):
+    # A long day of back-to-back tasks and sessions, with the level crossing min_attention many times
+    rng = random.Random(seed)
+    tasks = [Task(i, rng.choice(("a", "b", "c", "d")), 3, rng.randint(1, 5), 2, rng.randint(5, 40), i * 40) for i in range(120)]
+    meditation_sessions = [MeditationSession(rng.randint(0, 4800), rng.randint(5, 30), rng.randint(2, 8)) for _ in range(80)]
+    result = engine.simulate_with_voluntary(tasks, 80, 60, 100, meditation_sessions, [], ENNEAGRAM_TYPES[rng.randrange(9)], True, True)
+    explanation = Explanation(result, tasks, 60)
+    assert len(explanation) > 50
+    pages = [list(explanation.lines(start, start + page)) for start in range(0, len(explanation), page)]
+    assert sum(pages, []) == list(explanation.lines()) == expected_lines(result, tasks, 60)
+    # Past the last entry a page is empty rather than an error
+    assert list(explanation.lines(len(explanation), len(explanation) + page)) == []
@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+import pytest
+
+from attention_core import batch, engine
+from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Person, Task
+from attention_core.roster import simulate_roster
+
+
+def team(rng, size, min_attention):
+    # People with their own types, thresholds and breathing practices, some with none
+    return [Person(f"p{i}", ENNEAGRAM_TYPES[rng.randrange(len(ENNEAGRAM_TYPES))], rng.randint(45, 110), min_attention(rng), 100,
+                   [BreathingPractice("p", rng.randint(0, 600), rng.randint(1, 20), rng.choice((0.5, 1, 2))) for _ in range(rng.randint(0, 3))])
+            for i in range(size)]
+
+
+def expected_curves(tasks, meditation_sessions, breathing_practices, people, voluntary):
+    curves = []
+    for person in people:
+        schedule = person.schedule(tasks, meditation_sessions, breathing_practices)
+        arguments = (schedule.tasks, schedule.initial_attention, schedule.min_attention, schedule.max_attention,
+                     schedule.meditation_sessions, schedule.breathing_practices, schedule.enneagram_type, True, True)
+        curves.append(engine.simulate_with_voluntary(*arguments).attention[1:] if voluntary else engine.simulate(*arguments).attention)
+    return np.array(curves)
+
+
+@pytest.mark.parametrize('hovering', (False, True))
+@pytest.mark.parametrize('seed', range(5))
+def test_voluntary_rows_match_engine(monkeypatch, seed, hovering):
+    # Hovering teams sit right around a session that outweighs the halved drain but not the full one,
+    # so some row crosses min_attention and the whole team is stepped minute by minute; in the other
+    # teams everyone stays on one side of min_attention all along and the closed form holds
+    # Blocks of about 50 minutes, so that stepping carries over from one block to the next
+    monkeypatch.setattr(batch, '_BLOCK_CELLS', 30 * 3 * 50)
+    rng = random.Random(seed)
+    tasks = [Task(i, f"t{i}", 3, rng.choice((1.5, 2, 2.5)), 2, rng.randint(30, 120), i * 120) for i in range(6)]
+    meditation_sessions = [MeditationSession(0, 720, 1.5)] if hovering else [MeditationSession(rng.randint(0, 600), 30, 2)]
+    people = team(rng, 30, (lambda rng: rng.randint(45, 55)) if hovering else (lambda rng: rng.choice((-1000, 1000))))
+    roster = simulate_roster(tasks, meditation_sessions, [], people, voluntary=True, curves=True)
+    expected = expected_curves(tasks, meditation_sessions, [], people, True)
+    assert np.allclose([roster.curve(i) for i in range(len(people))], expected, rtol=1e-9, atol=1e-9)
+    assert np.array_equal(roster.minutes_below, (expected < np.array([[person.min_attention] for person in people])).sum(axis=1))
+
+
+@pytest.mark.parametrize('voluntary', (False, True))
+def test_chunks_in_workers_match_one_process(voluntary):
+    rng = random.Random(7)
+    tasks = [Task(i, f"t{i}", 3, rng.choice((1, 2, 3)), 2, rng.randint(20, 60), i * 60) for i in range(5)]
+    meditation_sessions = [MeditationSession(rng.randint(0, 250), 30, 2) for _ in range(2)]
+    breathing_practices = [BreathingPractice("team", 100, 10, 1.5)]
+    people = team(rng, 25, lambda rng: rng.randint(30, 70))
+    arguments = (tasks, meditation_sessions, breathing_practices, people)
+    options = dict(voluntary=voluntary, curves=[0, 9, 24], percentiles=(10, 50, 90), group_by=lambda person: person.enneagram_type.name)
+    expected = simulate_roster(*arguments, max_workers=1, **options)
+    for percentiles in ((10, 50, 90), ()):
+        options['percentiles'] = percentiles
+        sharded = simulate_roster(*arguments, chunk_size=7, max_workers=2, **options)
+        assert np.array_equal(sharded.times, expected.times)
+        assert np.allclose(sharded.below_fraction, expected.below_fraction)
+        assert np.allclose(sharded.mean, expected.mean)
+        assert sharded.group_below_fraction.keys() == expected.group_below_fraction.keys()
+        for group, fraction in expected.group_below_fraction.items():
+            assert np.allclose(sharded.group_below_fraction[group], fraction)
+        assert np.array_equal(sharded.minutes_below, expected.minutes_below)
+        assert np.array_equal(sharded.lowest, expected.lowest)
+        assert sorted(sharded.curves) == [0, 9, 24]
+        assert all(np.array_equal(sharded.curve(i), expected.curve(i)) for i in (0, 9, 24))
+        assert np.allclose(sharded.bands, expected.bands[:len(percentiles)])
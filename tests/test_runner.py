@@ -0,0 +1,48 @@
+import csv
+import json
+
+from attention_core import runner
+from attention_core.runner import load_schedules, run_files
+
+
+def write_plans(path, difficulties):
+    plans = [{'tasks': [{'difficulty': difficulty, 'duration': 10, 'start_time': 0}]} for difficulty in difficulties]
+    path.write_text(json.dumps(plans[0] if len(plans) == 1 else plans))
+    return str(path)
+
+
+def test_plan_names_never_share_a_curve_file(tmp_path):
+    # a.json's plans would be a_1 and a_2, and a_1.json's plan a_1
+    (tmp_path / 'x').mkdir()
+    (tmp_path / 'y').mkdir()
+    paths = [write_plans(tmp_path / 'a.json', (2, 3)), write_plans(tmp_path / 'a_1.json', (1,)),
+             write_plans(tmp_path / 'x' / 'b.json', (1,)), write_plans(tmp_path / 'y' / 'b.json', (2, 3))]
+    rows = run_files(paths, str(tmp_path / 'out'), max_workers=1)
+    plans = [row['plan'] for row in rows]
+    assert len(set(plans)) == len(plans) == 6
+    assert all((tmp_path / 'out' / f"{plan}.csv").exists() for plan in plans)
+
+
+def test_initial_point_has_no_task_id(tmp_path):
+    rows = run_files([write_plans(tmp_path / 'a.json', (2,))], str(tmp_path / 'out'), max_workers=1, voluntary=True)
+    with open(tmp_path / 'out' / f"{rows[0]['plan']}.csv", newline='') as f:
+        curve = list(csv.DictReader(f))
+    assert curve[0]['task_id'] == ''
+    assert curve[1]['task_id'] == '0'
+
+
+def test_plans_are_split_across_workers_in_summary_order(tmp_path, monkeypatch):
+    (tmp_path / 'bad.json').write_text('{')
+    paths = [write_plans(tmp_path / 'many.json', (1, 2, 3, 4, 5)), str(tmp_path / 'bad.json'), write_plans(tmp_path / 'one.json', (2,))]
+    expected = ['many_1', 'many_2', 'many_3', 'many_4', 'many_5', 'bad', 'one']
+    rows = run_files(paths, str(tmp_path / 'out'), max_workers=2, chunk_size=2)
+    assert [row['plan'] for row in rows] == expected
+    assert [bool(row['error']) for row in rows] == [False] * 5 + [True, False]
+    with open(tmp_path / 'out' / 'summary.csv', newline='') as f:
+        assert [row['plan'] for row in csv.DictReader(f)] == expected
+
+    loads = []
+    monkeypatch.setattr(runner, 'load_schedules', lambda path: loads.append(path) or load_schedules(path))
+    inline = run_files(paths, str(tmp_path / 'inline'), max_workers=1, chunk_size=2)
+    assert [(row['plan'], row['error'], row.get('final_attention')) for row in inline] == [(row['plan'], row['error'], row.get('final_attention')) for row in rows]
+    assert sorted(loads) == sorted(paths)
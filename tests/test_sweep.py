@@ -0,0 +1,60 @@
+import math
+
+import numpy as np
+import pytest
+
+from attention_core import engine
+from attention_core.model import ENNEAGRAM_TYPES, BreathingPractice, MeditationSession, Schedule, Task
+from attention_core.sweep import apply_parameters, parameter_grid, sweep
+
+
+def base_schedule():
+    tasks = [Task(0, "a", 3, 2, 1, 40, 0), Task(1, "b", 3, 4, 2, 30.5, 35), Task(2, "c", 3, 1, 0, 25, 80)]
+    return Schedule(tasks, [MeditationSession(10, 15, 2)], [BreathingPractice("b", 50, 10, 1.5)], ENNEAGRAM_TYPES[3], 90, 60, 100)
+
+
+def brute_force(schedule, params, voluntary):
+    # One simulate() per grid point, reduced to the sweep's columns
+    plan = apply_parameters(schedule, params)
+    run = engine.simulate_with_voluntary if voluntary else engine.simulate
+    result = run(plan.tasks, plan.initial_attention, plan.min_attention, plan.max_attention, plan.meditation_sessions,
+                 plan.breathing_practices, plan.enneagram_type, True, True)
+    attention = result.attention[1:] if voluntary else result.attention
+    return {
+        'minutes': len(attention),
+        'final_attention': attention[-1],
+        'lowest_attention': attention.min(),
+        'mean_attention': attention.mean(),
+        'minutes_below_min': int((attention < plan.min_attention).sum()),
+        'total_attention_gain': result.total_attention_gain,
+        'total_breathing_gain': result.total_breathing_gain,
+        'total_voluntary_intention_gain': result.total_voluntary_intention_gain,
+    }
+
+
+@pytest.mark.parametrize('voluntary', (False, True))
+def test_every_run_matches_simulate(voluntary):
+    schedule = base_schedule()
+    grid = parameter_grid(initial_attention=[70, 100], min_attention=[40, 75], meditation_offset=[0, 20.5],
+                          breathing_effectiveness=[None, 4], task_offset=[0, 3])
+    table = sweep(schedule, grid, chunk_size=5, max_workers=1, voluntary=voluntary)
+    assert len(table) == len(grid)
+    for row, params in zip(table.rows(), grid):
+        assert all(row[name] == value or (value is None and math.isnan(row[name])) for name, value in params.items())
+        for name, value in brute_force(schedule, params, voluntary).items():
+            assert math.isclose(row[name], value, rel_tol=1e-9, abs_tol=1e-9), (params, name)
+
+
+def test_workers_give_the_same_table():
+    schedule = base_schedule()
+    grid = parameter_grid(initial_attention=[60, 80, 100], meditation_effectiveness=[1, 5], breathing_offset=[-10, 0, 10])
+    inline = sweep(schedule, grid, chunk_size=4, max_workers=1, voluntary=True)
+    pooled = sweep(schedule, grid, chunk_size=4, max_workers=2, voluntary=True)
+    assert list(inline.columns) == list(pooled.columns)
+    for name in inline.columns:
+        assert np.array_equal(inline[name], pooled[name], equal_nan=True), name
+
+
+def test_unknown_parameter():
+    with pytest.raises(ValueError):
+        parameter_grid(difficulty=[1, 2])